@@ -0,0 +1,479 @@
+"""
+Two-tier cache backend: a per-process LRU in front of a shared SQLite file.
+
+Django's local-memory cache is private to each worker process, so a
+version stamp bumped or a session deleted in one process is never seen by
+the others, and the database and file caches pay for a query or a file
+read on every lookup. TwoTierCache combines both:
+
+- the shared tier is a SQLite file (LOCATION) used by every process on the
+  host: entries are pickled values with an absolute expiry time, culled
+  like Django's database cache once there are more than MAX_ENTRIES
+- the local tier is a bounded LRU per process, holding the pickled values
+  most recently read or written here for at most LOCAL_TIMEOUT seconds.
+  Hot keys are served from it without touching the file
+
+Invalidation between processes: every write (set, add, touch, incr,
+delete, clear) appends the changed keys to an invalidation log table in
+the same transaction, then increments a version counter in a small
+memory-mapped file next to LOCATION. Before each lookup a process
+compares the counter with the value it last saw, which costs a memory
+read; only when it moved does it read the new log entries and drop those
+keys from its local tier. A process that fell so far behind that the log
+was pruned past its position clears its local tier. A lookup therefore
+never returns a value older than the last write completed by any
+process, which makes the backend safe for sessions.
+
+Per-tier hit ratios, evictions and invalidations are reported by
+cache.stats() and served as JSON at cache/stats/.
+
+Options (in CACHES[alias]['OPTIONS']):
+    MAX_ENTRIES: Entries kept in the shared tier (default: 300, as Django)
+    CULL_FREQUENCY: 1/CULL_FREQUENCY of the entries are culled when full
+    LOCAL_MAX_ENTRIES: Entries kept in each process (default: 1000)
+    LOCAL_TIMEOUT: Seconds an entry may stay in a process (default: 60)
+    LOG_SIZE: Invalidation log entries kept for lagging processes (default: 10000)
+"""
+
+import mmap
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from LibraryProject.lru import LRU
+from LibraryProject.sqlite import apply_pragmas, get_pragmas
+
+
+DEFAULT_LOCAL_MAX_ENTRIES = 1000
+DEFAULT_LOCAL_TIMEOUT = 60
+DEFAULT_LOG_SIZE = 10000
+
+# Shared-tier culling and log pruning run once every this many writes
+MAINTENANCE_EVERY = 100
+
+# The version counter: one unsigned 64-bit integer
+VERSION_FORMAT = '=Q'
+VERSION_SIZE = struct.calcsize(VERSION_FORMAT)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE INDEX IF NOT EXISTS cache_entry_expires_idx ON cache_entry (expires)',
+    # A NULL key invalidates every key (clear())
+    'CREATE TABLE IF NOT EXISTS cache_invalidation '
+    '(seq INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, origin TEXT NOT NULL)',
+]
+
+
+class LocalTier:
+    """LRU of pickled values with expiry times, bounded by entry count."""
+
+    def __init__(self, max_entries):
+        self._entries = LRU(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self):
+        return self._entries.max_entries
+
+    @property
+    def evictions(self):
+        return self._entries.evictions
+
+    def get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None or entry[1] <= now:
+            if entry is not None:
+                self._entries.pop(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, pickled, expires):
+        self._entries.set(key, (pickled, expires))
+
+    def delete(self, key):
+        self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SharedTier:
+    """
+    The SQLite file and the local tier of one LOCATION in this process.
+
+    Django creates a cache backend instance per thread, so this state is
+    kept per LOCATION and shared by all of them. Everything runs under one
+    lock; SQLite calls on a local file take microseconds.
+    """
+
+    def __init__(self, path, options):
+        self.path = path
+        self.local = LocalTier(options.get('LOCAL_MAX_ENTRIES', DEFAULT_LOCAL_MAX_ENTRIES))
+        self.local_timeout = options.get('LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT)
+        self.log_size = options.get('LOG_SIZE', DEFAULT_LOG_SIZE)
+        self.lock = threading.RLock()
+        self.origin = None
+        self._connection = None
+        self._version_map = None
+        self._pid = None
+        self._seq = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.full_invalidations = 0
+
+    def connection(self):
+        """Return the connection, reopening it in a forked child process."""
+        pid = os.getpid()
+        if self._connection is None or self._pid != pid:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            apply_pragmas(connection, get_pragmas('wal', overrides={}))
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._connection = connection
+            self._pid = pid
+            # Each process needs its own identity in the invalidation log
+            self.origin = uuid.uuid4().hex
+            self._version_map = self._map_version_file()
+            self._version = self._read_version()
+            self._seq = connection.execute('SELECT COALESCE(MAX(seq), 0) FROM cache_invalidation').fetchone()[0]
+            # Entries inherited from a parent process may have changed since
+            self.local.clear()
+        return self._connection
+
+    def _map_version_file(self):
+        fd = os.open(f'{self.path}.version', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < VERSION_SIZE:
+                os.ftruncate(fd, VERSION_SIZE)
+            return mmap.mmap(fd, VERSION_SIZE)
+        finally:
+            os.close(fd)
+
+    def _read_version(self):
+        return struct.unpack_from(VERSION_FORMAT, self._version_map)[0]
+
+    def _bump_version(self):
+        # Not atomic across processes, but two writers racing here have both
+        # committed already: a reader seeing either new value reads both logs
+        version = (self._read_version() + 1) % 2 ** 64
+        struct.pack_into(VERSION_FORMAT, self._version_map, 0, version)
+
+    def sync(self, connection):
+        """Drop local entries that other processes have changed."""
+        version = self._read_version()
+        if version == self._version:
+            return
+        # Read before the log, so a write committed meanwhile is seen next time
+        self._version = version
+        self._apply_log(connection)
+
+    def _apply_log(self, connection):
+        rows = connection.execute(
+            'SELECT seq, key, origin FROM cache_invalidation WHERE seq > ? ORDER BY seq', (self._seq,)
+        ).fetchall()
+        if not rows:
+            return
+        if rows[0][0] != self._seq + 1:
+            # The log was pruned past our position: anything may have changed
+            self.local.clear()
+            self.full_invalidations += 1
+        else:
+            for _, key, origin in rows:
+                if origin == self.origin:
+                    continue
+                if key is None:
+                    self.local.clear()
+                    self.full_invalidations += 1
+                else:
+                    self.local.delete(key)
+                    self.invalidations += 1
+        self._seq = rows[-1][0]
+
+    def local_expiry(self, expires, now):
+        local_expires = now + self.local_timeout
+        return local_expires if expires is None else min(expires, local_expires)
+
+    def write(self, operation, keys, cache):
+        """
+        Run operation(connection) in a write transaction that also logs
+        keys (None for all) as invalidated, and return its result.
+        """
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            # No other process can write now: catch up with the log, so our
+            # own entries below do not have to be read back later
+            self._apply_log(connection)
+            result = operation(connection)
+            connection.executemany(
+                'INSERT INTO cache_invalidation (key, origin) VALUES (?, ?)',
+                [(key, self.origin) for key in keys],
+            )
+            last_seq = connection.execute('SELECT last_insert_rowid()').fetchone()[0]
+            self.writes += 1
+            if self.writes % MAINTENANCE_EVERY == 0:
+                self._maintain(connection, cache, last_seq)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._seq = last_seq
+        self._bump_version()
+        return result
+
+    def _maintain(self, connection, cache, last_seq):
+        connection.execute('DELETE FROM cache_invalidation WHERE seq <= ?', (last_seq - self.log_size,))
+        connection.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+        count = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > cache._max_entries:
+            # Like Django's database cache, but entries without expiry go last.
+            # Culled values have not changed, so nothing is logged
+            cull = count // cache._cull_frequency if cache._cull_frequency else count
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key IN '
+                '(SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+                (cull,),
+            )
+
+    def stats(self):
+        with self.lock:
+            connection = self.connection()
+            entries = connection.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+            local_lookups = self.local.hits + self.local.misses
+            shared_lookups = self.hits + self.misses
+            return {
+                'hit_ratio': (self.local.hits + self.hits) / local_lookups if local_lookups else 0.0,
+                'local': {
+                    'hits': self.local.hits,
+                    'misses': self.local.misses,
+                    'hit_ratio': self.local.hits / local_lookups if local_lookups else 0.0,
+                    'evictions': self.local.evictions,
+                    'entries': len(self.local),
+                    'max_entries': self.local.max_entries,
+                },
+                'shared': {
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'hit_ratio': self.hits / shared_lookups if shared_lookups else 0.0,
+                    'entries': entries,
+                },
+                'writes': self.writes,
+                'invalidations': self.invalidations,
+                'full_invalidations': self.full_invalidations,
+            }
+
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def _get_tier(path, options):
+    with _tiers_lock:
+        tier = _tiers.get(path)
+        if tier is None:
+            tier = _tiers[path] = SharedTier(path, options)
+        return tier
+
+
+class TwoTierCache(BaseCache):
+    """Cache backend with a per-process LRU over a shared SQLite file."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.tier = _get_tier(str(location), params.get('OPTIONS', {}))
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _lookup(self, connection, keys, now):
+        """Return a key -> pickled dict for keys, local tier first."""
+        tier = self.tier
+        found = {}
+        missing = []
+        for key in keys:
+            pickled = tier.local.get(key, now)
+            if pickled is None:
+                missing.append(key)
+            else:
+                found[key] = pickled
+        if missing:
+            placeholders = ', '.join('?' * len(missing))
+            rows = connection.execute(
+                f'SELECT key, value, expires FROM cache_entry WHERE key IN ({placeholders})', missing
+            ).fetchall()
+            for key, pickled, expires in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = pickled
+                tier.local.set(key, pickled, tier.local_expiry(expires, now))
+            tier.hits += sum(key in found for key in missing)
+            tier.misses += sum(key not in found for key in missing)
+        return found
+
+    def _read(self, keys):
+        with self.tier.lock:
+            connection = self.tier.connection()
+            self.tier.sync(connection)
+            return self._lookup(connection, keys, time.time())
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = self._read([key]).get(key)
+        if pickled is None:
+            return default
+        return pickle.loads(pickled)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = self._read(list(key_map))
+        return {key_map[key]: pickle.loads(pickled) for key, pickled in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return key in self._read([key])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        entries = [
+            (self.make_and_validate_key(key, version=version), self._dumps(value), expires)
+            for key, value in data.items()
+        ]
+        if not entries:
+            return []
+
+        def operation(connection):
+            connection.executemany(
+                'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+                entries,
+            )
+
+        tier = self.tier
+        with tier.lock:
+            tier.write(operation, [key for key, _, _ in entries], self)
+            now = time.time()
+            for key, pickled, expires in entries:
+                tier.local.set(key, pickled, tier.local_expiry(expires, now))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        pickled = self._dumps(value)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+
+        def operation(connection):
+            # Only replaces an expired entry
+            connection.execute(
+                'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+                'WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+                (key, pickled, expires, now),
+            )
+            return connection.execute('SELECT changes()').fetchone()[0] > 0
+
+        tier = self.tier
+        with tier.lock:
+            added = tier.write(operation, [key], self)
+            if added:
+                tier.local.set(key, pickled, tier.local_expiry(expires, now))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        expires = self.get_backend_timeout(timeout)
+
+        def operation(connection):
+            connection.execute(
+                'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (expires, key, time.time()),
+            )
+            return connection.execute('SELECT changes()').fetchone()[0] > 0
+
+        with self.tier.lock:
+            self.tier.local.delete(key)
+            return self.tier.write(operation, [key], self)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+
+        def operation(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entry WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (self._dumps(value), key))
+            return value
+
+        with self.tier.lock:
+            self.tier.local.delete(key)
+            return self.tier.write(operation, [key], self)
+
+    def delete(self, key, version=None):
+        return self._delete([self.make_and_validate_key(key, version=version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def _delete(self, keys):
+        if not keys:
+            return False
+
+        def operation(connection):
+            placeholders = ', '.join('?' * len(keys))
+            connection.execute(f'DELETE FROM cache_entry WHERE key IN ({placeholders})', keys)
+            return connection.execute('SELECT changes()').fetchone()[0] > 0
+
+        with self.tier.lock:
+            for key in keys:
+                self.tier.local.delete(key)
+            return self.tier.write(operation, keys, self)
+
+    def clear(self):
+        def operation(connection):
+            connection.execute('DELETE FROM cache_entry')
+
+        with self.tier.lock:
+            self.tier.local.clear()
+            self.tier.write(operation, [None], self)
+
+    def stats(self):
+        """Return per-tier hit ratios and invalidation counters of this process."""
+        return self.tier.stats()
+
+
+def relocate_caches(caches_setting, directory):
+    """
+    Return a copy of a CACHES setting with every TwoTierCache file moved
+    into directory, for benchmarks and tests that must not touch the real
+    cache files.
+    """
+    relocated = {}
+    for alias, config in caches_setting.items():
+        config = dict(config)
+        if config['BACKEND'] == f'{__name__}.TwoTierCache':
+            config['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+        relocated[alias] = config
+    return relocated
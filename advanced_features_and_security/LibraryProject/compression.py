@@ -0,0 +1,198 @@
+"""
+Response compression (brotli when installed, otherwise gzip).
+
+CompressionMiddleware compresses dynamic responses: the large librarian and
+admin tables shrink by an order of magnitude. Static files are compressed
+once, at collectstatic time, by CompressedManifestStaticFilesStorage in
+LibraryProject/static.py and are never compressed per request.
+
+SECURITY:
+- BREACH: an attacker who can inject text into a compressed page and watch
+  its size can recover secrets on the same page. Responses that embed a
+  CSRF token (get_token() was called, e.g. by {% csrf_token %}, so
+  CsrfViewMiddleware set the CSRF cookie) and views marked with
+  @compression_exempt are therefore sent uncompressed. Gzip output also
+  carries Django's random-length filename padding, which blurs the size
+  of everything else.
+
+Settings:
+    COMPRESSION_MIN_SIZE: Smallest body worth compressing (default: 200 bytes)
+    COMPRESSION_CONTENT_TYPES: MIME types that are compressed
+    COMPRESSION_BROTLI_QUALITY: Brotli quality for dynamic responses (default: 5)
+"""
+
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+DEFAULT_MIN_SIZE = 200
+DEFAULT_CONTENT_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/x-ndjson',
+    'image/svg+xml',
+)
+DEFAULT_BROTLI_QUALITY = 5
+
+# Random filename padding added to gzip output (see django.utils.text)
+GZIP_MAX_RANDOM_BYTES = 100
+
+
+def accepted_encodings(header):
+    """Return the set of codings an Accept-Encoding header allows (q > 0)."""
+    encodings = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(coding)
+    return encodings
+
+
+def choose_encoding(request):
+    """Pick 'br' or 'gzip' for the request, or None if neither is accepted."""
+    encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compression_exempt(view_func):
+    """Mark a view whose responses must never be compressed."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        response = view_func(*args, **kwargs)
+        response.compression_exempt = True
+        return response
+    return wrapper
+
+
+class CompressionMiddleware:
+    """
+    Compress responses the client accepts, when their type and size make
+    it worthwhile and they are not BREACH-sensitive. Works in both sync and
+    async middleware chains, so async views stay async under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.content_types = frozenset(
+            getattr(settings, 'COMPRESSION_CONTENT_TYPES', DEFAULT_CONTENT_TYPES)
+        )
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def _is_compressible(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return False
+        if getattr(response, 'compression_exempt', False):
+            return False
+        if settings.CSRF_COOKIE_NAME in response.cookies:
+            # get_token() was called, so the page carries a CSRF token
+            # (see SECURITY above)
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in self.content_types:
+            return False
+        return response.streaming or len(response.content) >= self.min_size
+
+    def process_response(self, request, response):
+        if not self._is_compressible(request, response):
+            return response
+
+        # The response would have been compressed for another client
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = self._compress_stream(response, encoding)
+            del response.headers['Content-Length']
+        else:
+            compressed = self._compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag must not be shared by different encodings
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress(self, content, encoding):
+        if encoding == 'br':
+            return brotli.compress(content, quality=self.brotli_quality)
+        return compress_string(content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+    def _compress_stream(self, response, encoding):
+        """
+        Wrap the streaming content in a compressor. Brotli output is flushed
+        after every chunk so streamed pages still render progressively.
+        """
+        content = response.streaming_content
+        if encoding == 'gzip':
+            if response.is_async:
+                async def gzip_chunks():
+                    async for chunk in content:
+                        yield compress_string(chunk, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+                return gzip_chunks()
+            return compress_sequence(content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+        compressor = brotli.Compressor(quality=self.brotli_quality)
+        if response.is_async:
+            async def brotli_chunks():
+                async for chunk in content:
+                    yield compressor.process(chunk) + compressor.flush()
+                yield compressor.finish()
+            return brotli_chunks()
+
+        def brotli_chunks():
+            for chunk in content:
+                yield compressor.process(chunk) + compressor.flush()
+            yield compressor.finish()
+        return brotli_chunks()
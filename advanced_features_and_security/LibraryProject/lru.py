@@ -0,0 +1,81 @@
+"""
+Bounded mapping with least-recently-used eviction.
+
+Shared by the in-process caches (the local tier of cache.py, the role and
+fragment caches of relationship_app) and the name maps of load_catalog.
+It takes no lock: callers that share one between threads guard it with
+their own, usually together with state of their own.
+"""
+
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class LRU:
+    """
+    Mapping of at most max_entries items, evicting the least recently used.
+
+    Args:
+        max_entries: Maximum number of items
+        max_weight: Optional bound on the total weight of the values
+        weigh: Function returning the weight of a value (default: len)
+    """
+
+    def __init__(self, max_entries, max_weight=None, weigh=len):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigh = weigh
+        self.weight = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the value for key and mark it as recently used."""
+        try:
+            value = self._items[key]
+        except KeyError:
+            return default
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        """
+        Store value under key, evicting least recently used items while
+        over a bound. Returns False, storing nothing, if the value alone
+        weighs more than max_weight.
+        """
+        weight = self.weigh(value) if self.max_weight is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            self.pop(key)
+            return False
+        self.pop(key)
+        self._items[key] = value
+        self.weight += weight
+        while len(self._items) > self.max_entries or (
+            self.max_weight is not None and self.weight > self.max_weight
+        ):
+            _, evicted = self._items.popitem(last=False)
+            if self.max_weight is not None:
+                self.weight -= self.weigh(evicted)
+            self.evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        value = self._items.pop(key, _MISSING)
+        if value is _MISSING:
+            return default
+        if self.max_weight is not None:
+            self.weight -= self.weigh(value)
+        return value
+
+    def clear(self):
+        self._items.clear()
+        self.weight = 0
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
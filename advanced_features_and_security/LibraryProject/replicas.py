@@ -0,0 +1,172 @@
+"""
+Read replicas for the catalog apps, with read-your-writes pinning.
+
+ReplicaRouter sends reads of the models of REPLICA_APPS (relationship_app
+and bookshelf) to one of the DATABASE_REPLICAS, and every write to
+'default'. Other apps (users, sessions, admin, auth) always use 'default'.
+With no replicas configured the router has no opinion and everything
+stays on 'default'.
+
+Replicas lag behind the primary, so reads go to 'default' instead when:
+
+- the request is not a safe method (POST, PUT, ...): such a view may
+  read an object and save it back, and must not save a stale copy
+- the client wrote recently: ReplicaPinningMiddleware sets a short-lived
+  REPLICA_PIN_COOKIE on responses to unsafe requests (or to requests that
+  wrote to a replicated app), and requests carrying it are pinned for
+  REPLICA_PIN_SECONDS. A user adding a book therefore sees it on the next
+  page even if no replica has caught up yet
+- a transaction is open on 'default', so reads inside it see its writes
+- the request already wrote to a replicated app
+
+A request sticks to one replica, so two queries of one page never see
+replicas at different points in time.
+
+Only requests read from replicas. Code running outside one (management
+commands, the write queue's thread, thumbnail workers) has no request
+state and reads from 'default', since it may act on what it reads and
+has no pin to protect it from replication lag.
+
+SQLite files stand in for replicas locally: `python manage.py
+sync_replicas` copies the primary into each one (see that command). The
+pin window should be longer than the sync interval.
+
+Settings:
+    DATABASE_REPLICAS: Database aliases serving replicated reads (default: [])
+    REPLICA_APPS: App labels whose reads may go to a replica
+    REPLICA_PIN_SECONDS: Read-your-writes window after a write (default: 5)
+    REPLICA_PIN_COOKIE: Name of the pinning cookie (default: 'replica_pin')
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+DEFAULT_REPLICA_APPS = ('relationship_app', 'bookshelf')
+DEFAULT_PIN_SECONDS = 5
+DEFAULT_PIN_COOKIE = 'replica_pin'
+
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'TRACE'})
+
+
+class _RequestState:
+    """Routing state of one request."""
+
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+_state = ContextVar('replica_state', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def _clear_state(**kwargs):
+    # The middleware leaves the state in place until the response is
+    # closed, so streamed bodies are still routed like the request
+    _state.set(None)
+
+
+request_finished.connect(_clear_state, dispatch_uid='LibraryProject.replicas.clear_state')
+
+
+class ReplicaRouter:
+    """Route reads of the replicated apps to DATABASE_REPLICAS."""
+
+    def __init__(self):
+        self.replicated_apps = frozenset(getattr(settings, 'REPLICA_APPS', DEFAULT_REPLICA_APPS))
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in self.replicated_apps:
+            return None
+        replicas = get_replicas()
+        if not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        state = _state.get()
+        if state is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in self.replicated_apps:
+            state = _state.get()
+            if state is not None:
+                state.wrote = True
+                state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema with the data from the primary
+        if db in get_replicas():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Set up the routing state of each request and pin clients that just
+    wrote to the primary for REPLICA_PIN_SECONDS. Works in both sync and
+    async middleware chains.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.cookie_name = getattr(settings, 'REPLICA_PIN_COOKIE', DEFAULT_PIN_COOKIE)
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_PIN_SECONDS)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.process_request(request)
+        response = self.get_response(request)
+        return self.process_response(request, response, state)
+
+    async def __acall__(self, request):
+        state = self.process_request(request)
+        response = await self.get_response(request)
+        return self.process_response(request, response, state)
+
+    def process_request(self, request):
+        state = _RequestState(
+            pinned=request.method not in SAFE_METHODS or self.cookie_name in request.COOKIES
+        )
+        _state.set(state)
+        return state
+
+    def process_response(self, request, response, state):
+        if request.method not in SAFE_METHODS or state.wrote:
+            response.set_cookie(
+                self.cookie_name,
+                '1',
+                max_age=self.pin_seconds,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
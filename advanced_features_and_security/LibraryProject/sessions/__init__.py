@@ -0,0 +1,95 @@
+"""
+Session engines with incremental cleanup of expired sessions.
+
+Django's database session engines clear expired sessions with a single
+DELETE over the whole django_session table (`python manage.py
+clearsessions`). On SQLite that statement holds the write lock for as long
+as it runs, stalling every login and catalog write behind it. The engines
+in this package delete expired rows in small batches instead, each in its
+own short transaction, with a pause in between so other writers get the
+lock:
+
+- clearsessions uses them automatically through SessionStore.clear_expired()
+- each new session (every login) also deletes one batch with probability
+  SESSION_CLEANUP_PROBABILITY, so expired rows do not pile up between runs
+
+Engines:
+    LibraryProject.sessions.db         Sessions in the database
+    LibraryProject.sessions.cached_db  Database sessions read through the
+                                       SESSION_CACHE_ALIAS cache
+
+The cache-only and signed-cookie engines keep no rows to clean up, so
+Django's own are used for them (see SESSION STORAGE in settings.py).
+
+Settings:
+    SESSION_CLEANUP_BATCH_SIZE: Rows deleted per batch (default: 500)
+    SESSION_CLEANUP_PAUSE: Seconds between batches of a full sweep (default: 0.05)
+    SESSION_CLEANUP_PROBABILITY: Chance that a new session runs a batch (default: 0.01)
+"""
+
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_PAUSE = 0.05
+DEFAULT_PROBABILITY = 0.01
+
+
+def delete_expired_batch(model, batch_size=None):
+    """Delete up to batch_size expired sessions and return how many were deleted."""
+    if batch_size is None:
+        batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    # Served by the expire_date index; the DELETE then touches only these rows
+    keys = list(
+        model.objects.filter(expire_date__lt=timezone.now())
+        .values_list('pk', flat=True)[:batch_size]
+    )
+    if not keys:
+        return 0
+    deleted, _ = model.objects.filter(pk__in=keys).delete()
+    return deleted
+
+
+def clear_expired(model, batch_size=None, pause=None):
+    """Delete all expired sessions batch by batch and return the total."""
+    if batch_size is None:
+        batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    if pause is None:
+        pause = getattr(settings, 'SESSION_CLEANUP_PAUSE', DEFAULT_PAUSE)
+    total = 0
+    while True:
+        deleted = delete_expired_batch(model, batch_size)
+        total += deleted
+        if deleted < batch_size:
+            return total
+        time.sleep(pause)
+
+
+class IncrementalCleanupMixin:
+    """Batched clear_expired() and opportunistic cleanup for database session stores."""
+
+    @classmethod
+    def clear_expired(cls):
+        clear_expired(cls.get_model_class())
+
+    @classmethod
+    async def aclear_expired(cls):
+        await sync_to_async(cls.clear_expired)()
+
+    def create(self):
+        super().create()
+        self._maybe_delete_expired()
+
+    async def acreate(self):
+        await super().acreate()
+        await sync_to_async(self._maybe_delete_expired)()
+
+    def _maybe_delete_expired(self):
+        probability = getattr(settings, 'SESSION_CLEANUP_PROBABILITY', DEFAULT_PROBABILITY)
+        if probability and random.random() < probability:
+            delete_expired_batch(self.get_model_class())
@@ -0,0 +1,9 @@
+"""Cached database session engine with incremental expired-session cleanup."""
+
+from django.contrib.sessions.backends import cached_db
+
+from LibraryProject.sessions import IncrementalCleanupMixin
+
+
+class SessionStore(IncrementalCleanupMixin, cached_db.SessionStore):
+    pass
@@ -0,0 +1,9 @@
+"""Database session engine with incremental expired-session cleanup."""
+
+from django.contrib.sessions.backends import db
+
+from LibraryProject.sessions import IncrementalCleanupMixin
+
+
+class SessionStore(IncrementalCleanupMixin, db.SessionStore):
+    pass
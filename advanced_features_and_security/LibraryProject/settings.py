@@ -47,7 +47,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Above CsrfViewMiddleware so it sees the CSRF cookie of pages that embed
+    # a token (such pages are left uncompressed, see compression.py)
+    'LibraryProject.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    # Routes catalog reads of clients that just wrote to the primary database
+    'LibraryProject.replicas.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -82,9 +87,58 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            # Prepared statements kept per connection (sqlite3 default: 128)
+            'cached_statements': 256,
+            # Take the write lock when atomic() begins. A deferred transaction
+            # that reads and then writes fails at once with "database is
+            # locked" if another writer committed in between, whatever the
+            # busy timeout; an immediate one waits for the lock instead
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Local stand-in for a read replica, refreshed by `python manage.py
+    # sync_replicas`; listed in DATABASE_REPLICAS below to take reads
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'OPTIONS': {
+            'cached_statements': 256,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# ============== READ REPLICAS ==============
+# Reads of the catalog apps go to one of DATABASE_REPLICAS, writes and all
+# other apps to 'default' (see LibraryProject/replicas.py). Clients that just
+# wrote are pinned to 'default' for REPLICA_PIN_SECONDS, which should exceed
+# the replication lag (the sync_replicas interval for SQLite files).
+DATABASE_ROUTERS = ['LibraryProject.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []  # e.g. ['replica'] once sync_replicas has created it
+REPLICA_APPS = ['relationship_app', 'bookshelf']
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+# ============== SQLITE PROFILE ==============
+# Pragmas applied to every new SQLite connection (see LibraryProject/sqlite.py).
+# 'wal' lets readers run alongside the writer and makes writers wait for the
+# lock instead of failing with "database is locked"; 'wal-durable' also
+# fsyncs every commit; 'default' leaves SQLite's own settings.
+SQLITE_PROFILE = 'wal'
+SQLITE_PRAGMAS = {}  # Per-pragma overrides, e.g. {'busy_timeout': 10000}
+
+# ============== SERIALIZED WRITES ==============
+# Opt-in single-writer path for the book and registration views: writes are
+# queued to one writer thread per process and committed in groups, under a
+# lock file shared by all processes (see LibraryProject/write_queue.py).
+WRITE_QUEUE_ENABLED = False
+WRITE_QUEUE_GROUP_SIZE = 32  # Maximum writes per group commit
+WRITE_QUEUE_GROUP_WINDOW = 0.002  # Seconds to wait for more writes to join a group
+WRITE_QUEUE_LOCK_FILE = None  # Default: '<database file>.write.lock'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -121,13 +175,72 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# ============== STATIC FILE CACHING ==============
+# collectstatic writes each file under a content-hashed name and records the
+# mapping in staticfiles.json; {% static %} emits the hashed URL. A changed
+# file gets a new URL, so hashed files can be cached for a year. Text assets
+# also get precompressed .br/.gz variants (see LibraryProject/static.py).
+# With DEBUG = False run `python manage.py collectstatic` before serving.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'LibraryProject.static.CompressedManifestStaticFilesStorage',
+    },
+}
+STATIC_CACHE_MAX_AGE = 31536000  # One year in seconds, for hashed file names
+
 MEDIA_URL = 'media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# ============== PROFILE PHOTO THUMBNAILS ==============
+# Renditions generated in the background when a profile photo changes (see
+# accounts/thumbnails.py). Pages show 'small' at half size for sharp results
+# on high-density screens; a placeholder is shown until they are ready.
+PROFILE_THUMBNAIL_SIZES = {'small': (64, 64), 'medium': (256, 256)}
+PROFILE_THUMBNAIL_QUALITY = 80  # WebP and JPEG quality
+PROFILE_THUMBNAIL_WORKERS = 2  # Background threads per process
+PROFILE_THUMBNAIL_BACKGROUND = True  # False: generate inline after commit
+
+# ============== PROFILE PHOTO UPLOADS ==============
+# Photos are streamed to disk by accounts/uploads.py and rejected as soon as
+# they grow past the size limit or do not start like an image.
+PROFILE_PHOTO_MAX_SIZE = 5 * 1024 * 1024  # Bytes
+PROFILE_PHOTO_MAX_PIXELS = 40_000_000  # Width * height, against decompression bombs
+
+# ============== RESPONSE COMPRESSION ==============
+# Brotli (if the brotli package is installed) or gzip for dynamic responses,
+# see LibraryProject/compression.py. Pages embedding a CSRF token are never
+# compressed (BREACH). Static files are precompressed by collectstatic.
+COMPRESSION_MIN_SIZE = 200  # Bytes; smaller bodies are sent as they are
+COMPRESSION_CONTENT_TYPES = [
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/csv',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'application/x-ndjson',
+    'image/svg+xml',
+]
+COMPRESSION_BROTLI_QUALITY = 5  # 0-11; dynamic responses favour speed
+
 # ============== CUSTOM USER MODEL ==============
 # Configure Django to use the custom user model
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+# ============== AUTHENTICATION BACKENDS ==============
+# ModelBackend with cross-request caching of resolved permission sets
+# (see accounts/backends.py)
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedPermissionBackend',
+]
+PERMISSION_CACHE_TIMEOUT = 300  # Seconds
+
 # ============== LOGIN CONFIGURATION ==============
 LOGIN_REDIRECT_URL = 'list_books'
 LOGIN_URL = 'login'
@@ -152,6 +265,53 @@ CSRF_COOKIE_HTTPONLY = True  # Prevent JavaScript from accessing CSRF token
 SESSION_COOKIE_SECURE = True
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript from accessing session cookies
 
+# ============== SESSION STORAGE ==============
+# Every authenticated request loads its session and every login writes one.
+# Engines, compared by `python manage.py benchmark_sessions`:
+#   'LibraryProject.sessions.db'         one django_session SELECT per request
+#   'LibraryProject.sessions.cached_db'  reads from the 'sessions' cache, writes go
+#       to both. The cache must be shared by all processes (see CACHES): with a
+#       per-process cache, a session logged out in one process stays valid in
+#       the others
+#   'django.contrib.sessions.backends.cache'  'sessions' cache only, no database
+#       I/O; sessions are lost when the cache is culled or cleared
+#   'django.contrib.sessions.backends.signed_cookies'  no server-side state, but
+#       a copied cookie stays valid until it expires, even after logout
+# The database engines delete expired sessions in batches, both in
+# clearsessions and now and then on login (see LibraryProject/sessions).
+SESSION_ENGINE = 'LibraryProject.sessions.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_CLEANUP_BATCH_SIZE = 500  # Expired sessions deleted per transaction
+SESSION_CLEANUP_PAUSE = 0.05  # Seconds between batches, lets other writers in
+SESSION_CLEANUP_PROBABILITY = 0.01  # Chance that a login deletes one batch
+
+# ============== CACHES ==============
+# Two tiers (see LibraryProject/cache.py): a per-process LRU serving hot keys
+# in front of a SQLite file shared by all processes on the host. Writes are
+# broadcast to the other processes, which drop their local copies before
+# their next lookup, so version stamps and sessions are the same everywhere.
+CACHES = {
+    'default': {
+        'BACKEND': 'LibraryProject.cache.TwoTierCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,  # Shared tier
+            'LOCAL_MAX_ENTRIES': 5000,  # Per process
+            'LOCAL_TIMEOUT': 60,  # Seconds an entry may stay in a process
+        },
+    },
+    'sessions': {
+        'BACKEND': 'LibraryProject.cache.TwoTierCache',
+        'LOCATION': BASE_DIR / 'sessions.sqlite3',
+        'OPTIONS': {
+            # cached_db reads culled sessions from the database again
+            'MAX_ENTRIES': 1000000,
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 60,
+        },
+    },
+}
+
 # ============== HTTPS AND HSTS SETTINGS ==============
 # Redirect all HTTP requests to HTTPS (only in production)
 SECURE_SSL_REDIRECT = False  # Set to True in production when HTTPS is available
@@ -162,6 +322,19 @@ SECURE_HSTS_SECONDS = 31536000  # One year in seconds
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True  # Apply HSTS to all subdomains
 SECURE_HSTS_PRELOAD = True  # Allow inclusion in HSTS preload list
 
+# ============== ROLE CACHE ==============
+# Process-local cache of UserProfile.role used by the dashboard role checks
+# (see relationship_app/roles.py). Entries are checked against a per-user
+# version in the shared cache, so role changes reach every process at once.
+ROLE_CACHE_MAX_SIZE = 10000  # Maximum number of cached users per process
+
+# ============== FRAGMENT CACHE ==============
+# Process-local LRU of rendered book rows and catalog tables, keyed by the
+# model change versions (see relationship_app/fragments.py). Changed objects
+# get new keys, so these limits only bound memory, not staleness.
+FRAGMENT_CACHE_MAX_ENTRIES = 5000  # Maximum number of fragments per process
+FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Maximum total size per process
+
 # ============== DEFAULT FIELD TYPE ==============
 # Default primary key field type
 # https://docs.djangoproject.com/en/6.0/ref/settings/#default-auto-field
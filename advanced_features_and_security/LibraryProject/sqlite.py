@@ -0,0 +1,97 @@
+"""
+SQLite connection profile applied to every new database connection.
+
+SQLite's defaults favour safety on any filesystem over concurrency: a
+rollback journal (readers and the writer block each other), synchronous
+FULL (an fsync per commit), no memory-mapped I/O, a 2 MB page cache and
+no busy timeout (a second writer fails at once with "database is
+locked"). The profiles below trade some of that for throughput; the
+receiver connected in RelationshipAppConfig.ready() applies the one named
+by settings.SQLITE_PROFILE when Django opens a SQLite connection.
+
+Profiles:
+    default     SQLite's own defaults (nothing is changed)
+    wal         WAL journal, synchronous NORMAL, 256 MB mmap, 64 MB page
+                cache, 5 s busy timeout, temp tables in memory. A power
+                loss may roll back the last transactions but never
+                corrupts the database
+    wal-durable wal with synchronous FULL: every commit survives power loss
+
+Settings:
+    SQLITE_PROFILE: Name of the profile (default: 'wal')
+    SQLITE_PRAGMAS: Dict of pragma overrides applied on top of the profile
+
+The prepared statement cache of Python's sqlite3 module is sized when the
+connection is opened, so it is set through DATABASES OPTIONS
+('cached_statements') rather than here. So is 'transaction_mode':
+busy_timeout only helps a transaction that has not read yet. Under WAL, a
+deferred transaction that read before another writer committed gets
+SQLITE_BUSY when it tries to write, without waiting, so the default
+database opens its atomic() blocks with BEGIN IMMEDIATE.
+
+Compare profiles with `python manage.py benchmark_sqlite_profiles`.
+"""
+
+import re
+
+from django.conf import settings
+
+
+DEFAULT_PROFILE = 'wal'
+
+PROFILES = {
+    'default': {},
+    'wal': {
+        # Applied first, so a journal_mode switch waits for other writers
+        'busy_timeout': 5000,  # Milliseconds
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,  # Bytes
+        'cache_size': -64 * 1024,  # Negative: KiB rather than pages
+        'temp_store': 'MEMORY',
+    },
+}
+PROFILES['wal-durable'] = {**PROFILES['wal'], 'synchronous': 'FULL'}
+
+_PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+def get_pragmas(profile=None, overrides=None):
+    """
+    Return the ordered pragma dict for a profile name (default: the
+    SQLITE_PROFILE setting) with overrides (default: SQLITE_PRAGMAS).
+    """
+    if profile is None:
+        profile = getattr(settings, 'SQLITE_PROFILE', DEFAULT_PROFILE)
+    if overrides is None:
+        overrides = getattr(settings, 'SQLITE_PRAGMAS', {})
+    try:
+        pragmas = dict(PROFILES[profile])
+    except KeyError:
+        raise ValueError(f'Unknown SQLite profile {profile!r}, choose from {", ".join(PROFILES)}')
+    pragmas.update(overrides)
+    return pragmas
+
+
+def apply_pragmas(cursor, pragmas):
+    """Run PRAGMA name = value for each item on a cursor or sqlite3 connection."""
+    for name, value in pragmas.items():
+        # Pragmas cannot take bound parameters, so only plain words and
+        # integers are accepted
+        if not _PRAGMA_VALUE.match(name) or not _PRAGMA_VALUE.match(str(value)):
+            raise ValueError(f'Invalid SQLite pragma {name}={value!r}')
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """connection_created receiver applying the configured profile."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = get_pragmas()
+    if pragmas:
+        # The raw sqlite3 cursor keeps these out of connection.queries
+        cursor = connection.connection.cursor()
+        try:
+            apply_pragmas(cursor, pragmas)
+        finally:
+            cursor.close()
@@ -0,0 +1,123 @@
+"""
+Static file storage and serving tuned for caching and compression.
+
+In production a web server or CDN should serve STATIC_ROOT directly with the
+same policy; serve_static covers deployments where Django serves everything.
+
+PERFORMANCE:
+- Files whose name is a ManifestStaticFilesStorage hash get
+  Cache-Control: public, max-age=STATIC_CACHE_MAX_AGE, immutable, so
+  browsers never revalidate them; a changed file has a different URL
+- Unhashed names (e.g. the original site.css) must be revalidated, since
+  their content can change under the same URL
+- collectstatic writes .br and .gz variants next to every text asset
+  (CompressedManifestStaticFilesStorage); serve_static sends the best
+  variant the client accepts, so no compression happens per request
+"""
+
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.utils.cache import patch_vary_headers
+from django.views.static import serve
+
+from LibraryProject.compression import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # without brotli only .gz variants are written
+    brotli = None
+
+
+# Extensions worth precompressing; images and fonts are already compressed
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.svg', '.txt', '.json', '.html', '.xml')
+
+# Precompressed variants in order of preference: (encoding, suffix)
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes name.br and name.gz for
+    every compressible file, at maximum compression levels since this
+    runs once per deploy. A variant is only kept if it is smaller.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(PRECOMPRESS_EXTENSIONS) and self.exists(name):
+                for variant in self._precompress(name):
+                    yield name, variant, True
+
+    def _precompress(self, name):
+        with self.open(name) as f:
+            content = f.read()
+        written = []
+        compressors = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressors.append(('.br', lambda data: brotli.compress(data, quality=11)))
+        for suffix, compress in compressors:
+            compressed = compress(content)
+            path = self.path(name + suffix)
+            if len(compressed) < len(content):
+                with open(path, 'wb') as f:
+                    f.write(compressed)
+                written.append(name + suffix)
+            elif os.path.exists(path):
+                os.remove(path)
+        return written
+
+
+_hashed_names = None
+
+
+def _is_hashed(path):
+    """Return True if path is a hashed name listed in the manifest."""
+    global _hashed_names
+    if _hashed_names is None:
+        hashed_files = getattr(staticfiles_storage, 'hashed_files', {})
+        _hashed_names = frozenset(hashed_files.values())
+    return path in _hashed_names
+
+
+def _precompressed_variant(request, path):
+    """Return the path of the best precompressed file the client accepts."""
+    encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if encoding in encodings and os.path.isfile(os.path.join(settings.STATIC_ROOT, path + suffix)):
+            return path + suffix
+    return path
+
+
+def serve_static(request, path):
+    compressible = path.endswith(PRECOMPRESS_EXTENSIONS)
+    # serve() sets Content-Type from the original extension and
+    # Content-Encoding from the .br/.gz suffix
+    served_path = _precompressed_variant(request, path) if compressible else path
+    response = serve(request, served_path, document_root=settings.STATIC_ROOT)
+    if compressible:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if _is_hashed(path):
+        max_age = getattr(settings, 'STATIC_CACHE_MAX_AGE', 31536000)
+        response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    else:
+        response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def serve_thumbnail(request, path):
+    """
+    Serve a profile photo rendition from MEDIA_ROOT. Their names embed a
+    hash of the original photo (see accounts/thumbnails.py), so they are
+    cached like hashed static files. Originals are not served.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    max_age = getattr(settings, 'STATIC_CACHE_MAX_AGE', 31536000)
+    response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    return response
@@ -0,0 +1,27 @@
+"""Test helpers shared by the apps' test suites."""
+
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+
+from LibraryProject.cache import relocate_caches
+
+
+class IsolatedCachesMixin:
+    """
+    Keep cache files in a temporary directory. Static files are served
+    unhashed, since tests run without collectstatic.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            CACHES=relocate_caches(settings.CACHES, directory),
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        ))
+        super().setUpClass()
@@ -0,0 +1,398 @@
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipIf
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import CsrfViewMiddleware, get_token
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from LibraryProject import cache as two_tier
+from LibraryProject import compression, static
+from LibraryProject import replicas
+from LibraryProject.lru import LRU
+from LibraryProject.sessions.cached_db import SessionStore
+from LibraryProject.testing import IsolatedCachesMixin
+from relationship_app.models import Book
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, as in compression.py
+    brotli = None
+
+
+class LRUTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRU(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertEqual(lru.evictions, 1)
+
+    def test_weight_bound(self):
+        lru = LRU(10, max_weight=5)
+        lru.set('a', 'xx')
+        lru.set('b', 'yyy')
+        lru.set('c', 'z')
+        self.assertNotIn('a', lru)
+        self.assertEqual(lru.weight, 4)
+        self.assertFalse(lru.set('d', 'too heavy'))
+        self.assertEqual(lru.pop('b'), 'yyy')
+        self.assertEqual(lru.weight, 1)
+
+
+# Run by child interpreters: argv is the cache file followed by commands
+CHILD_SCRIPT = '''
+import sys
+from LibraryProject.cache import TwoTierCache
+
+cache = TwoTierCache(sys.argv[1], {'OPTIONS': {'LOG_SIZE': 10}})
+for command in sys.argv[2:]:
+    name, _, argument = command.partition('=')
+    if name == 'set':
+        key, _, value = argument.partition(':')
+        cache.set(key, value)
+    elif name == 'delete':
+        cache.delete(argument)
+    elif name == 'incr':
+        key, _, times = argument.partition(':')
+        for _ in range(int(times)):
+            cache.incr(key)
+    elif name == 'add':
+        print(cache.add(argument, 'taken'))
+'''
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.path = os.path.join(directory, 'cache.sqlite3')
+        # Tiers are kept per LOCATION for the life of the process
+        self.addCleanup(two_tier._tiers.pop, self.path, None)
+        self.cache = self.new_cache()
+
+    def new_cache(self):
+        return two_tier.TwoTierCache(self.path, {'OPTIONS': {'LOG_SIZE': 10}})
+
+    def child(self, *commands):
+        return subprocess.Popen(
+            [sys.executable, '-c', CHILD_SCRIPT, self.path, *commands],
+            cwd=settings.BASE_DIR, stdout=subprocess.PIPE, text=True,
+        )
+
+    def run_child(self, *commands):
+        process = self.child(*commands)
+        output, _ = process.communicate(timeout=60)
+        self.assertEqual(process.returncode, 0)
+        return output
+
+    def test_writes_in_another_process_invalidate_local_entries(self):
+        self.cache.set('changed', 'old')
+        self.cache.set('deleted', 'old')
+        self.cache.set('untouched', 'old')
+        self.cache.get('changed')
+        hits = self.cache.stats()['local']['hits']
+        self.assertEqual(hits, 1)
+
+        self.run_child('set=changed:new', 'delete=deleted')
+        self.assertEqual(self.cache.get('changed'), 'new')
+        self.assertIsNone(self.cache.get('deleted'))
+        self.assertEqual(self.cache.get('untouched'), 'old')
+        stats = self.cache.stats()
+        self.assertEqual(stats['invalidations'], 2)
+        # The untouched key was still served from this process
+        self.assertEqual(stats['local']['hits'], hits + 1)
+
+    def test_pruned_log_clears_the_local_tier(self):
+        self.cache.set('key', 'old')
+        # More writes than LOG_SIZE, and enough to trigger maintenance
+        writes = [f'set=filler{number}:x' for number in range(two_tier.MAINTENANCE_EVERY)]
+        self.run_child(*writes, 'set=key:new')
+        self.assertEqual(self.cache.get('key'), 'new')
+        self.assertEqual(self.cache.stats()['full_invalidations'], 1)
+
+    def test_other_instances_in_this_process_share_the_local_tier(self):
+        other = self.new_cache()
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expiry_and_touch(self):
+        now = 1_000_000.0
+        with mock.patch('time.time', side_effect=lambda: now):
+            self.cache.set('short', 'value', timeout=10)
+            self.cache.set('touched', 'value', timeout=10)
+            self.cache.set('forever', 'value', timeout=None)
+            self.assertTrue(self.cache.touch('touched', timeout=100))
+            self.assertFalse(self.cache.touch('missing'))
+
+            now += 9
+            self.assertEqual(self.cache.get('short'), 'value')
+            now += 2
+            self.assertIsNone(self.cache.get('short'))
+            self.assertFalse(self.cache.touch('short'))
+            self.assertEqual(self.cache.get('touched'), 'value')
+            # add() may replace an expired entry
+            self.assertTrue(self.cache.add('short', 'again'))
+            self.assertEqual(self.cache.get('short'), 'again')
+
+            now += 1000
+            self.assertIsNone(self.cache.get('touched'))
+            self.assertEqual(self.cache.get('forever'), 'value')
+            # Expired entries are not served from the shared tier either
+            self.assertIsNone(self.new_cache().get('touched'))
+
+    def test_local_entries_are_reread_after_local_timeout(self):
+        now = 1_000_000.0
+        with mock.patch('time.time', side_effect=lambda: now):
+            self.cache.set('key', 'value')
+            misses = self.cache.stats()['local']['misses']
+            now += two_tier.DEFAULT_LOCAL_TIMEOUT + 1
+            self.assertEqual(self.cache.get('key'), 'value')
+            self.assertEqual(self.cache.stats()['local']['misses'], misses + 1)
+
+    def test_concurrent_incr_and_add_across_processes(self):
+        self.cache.set('counter', 0)
+        processes = [self.child('incr=counter:50', 'add=claim') for _ in range(4)]
+        outputs = [process.communicate(timeout=60)[0].split() for process in processes]
+        self.assertEqual([process.returncode for process in processes], [0] * 4)
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(sorted(outputs), [['False'], ['False'], ['False'], ['True']])
+        self.assertEqual(self.cache.get('claim'), 'taken')
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    BODY = 'Ursula K. Le Guin, A Wizard of Earthsea\n' * 50
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, view, accept_encoding='gzip, br'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return compression.CompressionMiddleware(view)(request)
+
+    def page(self, request):
+        response = HttpResponse(self.BODY, content_type='text/html; charset=utf-8')
+        response['ETag'] = '"page"'
+        return response
+
+    def test_accepted_encodings(self):
+        self.assertEqual(compression.accepted_encodings('gzip;q=0, BR; q=0.5, identity'), {'br', 'identity'})
+        self.assertEqual(compression.accepted_encodings(''), set())
+
+    def assertCompressed(self, response, encoding):
+        self.assertEqual(response['Content-Encoding'], encoding)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertEqual(response['ETag'], 'W/"page"')
+        decompress = brotli.decompress if encoding == 'br' else gzip.decompress
+        self.assertEqual(decompress(response.content).decode(), self.BODY)
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        self.assertCompressed(self.respond(self.page, 'gzip, deflate, br'), 'br')
+
+    def test_gzip(self):
+        self.assertCompressed(self.respond(self.page, 'gzip, br;q=0'), 'gzip')
+        if brotli is None:
+            self.assertCompressed(self.respond(self.page, 'gzip, br'), 'gzip')
+
+    def test_identity_response_still_varies(self):
+        response = self.respond(self.page, accept_encoding='')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content.decode(), self.BODY)
+
+    def test_streaming_responses_are_compressed(self):
+        def view(request):
+            return StreamingHttpResponse((self.BODY for _ in range(3)), content_type='text/csv')
+
+        response = self.respond(view)
+        self.assertNotIn('Content-Length', response)
+        content = b''.join(response.streaming_content)
+        if brotli is not None:
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(brotli.decompress(content).decode(), self.BODY * 3)
+        else:
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(content).decode(), self.BODY * 3)
+
+    def test_breach_sensitive_responses_are_not_compressed(self):
+        def form(request):
+            get_token(request)
+            return self.page(request)
+
+        exempt = compression.compression_exempt(self.page)
+        for name, view in (('csrf', CsrfViewMiddleware(form)), ('exempt', exempt)):
+            with self.subTest(name):
+                response = self.respond(view)
+                self.assertNotIn('Content-Encoding', response)
+                self.assertNotIn('Accept-Encoding', response.get('Vary', ''))
+                self.assertEqual(response.content.decode(), self.BODY)
+        self.assertIn(settings.CSRF_COOKIE_NAME, self.respond(CsrfViewMiddleware(form)).cookies)
+
+    def test_small_and_binary_responses_are_not_compressed(self):
+        for response in (HttpResponse('tiny'), HttpResponse(self.BODY, content_type='image/png')):
+            with self.subTest(content_type=response['Content-Type']):
+                compressed = self.respond(lambda request: response)
+                self.assertNotIn('Content-Encoding', compressed)
+
+
+# Collect only this project's files; the admin's would take seconds
+@override_settings(
+    STATICFILES_DIRS=[settings.BASE_DIR / 'relationship_app' / 'static'],
+    STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+)
+class ServeStaticTests(SimpleTestCase):
+    NAME = 'relationship_app/js/author-autocomplete.js'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(override_settings(
+            STATIC_ROOT=cls.enterClassContext(tempfile.TemporaryDirectory()),
+        ))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.hashed_name = staticfiles_storage.stored_name(cls.NAME)
+        # The manifest is read once per process; read this one instead
+        cls.enterClassContext(mock.patch.object(static, '_hashed_names', None))
+
+    def get(self, name, accept_encoding):
+        return self.client.get(settings.STATIC_URL + name, HTTP_ACCEPT_ENCODING=accept_encoding)
+
+    def test_serves_the_best_precompressed_variant(self):
+        with open(finders.find(self.NAME), 'rb') as source:
+            original = source.read()
+        variants = [('gzip', 'gzip', gzip.decompress), ('', None, bytes)]
+        if brotli is not None:
+            variants.append(('gzip, br', 'br', brotli.decompress))
+        for accept_encoding, encoding, decompress in variants:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.get(self.hashed_name, accept_encoding)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+                self.assertEqual(response['Content-Type'], 'text/javascript')
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertEqual(decompress(b''.join(response.streaming_content)), original)
+
+    def test_cache_control_depends_on_the_hashed_name(self):
+        self.assertIn('immutable', self.get(self.hashed_name, 'br')['Cache-Control'])
+        self.assertEqual(self.get(self.NAME, 'br')['Cache-Control'], 'public, no-cache')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    # No test-wide transaction: an open one keeps reads on 'default'
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.addCleanup(replicas._clear_state)
+
+    def route(self, request, write=False):
+        """
+        Run a view through the middleware and return the databases of two
+        reads it makes, with the response.
+        """
+        reads = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(Book)
+            reads.append(self.router.db_for_read(Book))
+            reads.append(self.router.db_for_read(Book))
+            return HttpResponse()
+
+        response = replicas.ReplicaPinningMiddleware(view)(request)
+        return reads, response
+
+    def test_reads_outside_a_request_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Book), 'default')
+
+    def test_request_reads_stick_to_one_replica(self):
+        reads, response = self.route(self.factory.get('/'))
+        self.assertEqual(reads, ['replica', 'replica'])
+        self.assertNotIn('replica_pin', response.cookies)
+        self.assertIsNone(self.router.db_for_read(get_user_model()))
+
+    def test_without_replicas_the_router_has_no_opinion(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            reads, _ = self.route(self.factory.get('/'))
+        self.assertEqual(reads, [None, None])
+
+    def test_writes_pin_the_request_and_the_client(self):
+        for request, write in ((self.factory.get('/'), True), (self.factory.post('/'), False)):
+            with self.subTest(method=request.method):
+                reads, response = self.route(request, write=write)
+                self.assertEqual(reads, ['default', 'default'])
+                cookie = response.cookies['replica_pin']
+                self.assertEqual(cookie['max-age'], 5)
+                self.assertTrue(cookie['httponly'])
+
+    def test_pin_lasts_as_long_as_the_cookie(self):
+        pinned = self.factory.get('/')
+        pinned.COOKIES['replica_pin'] = '1'
+        reads, response = self.route(pinned)
+        self.assertEqual(reads, ['default', 'default'])
+        # Not renewed by a read, so it expires REPLICA_PIN_SECONDS after the write
+        self.assertNotIn('replica_pin', response.cookies)
+        reads, _ = self.route(self.factory.get('/'))
+        self.assertEqual(reads, ['replica', 'replica'])
+
+    def test_atomic_blocks_read_from_the_primary(self):
+        def view(request):
+            with transaction.atomic():
+                inside = self.router.db_for_read(Book)
+            return HttpResponse(f'{inside},{self.router.db_for_read(Book)}')
+
+        response = replicas.ReplicaPinningMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(response.content, b'None,replica')
+
+
+@override_settings(SESSION_CLEANUP_BATCH_SIZE=2, SESSION_CLEANUP_PAUSE=0, SESSION_CLEANUP_PROBABILITY=0)
+class SessionCleanupTests(IsolatedCachesMixin, TestCase):
+    def setUp(self):
+        now = timezone.now()
+        for number in range(7):
+            Session.objects.create(
+                session_key=f'expired{number}', session_data='',
+                expire_date=now - timedelta(minutes=number + 1),
+            )
+        self.live = {f'live{number}' for number in range(3)}
+        for key in self.live:
+            Session.objects.create(session_key=key, session_data='', expire_date=now + timedelta(days=1))
+
+    def deletes(self, queries):
+        return [query for query in queries if query['sql'].startswith('DELETE')]
+
+    def test_expired_sessions_are_deleted_in_batches(self):
+        with CaptureQueriesContext(connection) as queries:
+            call_command('clearsessions')
+        self.assertEqual(set(Session.objects.values_list('session_key', flat=True)), self.live)
+        # 2 + 2 + 2 + 1 rows
+        self.assertEqual(len(self.deletes(queries)), 4)
+
+    def test_new_session_may_delete_one_batch(self):
+        with override_settings(SESSION_CLEANUP_PROBABILITY=1):
+            store = SessionStore()
+            store.create()
+        self.assertEqual(Session.objects.filter(expire_date__lt=timezone.now()).count(), 5)
+        self.assertTrue(Session.objects.filter(session_key=store.session_key).exists())
@@ -14,10 +14,23 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
+
+from accounts.thumbnails import THUMBNAIL_DIR
+from LibraryProject.static import serve_static, serve_thumbnail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('relationship_app.urls')),
+    # Collected static files with long-lived cache headers for hashed names
+    re_path(r'^%s(?P<path>.+)$' % re.escape(settings.STATIC_URL.lstrip('/')), serve_static),
+    # Profile photo renditions, cached like hashed static files
+    re_path(
+        r'^%s(?P<path>%s/.+)$' % (re.escape(settings.MEDIA_URL.lstrip('/')), re.escape(THUMBNAIL_DIR)),
+        serve_thumbnail,
+    ),
 ]
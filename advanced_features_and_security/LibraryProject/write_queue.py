@@ -0,0 +1,245 @@
+"""
+Opt-in serialized write path for SQLite.
+
+SQLite allows one writer at a time. When several requests write at once,
+all but one wait on the database lock (busy_timeout) and retry, which
+shows up as tail-latency spikes. With WRITE_QUEUE_ENABLED, run_write()
+instead hands each write to a single writer thread per process:
+
+- jobs wait in an in-process FIFO queue
+- the writer takes the next job plus whatever else arrives within
+  WRITE_QUEUE_GROUP_WINDOW, up to WRITE_QUEUE_GROUP_SIZE jobs, and runs
+  them in one transaction (a group commit: one fsync for many writes).
+  Each job runs in its own savepoint, so a failing job is rolled back
+  alone and its exception is re-raised in the caller
+- the group transaction holds an exclusive lock on WRITE_QUEUE_LOCK_FILE,
+  so writer threads of different processes take turns instead of
+  colliding inside SQLite
+
+Callers block until their job is committed, so a redirect issued after
+run_write() always sees the new data. Any exception a job raises,
+including BaseExceptions such as SystemExit, is delivered to its caller;
+the writer thread survives it, and is restarted should it ever die.
+Queue depth, wait and service times and group sizes are reported by
+write_queue.stats().
+
+With the queue disabled (the default) run_write() simply runs the job in
+an atomic block in the calling thread.
+
+Settings:
+    WRITE_QUEUE_ENABLED: Route run_write() through the writer (default: False)
+    WRITE_QUEUE_GROUP_SIZE: Maximum jobs per group commit (default: 32)
+    WRITE_QUEUE_GROUP_WINDOW: Seconds to wait for more jobs (default: 0.002)
+    WRITE_QUEUE_LOCK_FILE: Cross-process lock file (default: next to the database)
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: writer threads are serialized per process only
+    fcntl = None
+
+
+DEFAULT_GROUP_SIZE = 32
+DEFAULT_GROUP_WINDOW = 0.002
+
+# Number of recent jobs kept for the latency percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+
+class FileLock:
+    """Exclusive flock() on a file, shared by every process on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
+class WriteQueue:
+    """A single writer thread draining a queue of write jobs in groups."""
+
+    def __init__(self, group_size, group_window, lock_path):
+        self.group_size = group_size
+        self.group_window = group_window
+        self.lock = FileLock(lock_path)
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waits = deque(maxlen=LATENCY_SAMPLES)
+        self._services = deque(maxlen=LATENCY_SAMPLES)
+        self.jobs = 0
+        self.groups = 0
+        self.failures = 0
+        self.max_depth = 0
+
+    def submit(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) and block until it is committed."""
+        self._ensure_started()
+        future = Future()
+        self._jobs.put((future, func, args, kwargs, time.perf_counter()))
+        depth = self._jobs.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+        return future.result()
+
+    def is_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _ensure_started(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run(self):
+        while True:
+            group = [self._jobs.get()]
+            deadline = time.perf_counter() + self.group_window
+            while len(group) < self.group_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        group.append(self._jobs.get(timeout=remaining))
+                    else:
+                        group.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._commit_group(group)
+            except BaseException as exc:
+                # Fail whatever was not answered, so no caller blocks on
+                # its future forever, and keep serving with a new connection
+                for future, *_ in group:
+                    if not future.done():
+                        future.set_exception(exc)
+                connection.close()
+
+    def _commit_group(self, group):
+        close_old_connections()
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with self.lock, transaction.atomic():
+                for future, func, args, kwargs, queued in group:
+                    wait = time.perf_counter() - queued
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, True, func(*args, **kwargs), wait))
+                    except BaseException as exc:
+                        # Even SystemExit belongs to the caller, not the writer
+                        outcomes.append((future, False, exc, wait))
+        except BaseException as exc:
+            # The commit itself failed: nothing in the group was written
+            outcomes = [(future, False, exc, time.perf_counter() - queued)
+                        for future, _, _, _, queued in group]
+        service = time.perf_counter() - started
+
+        with self._stats_lock:
+            self.groups += 1
+            for future, ok, value, wait in outcomes:
+                self.jobs += 1
+                self.failures += not ok
+                self._waits.append(wait)
+                self._services.append(service)
+        for future, ok, value, wait in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self):
+        """Return counters and latency percentiles (milliseconds) as a dict."""
+        with self._stats_lock:
+            waits = sorted(self._waits)
+            services = sorted(self._services)
+            return {
+                'enabled': True,
+                'queue_depth': self._jobs.qsize(),
+                'max_queue_depth': self.max_depth,
+                'jobs': self.jobs,
+                'groups': self.groups,
+                'failures': self.failures,
+                'mean_group_size': self.jobs / self.groups if self.groups else 0.0,
+                'wait_ms': _percentiles(waits),
+                'commit_ms': _percentiles(services),
+            }
+
+
+def _percentiles(ordered):
+    if not ordered:
+        return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+
+    def at(percent):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] * 1000
+
+    return {'p50': at(50), 'p99': at(99), 'max': ordered[-1] * 1000}
+
+
+def _default_lock_path():
+    return f"{settings.DATABASES['default']['NAME']}.write.lock"
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """Return the process-wide WriteQueue, creating it on first use."""
+    global _write_queue
+    if _write_queue is None:
+        with _write_queue_lock:
+            if _write_queue is None:
+                _write_queue = WriteQueue(
+                    group_size=getattr(settings, 'WRITE_QUEUE_GROUP_SIZE', DEFAULT_GROUP_SIZE),
+                    group_window=getattr(settings, 'WRITE_QUEUE_GROUP_WINDOW', DEFAULT_GROUP_WINDOW),
+                    lock_path=getattr(settings, 'WRITE_QUEUE_LOCK_FILE', None) or _default_lock_path(),
+                )
+    return _write_queue
+
+
+def run_write(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) as a committed write and return its result.
+
+    Goes through the writer thread when WRITE_QUEUE_ENABLED, except when
+    called from the writer itself or from inside an open transaction
+    (which already holds, or would deadlock on, the write lock); then,
+    like with the queue disabled, func runs in an atomic block right here.
+    """
+    if getattr(settings, 'WRITE_QUEUE_ENABLED', False) and not connection.in_atomic_block:
+        write_queue = get_write_queue()
+        if not write_queue.is_writer_thread():
+            return write_queue.submit(func, *args, **kwargs)
+    with transaction.atomic():
+        return func(*args, **kwargs)
+
+
+def stats():
+    """Return the writer's stats, or {'enabled': False} if it never ran."""
+    if _write_queue is None:
+        return {'enabled': getattr(settings, 'WRITE_QUEUE_ENABLED', False), 'jobs': 0}
+    return _write_queue.stats()
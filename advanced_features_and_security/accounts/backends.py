@@ -0,0 +1,62 @@
+"""
+Authentication backends for the custom user model.
+
+CachedPermissionBackend extends Django's ModelBackend so that a user's
+resolved permission set is kept in the Django cache across requests.
+Without it every permission_required view runs the user-permission and
+group-permission queries again on each request. Cache keys embed version
+counters from accounts/permission_cache.py, so a change to a user's groups
+or permissions makes their old cached set unreachable.
+
+Settings:
+    PERMISSION_CACHE_TIMEOUT: Seconds a cached permission set lives (default: 300)
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from accounts.permission_cache import GLOBAL_VERSION_KEY, USER_VERSION_KEY, get_versions
+
+
+DEFAULT_TIMEOUT = 300
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend whose get_all_permissions() result is shared across
+    requests through the Django cache.
+
+    Object-level checks, inactive users and anonymous users are delegated
+    to ModelBackend unchanged.
+    """
+
+    def _permission_cache_key(self, user_obj):
+        user_version_key = USER_VERSION_KEY.format(user_id=user_obj.pk)
+        versions = get_versions([GLOBAL_VERSION_KEY, user_version_key])
+        return 'accounts:perms:{user_id}:{superuser:d}:{global_v}:{user_v}'.format(
+            user_id=user_obj.pk,
+            superuser=user_obj.is_superuser,
+            global_v=versions[GLOBAL_VERSION_KEY],
+            user_v=versions[user_version_key],
+        )
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return super().get_all_permissions(user_obj, obj=obj)
+
+        # ModelBackend memoizes on the user object for the current request
+        if hasattr(user_obj, '_perm_cache'):
+            return user_obj._perm_cache
+
+        key = self._permission_cache_key(user_obj)
+        permissions = cache.get(key)
+        if permissions is None:
+            permissions = super().get_all_permissions(user_obj, obj=obj)
+            cache.set(
+                key,
+                permissions,
+                timeout=getattr(settings, 'PERMISSION_CACHE_TIMEOUT', DEFAULT_TIMEOUT),
+            )
+        user_obj._perm_cache = permissions
+        return permissions
@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import UserCreationForm
+
+
+class CustomUserCreationForm(UserCreationForm):
+    """
+    Registration form for the custom user model.
+    
+    Django's UserCreationForm is bound to auth.User, which is swapped out
+    by AUTH_USER_MODEL, so the form is rebuilt against CustomUser with
+    email (the USERNAME_FIELD) and username as required fields.
+    """
+    
+    class Meta(UserCreationForm.Meta):
+        model = get_user_model()
+        fields = ('email', 'username')
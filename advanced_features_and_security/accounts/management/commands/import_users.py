@@ -0,0 +1,260 @@
+"""
+Management command to bulk import user accounts from CSV or JSON Lines.
+
+Usage:
+    python manage.py import_users users.csv
+    python manage.py import_users users.jsonl --batch-size 2000 --workers 8
+    cat users.jsonl | python manage.py import_users - --format jsonl
+
+Each record may contain: email (required), username, password, first_name,
+last_name, date_of_birth (YYYY-MM-DD), is_active (default: true) and role
+(Admin, Librarian or Member). Records without a password get an unusable
+one. Every record is validated like the model's own fields (full_clean);
+invalid records are reported by number on stderr and skipped.
+
+Creating users one at a time through CustomUserManager.create_user costs a
+PBKDF2 hash, an INSERT and a post_save profile INSERT per user. This
+command instead:
+- reads the input as a stream, one batch at a time
+- hashes the passwords of a batch across a process pool, while the
+  previous batch is being inserted
+- inserts users and their UserProfile rows with bulk_create, one
+  transaction per batch (bulk_create does not send post_save)
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from relationship_app import versions
+from relationship_app.models import UserProfile
+
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+def _init_worker(settings_module):
+    """Configure Django in pool workers started with the 'spawn' method."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _hash_password(raw_password):
+    # make_password(None) returns an unusable password
+    return make_password(raw_password or None)
+
+
+class Command(BaseCommand):
+    help = 'Bulk import users from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for standard input")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help='Input format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users inserted per transaction (default: 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of password-hashing processes (default: CPU count)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self._guess_format(path)
+        batch_size = max(1, options['batch_size'])
+        workers = max(1, options['workers'])
+
+        self.verbosity = options['verbosity']
+        self.user_model = get_user_model()
+        self.roles = dict(UserProfile.ROLE_CHOICES)
+        self.created = 0
+        self.skipped = 0
+        # Keys of the batch still waiting to be inserted, which the
+        # database cannot report as taken yet
+        self.pending_emails = set()
+        self.pending_usernames = set()
+
+        started = time.perf_counter()
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = self._read_records(stream, input_format)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'LibraryProject.settings'),),
+            ) as pool:
+                self._import(records, pool, batch_size, workers)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        rate = self.created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {self.created} users ({self.skipped} skipped) '
+            f'in {elapsed:.1f}s, {rate:.0f} rows/s'
+        ))
+
+    # ============== INPUT ==============
+
+    @staticmethod
+    def _guess_format(path):
+        if path.endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        if path.endswith('.csv'):
+            return 'csv'
+        raise CommandError('Cannot guess the input format, pass --format csv or --format jsonl')
+
+    @staticmethod
+    def _read_records(stream, input_format):
+        if input_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f'Invalid JSON on line {line_number}: {exc}')
+
+    # ============== PIPELINE ==============
+
+    def _import(self, records, pool, batch_size, workers):
+        """
+        Hash batch N+1 in the pool while batch N is being inserted.
+        """
+        chunksize = max(1, batch_size // (workers * 4))
+        pending = None
+        records = enumerate(records, start=1)
+        while True:
+            rows = list(islice(records, batch_size))
+            # A batch of only skipped or duplicate rows is not the end
+            batch = self._clean_batch(rows) if rows else []
+            if batch:
+                hashes = pool.map(
+                    _hash_password,
+                    [record['password'] for record in batch],
+                    chunksize=chunksize,
+                )
+            if pending is not None:
+                self._insert(*pending)
+            if not rows:
+                break
+            pending = (batch, hashes) if batch else None
+
+    def _clean_batch(self, rows):
+        """
+        Validate and normalize numbered raw records, dropping invalid rows
+        and rows whose email or username already exists in the database,
+        in the pending batch or earlier in this batch.
+        """
+        batch = []
+        for number, row in rows:
+            user = self._build_user(row)
+            try:
+                # Uniqueness is checked for the whole batch below
+                user.full_clean(exclude=['password'], validate_unique=False, validate_constraints=False)
+            except ValidationError as exc:
+                self.skipped += 1
+                self._report(number, exc)
+                continue
+            role = row.get('role') or 'Member'
+            batch.append({
+                'user': user,
+                'email': user.email,
+                'username': user.username,
+                'password': row.get('password') or '',
+                'role': role if role in self.roles else 'Member',
+            })
+
+        taken_emails = set(self.pending_emails)
+        taken_usernames = set(self.pending_usernames)
+        self.pending_emails = set()
+        self.pending_usernames = set()
+        if not batch:
+            return batch
+
+        existing = self.user_model.objects.filter(email__in=[r['email'] for r in batch])
+        taken_emails.update(existing.values_list('email', flat=True))
+        existing = self.user_model.objects.filter(username__in=[r['username'] for r in batch])
+        taken_usernames.update(existing.values_list('username', flat=True))
+
+        unique = []
+        for record in batch:
+            if record['email'] in taken_emails or record['username'] in taken_usernames:
+                self.skipped += 1
+                continue
+            taken_emails.add(record['email'])
+            taken_usernames.add(record['username'])
+            self.pending_emails.add(record['email'])
+            self.pending_usernames.add(record['username'])
+            unique.append(record)
+        return unique
+
+    def _build_user(self, row):
+        """Return an unsaved, not yet validated user for a raw record."""
+        email = (row.get('email') or '').strip()
+        is_active = row.get('is_active')
+        if isinstance(is_active, str):
+            is_active = is_active.strip().lower()
+            # A blank cell means the default, not False
+            is_active = is_active in TRUE_VALUES if is_active else None
+        return self.user_model(
+            email=email,
+            username=(row.get('username') or email.split('@')[0]).strip(),
+            first_name=(row.get('first_name') or '').strip(),
+            last_name=(row.get('last_name') or '').strip(),
+            # Parsed by full_clean, which rejects malformed dates
+            date_of_birth=row.get('date_of_birth') or None,
+            is_active=True if is_active is None else bool(is_active),
+        )
+
+    def _report(self, number, error):
+        problems = '; '.join(
+            f'{field}: {" ".join(messages)}' for field, messages in error.message_dict.items()
+        )
+        self.stderr.write(f'Record {number} skipped: {problems}')
+
+    def _insert(self, batch, hashes):
+        users = []
+        for record, password in zip(batch, hashes):
+            user = record['user']
+            user.password = password
+            users.append(user)
+
+        with transaction.atomic():
+            # bulk_create sets primary keys on SQLite and PostgreSQL,
+            # which the profiles below need
+            self.user_model.objects.bulk_create(users)
+            UserProfile.objects.bulk_create([
+                UserProfile(user_id=user.pk, role=record['role'])
+                for user, record in zip(users, batch)
+            ])
+            versions.bump_versions(versions.USER, versions.USER_PROFILE)
+
+        self.created += len(users)
+        if self.verbosity > 1:
+            self.stdout.write(f'  inserted {self.created} users')
+
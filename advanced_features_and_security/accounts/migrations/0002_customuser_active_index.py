@@ -0,0 +1,19 @@
+"""
+Migration adding the index used to filter the admin user directory by is_active.
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['is_active', 'id'], name='customuser_active_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+"""
+Migration adding the stored renditions of the profile photo (see accounts/thumbnails.py).
+"""
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_customuser_active_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_thumbnails',
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text='Renditions of the profile photo: source, key and renditions by size',
+            ),
+        ),
+    ]
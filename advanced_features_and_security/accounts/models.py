@@ -1,5 +1,12 @@
-from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.contrib.auth.models import AbstractUser, BaseUserManager, Group, Permission
+from functools import partial
+
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from accounts import thumbnails, uploads
+from accounts.permission_cache import bump_global_permission_version, bump_user_permission_version
 
 
 class CustomUserManager(BaseUserManager):
@@ -62,6 +69,8 @@ class CustomUser(AbstractUser):
     Additional Fields:
     - date_of_birth: User's date of birth (optional)
     - profile_photo: User's profile photo (optional image file)
+    - profile_thumbnails: URLs of the photo's fixed-size renditions, filled
+      in the background (see accounts/thumbnails.py)
     
     This model replaces Django's default User model and allows for custom
     user attributes specific to the application's needs.
@@ -79,6 +88,12 @@ class CustomUser(AbstractUser):
         blank=True,
         help_text="User's profile photo"
     )
+    profile_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text="Renditions of the profile photo: source, key and renditions by size"
+    )
     
     # Use email as the unique identifier
     USERNAME_FIELD = 'email'
@@ -90,6 +105,10 @@ class CustomUser(AbstractUser):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         db_table = 'accounts_customuser'
+        # Backs the is_active filter of the admin user directory
+        indexes = [
+            models.Index(fields=['is_active', 'id'], name='customuser_active_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.username} ({self.email})"
@@ -100,3 +119,101 @@ class CustomUser(AbstractUser):
         """
         full_name = f"{self.first_name} {self.last_name}".strip()
         return full_name if full_name else self.email
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored photo so a new upload can be detected on save
+        instance._loaded_profile_photo = instance.__dict__.get('profile_photo')
+        return instance
+
+    @property
+    def thumbnails(self):
+        """
+        Renditions of the current profile photo by size name, each a dict
+        with width, height and webp/jpeg URLs. Empty while they are being
+        generated, so templates can fall back to a placeholder.
+        """
+        data = self.profile_thumbnails or {}
+        if not self.profile_photo or data.get('source') != self.profile_photo.name:
+            return {}
+        return data.get('renditions', {})
+
+    @property
+    def thumbnails_version(self):
+        """Changes whenever the photo or its renditions do (used in ETags)."""
+        return f"{self.profile_photo.name or ''}:{(self.profile_thumbnails or {}).get('key', '')}"
+
+
+# ============== PERMISSION CACHE INVALIDATION ==============
+# See accounts/permission_cache.py for how the version counters are used.
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, action, **kwargs):
+    """
+    A group's permissions changed: any user may belong to the group,
+    so invalidate every cached permission set.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_global_permission_version()
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    A user's groups or direct permissions changed.
+    
+    Handles both directions of the relations:
+    - user.groups.add(group)    (reverse=False, instance is a user)
+    - group.user_set.add(user)  (reverse=True, pk_set holds user ids)
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_user_permission_version([instance.pk])
+    elif pk_set:
+        bump_user_permission_version(pk_set)
+    else:
+        # clear() from the group/permission side does not report user ids
+        bump_global_permission_version()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def permission_source_deleted(sender, **kwargs):
+    """Deleting a group or permission silently removes its m2m rows."""
+    bump_global_permission_version()
+
+
+# ============== PROFILE PHOTO THUMBNAILS ==============
+# See accounts/thumbnails.py for the rendition pipeline. Replaced photos are
+# deleted once no user refers to them (see accounts/uploads.py).
+
+@receiver(post_save, sender=CustomUser)
+def profile_photo_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Generate renditions of a new or replaced photo once it is committed."""
+    if update_fields is not None and 'profile_photo' not in update_fields:
+        # e.g. login() saving last_login
+        return
+    loaded = getattr(instance, '_loaded_profile_photo', None)
+    current = instance.profile_photo.name or None
+    previous = getattr(loaded, 'name', loaded) or None
+    instance._loaded_profile_photo = current
+    if current == previous and not created:
+        return
+    if current:
+        transaction.on_commit(partial(thumbnails.schedule, instance.pk, current))
+    elif previous:
+        transaction.on_commit(partial(thumbnails.delete_renditions, instance.pk))
+    if previous:
+        # Photos are shared by content, so only the last reference deletes it
+        transaction.on_commit(partial(uploads.delete_photo_if_unused, previous))
+
+
+@receiver(post_delete, sender=CustomUser)
+def profile_photo_owner_deleted(sender, instance, **kwargs):
+    if instance.profile_thumbnails:
+        transaction.on_commit(partial(thumbnails.delete_renditions, instance.pk))
+    if instance.profile_photo:
+        transaction.on_commit(partial(uploads.delete_photo_if_unused, instance.profile_photo.name))
@@ -0,0 +1,72 @@
+"""
+Version counters for the cross-request permission cache.
+
+CachedPermissionBackend (accounts/backends.py) embeds two counters in the
+cache key of each user's permission set:
+- a global version, bumped whenever any group's permissions change
+- a per-user version, bumped when that user's groups or direct
+  permissions change
+
+Bumping a version makes every key that embeds it unreachable, so stale
+permission sets are never read and simply expire. The signal handlers in
+accounts/models.py call the bump functions below; bumps happen once the
+current transaction commits, since a request that recomputed the old
+permission set before the commit would otherwise cache it under the new
+version.
+
+A missing counter (never set, or evicted) is seeded with the current time
+in nanoseconds rather than 0, so an evicted counter never comes back to a
+value that an older, pre-revocation entry was cached under.
+"""
+
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+GLOBAL_VERSION_KEY = 'accounts:perms:version'
+USER_VERSION_KEY = 'accounts:perms:version:user:{user_id}'
+
+
+def _seed():
+    return time.time_ns()
+
+
+def get_versions(keys):
+    """Return a dict of key -> version, seeding missing counters."""
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # add() keeps a value another process seeded first
+            cache.add(key, _seed(), timeout=None)
+            versions[key] = cache.get(key, _seed())
+    return versions
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never set or evicted: any fresh seed differs from every value
+        # entries were cached under
+        cache.set(key, _seed(), timeout=None)
+
+
+def bump_versions_on_commit(keys):
+    """Bump the given counters once the current transaction commits."""
+    def bump():
+        for key in keys:
+            _bump(key)
+
+    transaction.on_commit(bump)
+
+
+def bump_global_permission_version():
+    """Invalidate the cached permissions of every user once committed."""
+    bump_versions_on_commit([GLOBAL_VERSION_KEY])
+
+
+def bump_user_permission_version(user_ids):
+    """Invalidate the cached permissions of the given users once committed."""
+    bump_versions_on_commit([USER_VERSION_KEY.format(user_id=user_id) for user_id in user_ids])
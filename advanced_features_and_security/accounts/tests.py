@@ -0,0 +1,287 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from accounts import uploads
+from accounts.backends import CachedPermissionBackend
+from accounts.models import CustomUser
+from accounts.permission_cache import USER_VERSION_KEY
+from LibraryProject.testing import IsolatedCachesMixin
+
+
+class CacheTestCase(IsolatedCachesMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+
+class PermissionCacheTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.permission = Permission.objects.get(
+            content_type__app_label='relationship_app', codename='can_add_book'
+        )
+        cls.group = Group.objects.create(name='Editors')
+        cls.group.permissions.add(cls.permission)
+        cls.user = CustomUser.objects.create_user(email='editor@example.com', username='editor')
+        cls.user.groups.add(cls.group)
+
+    def has_perm(self):
+        # A fresh instance, as in a new request
+        user = CustomUser.objects.get(pk=self.user.pk)
+        return user.has_perm('relationship_app.can_add_book')
+
+    def test_revoking_a_group_permission(self):
+        self.assertTrue(self.has_perm())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.remove(self.permission)
+        self.assertFalse(self.has_perm())
+
+    def test_leaving_a_group(self):
+        self.assertTrue(self.has_perm())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assertFalse(self.has_perm())
+
+    def test_deleting_a_group(self):
+        self.assertTrue(self.has_perm())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assertFalse(self.has_perm())
+
+    def test_versions_are_bumped_after_commit(self):
+        backend = CachedPermissionBackend()
+        key = backend._permission_cache_key(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.groups.remove(self.group)
+            # A concurrent request before the commit keeps the old key
+            self.assertEqual(backend._permission_cache_key(self.user), key)
+        self.assertTrue(callbacks)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(backend._permission_cache_key(self.user), key)
+
+    def test_evicted_version_does_not_return_to_an_old_key(self):
+        backend = CachedPermissionBackend()
+        self.assertTrue(self.has_perm())
+        old_key = backend._permission_cache_key(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        cache.delete(USER_VERSION_KEY.format(user_id=self.user.pk))
+        self.assertNotEqual(backend._permission_cache_key(self.user), old_key)
+        self.assertFalse(self.has_perm())
+
+
+class ImportUsersTests(CacheTestCase):
+    def import_users(self, lines, batch_size, header='email,username,role'):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write(f'{header}\n')
+            source.writelines(f'{line}\n' for line in lines)
+        self.addCleanup(os.remove, source.name)
+        stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        call_command(
+            'import_users', source.name, batch_size=batch_size, workers=1,
+            stdout=stdout, stderr=self.stderr,
+        )
+        return stdout.getvalue()
+
+    def test_imports_users_and_profiles(self):
+        output = self.import_users(
+            ['a@example.com,a,Librarian', 'b@example.com,b,Member'], batch_size=10
+        )
+        self.assertIn('Created 2 users (0 skipped)', output)
+        user = CustomUser.objects.get(email='a@example.com')
+        self.assertEqual(user.userprofile.role, 'Librarian')
+        self.assertFalse(user.has_usable_password())
+
+    def test_batch_of_only_duplicates_does_not_end_the_import(self):
+        lines = [
+            'a1@example.com,a1,', 'b1@example.com,b1,',
+            'a1@example.com,a1,', 'b1@example.com,b1,',
+            'c1@example.com,c1,',
+        ]
+        output = self.import_users(lines, batch_size=2)
+        self.assertIn('Created 3 users (2 skipped)', output)
+        self.assertTrue(CustomUser.objects.filter(email='c1@example.com').exists())
+
+    def test_blank_is_active_means_active(self):
+        self.import_users(
+            ['a@example.com,a,', 'b@example.com,b,no', 'c@example.com,c,yes'],
+            batch_size=10, header='email,username,is_active',
+        )
+        active = dict(CustomUser.objects.values_list('username', 'is_active'))
+        self.assertEqual(active, {'a': True, 'b': False, 'c': True})
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        lines = [
+            'a@example.com,a,1990-02-28',
+            'b@example.com,b,1990-02-30',
+            'not-an-email,c,',
+            'd@example.com,bad name!,',
+            ',e,',
+            'f@example.com,f,',
+        ]
+        output = self.import_users(lines, batch_size=2, header='email,username,date_of_birth')
+        self.assertIn('Created 2 users (4 skipped)', output)
+        self.assertEqual(
+            sorted(CustomUser.objects.values_list('username', flat=True)), ['a', 'f']
+        )
+        self.assertEqual(
+            str(CustomUser.objects.get(username='a').date_of_birth), '1990-02-28'
+        )
+        report = self.stderr.getvalue().splitlines()
+        self.assertEqual([line.split(' skipped')[0] for line in report], [
+            'Record 2', 'Record 3', 'Record 4', 'Record 5',
+        ])
+        self.assertIn('date_of_birth', report[0])
+        self.assertIn('email', report[1])
+        self.assertIn('username', report[2])
+
+    def test_skips_existing_users(self):
+        CustomUser.objects.create_user(email='a@example.com', username='a')
+        output = self.import_users(['a@example.com,a,', 'b@example.com,b,'], batch_size=1)
+        self.assertIn('Created 1 users (1 skipped)', output)
+
+
+def jpeg(color, size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class ProfilePhotoUploadTests(CacheTestCase):
+    @classmethod
+    def setUpClass(cls):
+        media = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=media,
+            PROFILE_PHOTO_MAX_SIZE=64 * 1024,
+            PROFILE_THUMBNAIL_BACKGROUND=False,
+        ))
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        self.directory = os.path.join(settings.MEDIA_ROOT, 'profile_photos')
+        self.user = CustomUser.objects.create_user(email='photo@example.com', username='photo')
+        self.url = reverse('profile_photo')
+        self.client, self.token = self.login(self.user)
+
+    def tearDown(self):
+        for name in self.stored_files():
+            os.remove(os.path.join(self.directory, name))
+
+    def login(self, user):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        client.get(self.url, secure=True)
+        return client, client.cookies['csrftoken'].value
+
+    def stored_files(self):
+        """Photos in the upload directory, including leftover part files."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if os.path.isfile(os.path.join(self.directory, name))
+        )
+
+    def upload(self, content, client=None, token=None):
+        data = {'csrfmiddlewaretoken': token or self.token}
+        if content is not None:
+            data['profile_photo'] = SimpleUploadedFile('photo.jpg', content, 'image/jpeg')
+        with self.captureOnCommitCallbacks(execute=True):
+            return (client or self.client).post(
+                self.url, data, secure=True, HTTP_REFERER=f'https://testserver{self.url}'
+            )
+
+    def test_upload_is_stored_under_its_hash(self):
+        content = jpeg('red')
+        response = self.upload(content)
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(self.user.profile_photo.name, f'profile_photos/{digest}.jpg')
+        self.assertEqual(self.stored_files(), [f'{digest}.jpg'])
+        self.assertTrue(self.user.thumbnails)
+
+    def test_identical_uploads_share_one_file(self):
+        other = CustomUser.objects.create_user(email='other@example.com', username='other')
+        client, token = self.login(other)
+        self.upload(jpeg('red'))
+        self.upload(jpeg('red'), client=client, token=token)
+        self.user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.user.profile_photo.name, other.profile_photo.name)
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_oversized_upload_is_refused_before_reading(self):
+        response = self.upload(b'\xff\xd8\xff' + os.urandom(200 * 1024))
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_oversized_upload_is_stopped_while_streaming(self):
+        with override_settings(PROFILE_PHOTO_MAX_SIZE=8 * 1024):
+            # Within the view's allowance for form overhead, so only the
+            # handler can catch it
+            response = self.upload(b'\xff\xd8\xff' + os.urandom(12 * 1024))
+        self.assertContains(response, 'larger than', status_code=400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_bad_magic_bytes_are_rejected(self):
+        response = self.upload(b'<?php echo 1; ?>' + b'x' * 1024)
+        self.assertContains(response, 'JPEG, PNG, GIF or WebP', status_code=400)
+        self.assertEqual(self.stored_files(), [])
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.profile_photo)
+
+    def test_damaged_image_is_rejected(self):
+        response = self.upload(jpeg('blue')[:40])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_csrf_failure_deletes_the_stored_photo(self):
+        response = self.upload(jpeg('green'), token='x' * 64)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replaced_photo_is_deleted_once_unused(self):
+        other = CustomUser.objects.create_user(email='other@example.com', username='other')
+        self.upload(jpeg('red'))
+        self.user.refresh_from_db()
+        shared = self.user.profile_photo.name
+        with self.captureOnCommitCallbacks(execute=True):
+            other.profile_photo.name = shared
+            other.save()
+
+        self.upload(jpeg('blue'))
+        self.assertIn(os.path.basename(shared), self.stored_files())
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertNotIn(os.path.basename(shared), self.stored_files())
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_photo_held_by_an_upload_is_not_deleted(self):
+        content = jpeg('red')
+        handler = uploads.ProfilePhotoUploadHandler()
+        handler.new_file('profile_photo', 'photo.jpg', 'image/jpeg', len(content))
+        handler.receive_data_chunk(content, 0)
+        photo = handler.file_complete(len(content))
+        self.assertFalse(photo.deduplicated)
+        # No user refers to it yet, but the upload still holds it
+        self.assertFalse(uploads.delete_photo_if_unused(photo.storage_name))
+        photo.close()
+        self.assertTrue(uploads.delete_photo_if_unused(photo.storage_name))
+        self.assertEqual(self.stored_files(), [])
@@ -0,0 +1,178 @@
+"""
+Fixed-size renditions of CustomUser.profile_photo.
+
+Pages showing a user's photo should not send the uploaded original, which
+can be several megabytes. When a photo changes, the post_save handler in
+accounts/models.py schedules generate() on a small background thread
+pool once the transaction commits. generate() decodes the original once
+and writes every size in PROFILE_THUMBNAIL_SIZES as WebP and as JPEG (for
+clients without WebP support), then stores their URLs in
+CustomUser.profile_thumbnails. Until then CustomUser.thumbnails is empty
+and templates show a placeholder.
+
+Renditions are named after a hash of the original's content, so their
+URLs never serve different bytes and can be cached forever (see
+LibraryProject.static.serve_thumbnail). Renditions of earlier photos are
+deleted once the new ones are stored.
+
+Settings:
+    PROFILE_THUMBNAIL_SIZES: Dict of rendition name -> (width, height)
+    PROFILE_THUMBNAIL_QUALITY: WebP/JPEG quality, 1-100 (default: 80)
+    PROFILE_THUMBNAIL_WORKERS: Background threads per process (default: 2)
+    PROFILE_THUMBNAIL_BACKGROUND: Generate in the pool rather than inline
+        in on_commit (default: True)
+"""
+
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = 'profile_photos/thumbs'
+
+DEFAULT_SIZES = {'small': (64, 64), 'medium': (256, 256)}
+DEFAULT_QUALITY = 80
+DEFAULT_WORKERS = 2
+
+# (format, extension, save options)
+FORMATS = (
+    ('WEBP', 'webp', {'method': 4}),
+    ('JPEG', 'jpeg', {'optimize': True, 'progressive': True}),
+)
+
+
+def get_sizes():
+    return getattr(settings, 'PROFILE_THUMBNAIL_SIZES', DEFAULT_SIZES)
+
+
+def _storage():
+    from accounts.models import CustomUser
+
+    return CustomUser._meta.get_field('profile_photo').storage
+
+
+def render_thumbnails(data, sizes, quality):
+    """
+    Return {name: {extension: bytes}} for an encoded image and a dict of
+    name -> (width, height). Thumbnails are center-cropped to the size.
+    """
+    image = Image.open(io.BytesIO(data))
+    # JPEG can decode straight to a reduced scale, far faster than a full
+    # decode followed by a resize. Square, since EXIF may rotate the image
+    side = max(max(size) for size in sizes.values())
+    image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        # Flatten transparency onto white: JPEG has no alpha channel
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+
+    renditions = {}
+    for name, size in sizes.items():
+        thumbnail = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        encoded = {}
+        for image_format, extension, options in FORMATS:
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, image_format, quality=quality, **options)
+            encoded[extension] = buffer.getvalue()
+        renditions[name] = encoded
+    return renditions
+
+
+def generate(user_id, source_name):
+    """
+    Build and store the renditions of a user's photo, provided the photo
+    is still source_name. Returns True if renditions were stored.
+    """
+    from accounts.models import CustomUser
+
+    storage = _storage()
+    with storage.open(source_name, 'rb') as source:
+        data = source.read()
+    key = hashlib.sha256(data).hexdigest()[:16]
+    sizes = get_sizes()
+    quality = getattr(settings, 'PROFILE_THUMBNAIL_QUALITY', DEFAULT_QUALITY)
+
+    directory = f'{THUMBNAIL_DIR}/{user_id}'
+    renditions = {}
+    for name, encoded in render_thumbnails(data, sizes, quality).items():
+        width, height = sizes[name]
+        rendition = {'width': width, 'height': height}
+        for extension, content in encoded.items():
+            file_name = f'{directory}/{key}-{name}-{width}x{height}.{extension}'
+            if not storage.exists(file_name):
+                file_name = storage.save(file_name, ContentFile(content))
+            rendition[extension] = storage.url(file_name)
+        renditions[name] = rendition
+
+    # The photo may have changed again while this one was rendered
+    stored = CustomUser.objects.filter(pk=user_id, profile_photo=source_name).update(
+        profile_thumbnails={'source': source_name, 'key': key, 'renditions': renditions}
+    )
+    if stored:
+        delete_renditions(user_id, keep_key=key)
+    return bool(stored)
+
+
+def delete_renditions(user_id, keep_key=None):
+    """Delete a user's rendition files, except those of keep_key."""
+    storage = _storage()
+    directory = f'{THUMBNAIL_DIR}/{user_id}'
+    try:
+        _, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file_name in files:
+        if keep_key is None or not file_name.startswith(f'{keep_key}-'):
+            storage.delete(f'{directory}/{file_name}')
+
+
+def _generate_logged(user_id, source_name):
+    try:
+        generate(user_id, source_name)
+    except Exception:
+        # The placeholder stays; generate_thumbnails can retry later
+        logger.exception('Could not generate thumbnails of %s for user %s', source_name, user_id)
+
+
+def _run(user_id, source_name):
+    try:
+        _generate_logged(user_id, source_name)
+    finally:
+        # Each worker thread opens its own database connection
+        connection.close()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PROFILE_THUMBNAIL_WORKERS', DEFAULT_WORKERS),
+                    thread_name_prefix='thumbnails',
+                )
+    return _executor
+
+
+def schedule(user_id, source_name):
+    """Generate the renditions of a new photo in the background (or inline)."""
+    if getattr(settings, 'PROFILE_THUMBNAIL_BACKGROUND', True):
+        return _get_executor().submit(_run, user_id, source_name)
+    _generate_logged(user_id, source_name)
+    return None
@@ -0,0 +1,311 @@
+"""
+Streaming upload handler for CustomUser.profile_photo.
+
+Django's default handlers buffer each upload in memory or a temporary file
+and hand it to the form only once the whole request body has been read,
+so an oversized or bogus file ties up a worker until it is complete.
+ProfilePhotoUploadHandler instead writes each chunk of the photo straight
+into the profile photo directory as it arrives and:
+- stops the upload as soon as it grows past PROFILE_PHOTO_MAX_SIZE
+- stops it as soon as its first bytes are not those of a JPEG, PNG, GIF
+  or WebP image
+- hashes it on the fly and names the stored file after the hash, so
+  identical photos are stored once and a repeated upload keeps the
+  existing file
+
+Once the file is complete Pillow checks its header (see
+PROFILE_PHOTO_MAX_PIXELS) before it is moved to its final name. The view
+receives a StoredPhoto whose storage_name can be assigned to
+profile_photo directly; nothing is copied again. When the upload is
+rejected, handler.error holds the reason and no file is left behind; a
+view that refuses a stored photo (e.g. on a CSRF failure, which can only
+be detected once the body is read) calls StoredPhoto.discard().
+
+Because stored photos can be shared between users, they must not be
+removed with FieldFile.delete(). delete_photo_if_unused() removes a photo
+once no user refers to it; the post_save and post_delete handlers in
+accounts/models.py call it for replaced photos. A StoredPhoto holds a
+shared flock() on its file until it is closed (with the request, after
+the view saved it), and deletion takes an exclusive lock without waiting
+and skips the file if it cannot, so a photo is never deleted between an
+upload finding it and the new reference being committed.
+
+The handler needs a storage with local paths (FileSystemStorage).
+
+Settings:
+    PROFILE_PHOTO_MAX_SIZE: Largest accepted photo in bytes (default: 5 MB)
+    PROFILE_PHOTO_MAX_PIXELS: Largest accepted width * height
+        (default: 40 megapixels)
+"""
+
+import hashlib
+import os
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: uploads and deletions are not coordinated
+    fcntl = None
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from PIL import Image
+
+
+DEFAULT_MAX_SIZE = 5 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 40_000_000
+
+# Bytes needed to recognise every accepted format
+MAGIC_LENGTH = 12
+
+
+def get_max_size():
+    return getattr(settings, 'PROFILE_PHOTO_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+
+def _storage():
+    from accounts.models import CustomUser
+
+    return CustomUser._meta.get_field('profile_photo').storage
+
+
+def sniff_image_type(header):
+    """Return the file extension for an image's first bytes, or None."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _open_locked(path):
+    """
+    Return a descriptor of path holding a shared lock, or None if the file
+    does not exist (any more).
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_SH)
+    try:
+        # A deletion may have unlinked the file before the lock was granted
+        if os.path.samestat(os.stat(path), os.fstat(fd)):
+            return fd
+    except FileNotFoundError:
+        pass
+    os.close(fd)
+    return None
+
+
+def delete_photo_if_unused(storage_name):
+    """
+    Delete a stored photo unless a user refers to it or an upload holds
+    it. Returns True if the file was deleted.
+    """
+    from accounts.models import CustomUser
+
+    try:
+        path = _storage().path(storage_name)
+        fd = os.open(path, os.O_RDONLY)
+    except (FileNotFoundError, NotImplementedError):
+        return False
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # An upload found it and is about to save a reference
+                return False
+        if CustomUser.objects.filter(profile_photo=storage_name).exists():
+            return False
+        os.remove(path)
+        return True
+    finally:
+        os.close(fd)
+
+
+class StoredPhoto(UploadedFile):
+    """
+    A profile photo the upload handler already stored.
+
+    storage_name is its name in the profile photo storage; deduplicated is
+    True when an identical photo was stored before. Until close(), which
+    Django calls when the request ends, the photo is protected from
+    delete_photo_if_unused().
+    """
+
+    def __init__(self, storage_name, size, content_type, charset, digest, deduplicated, lock_fd):
+        super().__init__(None, os.path.basename(storage_name), content_type, size, charset)
+        self.storage_name = storage_name
+        self.digest = digest
+        self.deduplicated = deduplicated
+        self._lock_fd = lock_fd
+
+    def open(self, mode='rb'):
+        self.file = _storage().open(self.storage_name, mode)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def discard(self):
+        """Give up the photo, deleting it unless it is used elsewhere."""
+        self.close()
+        delete_photo_if_unused(self.storage_name)
+
+
+class ProfilePhotoUploadHandler(FileUploadHandler):
+    """
+    Stream the file of field_name into the profile photo storage.
+
+    Files of other fields are passed on to the next handler. Install it
+    before request.POST or request.FILES is read, in place of the default
+    handlers:
+
+        request.upload_handlers = [ProfilePhotoUploadHandler(request)]
+    """
+
+    def __init__(self, request=None, field_name='profile_photo'):
+        from accounts.models import CustomUser
+
+        super().__init__(request)
+        self.field_name = field_name
+        self.max_size = get_max_size()
+        self.max_pixels = getattr(settings, 'PROFILE_PHOTO_MAX_PIXELS', DEFAULT_MAX_PIXELS)
+        field = CustomUser._meta.get_field('profile_photo')
+        self.storage = field.storage
+        self.directory = field.upload_to.strip('/')
+        self.error = None
+        self.active = False
+        self.received = False
+        self.part_path = None
+        self.file = None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.field_name
+        if not self.active:
+            return
+        if self.received:
+            self._reject('Upload a single photo.', connection_reset=False)
+        self.received = True
+        directory = self.storage.path(self.directory)
+        os.makedirs(directory, exist_ok=True)
+        # Written next to its final name, so moving it there is a rename
+        fd, self.part_path = tempfile.mkstemp(prefix='.upload-', suffix='.part', dir=directory)
+        # MultiPartParser closes handler.file when an upload is stopped
+        self.file = os.fdopen(fd, 'wb')
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.header = b''
+        self.extension = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            # The client sent more than its Content-Length promised (or
+            # none): stop reading rather than drain the rest
+            self._reject(self._too_large_message(), connection_reset=True)
+        if self.extension is None and len(self.header) < MAGIC_LENGTH:
+            self.header += raw_data[:MAGIC_LENGTH - len(self.header)]
+            if len(self.header) == MAGIC_LENGTH:
+                self._check_type()
+        self.hash.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        self.file.close()
+        if self.extension is None:
+            # Shorter than MAGIC_LENGTH
+            self._check_type()
+        try:
+            with Image.open(self.part_path) as image:
+                width, height = image.size
+                if width * height > self.max_pixels:
+                    self._discard()
+                    self.error = 'The photo has too many pixels.'
+                    return None
+                image.verify()
+        except Exception:
+            self._discard()
+            self.error = 'The photo is damaged or not an image.'
+            return None
+
+        digest = self.hash.hexdigest()
+        storage_name = f'{self.directory}/{digest}.{self.extension}'
+        lock_fd, deduplicated = self._claim(self.storage.path(storage_name))
+        return StoredPhoto(
+            storage_name, self.size, self.content_type, self.charset, digest,
+            deduplicated, lock_fd,
+        )
+
+    def _claim(self, final_path):
+        """
+        Give the part file its final name unless an identical photo has it,
+        and lock the result. Returns (descriptor, deduplicated).
+        """
+        # mkstemp creates the file readable by its owner only
+        os.chmod(self.part_path, self.storage.file_permissions_mode or 0o644)
+        while True:
+            try:
+                # Unlike a rename, fails if the name exists: of two
+                # identical uploads exactly one creates the file
+                os.link(self.part_path, final_path)
+                deduplicated = False
+            except FileExistsError:
+                deduplicated = True
+            lock_fd = _open_locked(final_path)
+            if lock_fd is not None:
+                break
+            # Deleted as unused in the meantime: store it again
+        self._discard()
+        return lock_fd, deduplicated
+
+    def upload_interrupted(self):
+        if self.active:
+            self.file.close()
+            self._discard()
+            self.active = False
+
+    def _check_type(self):
+        self.extension = sniff_image_type(self.header)
+        if self.extension is None:
+            # Within Content-Length, which the view has checked, so the
+            # rest of the body is drained and the error page can be sent
+            self._reject('Upload a JPEG, PNG, GIF or WebP image.', connection_reset=False)
+
+    def _too_large_message(self):
+        return f'The photo is larger than {self.max_size // (1024 * 1024)} MB.'
+
+    def _reject(self, message, connection_reset):
+        self.error = message
+        self.active = False
+        if self.file is not None:
+            self.file.close()
+        self._discard()
+        raise StopUpload(connection_reset=connection_reset)
+
+    def _discard(self):
+        if self.part_path:
+            try:
+                os.remove(self.part_path)
+            except FileNotFoundError:
+                pass
+            self.part_path = None
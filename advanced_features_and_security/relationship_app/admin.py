@@ -4,7 +4,7 @@ from .models import Author, Book, Library, Librarian, UserProfile
 
 @admin.register(Author)
 class AuthorAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'book_count')
     search_fields = ('name',)
 
 
@@ -17,7 +17,7 @@ class BookAdmin(admin.ModelAdmin):
 
 @admin.register(Library)
 class LibraryAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'book_count')
     search_fields = ('name',)
 
 
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class RelationshipAppConfig(AppConfig):
     name = 'relationship_app'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from LibraryProject.sqlite import configure_sqlite_connection
+
+        # Apply the SQLite performance profile to every new connection
+        connection_created.connect(
+            configure_sqlite_connection,
+            dispatch_uid='LibraryProject.sqlite.configure_sqlite_connection',
+        )
@@ -0,0 +1,117 @@
+"""
+Streaming export of the catalog: every book with its author and the names
+of the libraries holding it.
+
+Rows are read in primary-key ranges with values_list(), so no model
+instances are built and only one chunk is in memory at a time, whatever
+the size of the catalog. Library memberships for a chunk are fetched with
+one range query on the through table.
+
+Used by the export_catalog view (CSV / NDJSON over HTTP) and by
+`python manage.py export_catalog`, which can also write Parquet. CSV and
+NDJSON output use the column names load_catalog reads, so an export can
+be loaded back.
+"""
+
+import csv
+import io
+import json
+
+from relationship_app.models import Book, Library
+
+
+COLUMNS = ('id', 'title', 'author_id', 'author', 'libraries')
+DEFAULT_CHUNK_SIZE = 2000
+
+# Separator of library names in a CSV cell, as expected by load_catalog
+CSV_LIBRARY_SEPARATOR = ';'
+
+
+def iter_catalog_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of (id, title, author_id, author, libraries) tuples in
+    primary-key order, where libraries is a sorted list of names.
+    """
+    Membership = Library.books.through
+    last_pk = 0
+    while True:
+        books = list(
+            Book.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('id', 'title', 'author_id', 'author__name')[:chunk_size]
+        )
+        if not books:
+            return
+        first_pk, last_pk = books[0][0], books[-1][0]
+
+        libraries = {}
+        memberships = (
+            Membership.objects
+            .filter(book_id__gte=first_pk, book_id__lte=last_pk)
+            .values_list('book_id', 'library__name')
+        )
+        for book_id, library_name in memberships:
+            libraries.setdefault(book_id, []).append(library_name)
+
+        yield [
+            (pk, title, author_id, author, sorted(libraries.get(pk, ())))
+            for pk, title, author_id, author in books
+        ]
+
+
+def iter_csv(chunks):
+    """Yield CSV text for chunks from iter_catalog_chunks(), one string per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        for pk, title, author_id, author, libraries in chunk:
+            writer.writerow([pk, title, author_id, author, CSV_LIBRARY_SEPARATOR.join(libraries)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(chunks):
+    """Yield NDJSON text for chunks from iter_catalog_chunks(), one string per chunk."""
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False) + '\n'
+            for row in chunk
+        )
+
+
+def write_parquet(path, chunks):
+    """
+    Write chunks from iter_catalog_chunks() to a Parquet file, one row
+    group per chunk. Requires the optional pyarrow package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise ImportError('Parquet export requires the pyarrow package') from exc
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('title', pa.string()),
+        ('author_id', pa.int64()),
+        # Author names repeat across books; dictionary encoding stores each once
+        ('author', pa.dictionary(pa.int32(), pa.string())),
+        ('libraries', pa.list_(pa.string())),
+    ])
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pa.table(
+                {
+                    'id': pa.array(columns[0], pa.int64()),
+                    'title': pa.array(columns[1], pa.string()),
+                    'author_id': pa.array(columns[2], pa.int64()),
+                    'author': pa.array(columns[3], pa.string()).dictionary_encode(),
+                    'libraries': pa.array(columns[4], pa.list_(pa.string())),
+                },
+                schema=schema,
+            ))
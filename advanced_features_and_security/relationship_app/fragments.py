@@ -0,0 +1,83 @@
+"""
+Process-local cache for rendered template fragments.
+
+Dashboard tables are rebuilt on every request even though they only
+change when the underlying objects do. The {% cache_fragment %} tag
+(templatetags/fragment_cache.py) stores rendered markup here, keyed by the
+fragment name, the values it varies on and the change versions of the
+models it depends on (see versions.py). A change to any of those models
+gives the fragment a new key, so stale markup is never served; it just
+ages out of the LRU.
+
+Settings:
+    FRAGMENT_CACHE_MAX_ENTRIES: Maximum number of fragments (default: 5000)
+    FRAGMENT_CACHE_MAX_BYTES: Maximum total size of fragments (default: 16 MB)
+"""
+
+import threading
+
+from django.conf import settings
+
+from LibraryProject.lru import LRU
+
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class FragmentCache:
+    """
+    Thread-safe LRU of rendered fragments, bounded by entry count and by
+    total size, with hit/miss/eviction counters.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = LRU(max_entries, max_weight=max_bytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def evictions(self):
+        return self._entries.evictions
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return content
+
+    def set(self, key, content):
+        with self._lock:
+            # Fragments larger than max_bytes are not kept
+            self._entries.set(key, content)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the counters and current occupancy as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._entries.weight,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+
+fragment_cache = FragmentCache(
+    max_entries=getattr(settings, 'FRAGMENT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+    max_bytes=getattr(settings, 'FRAGMENT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES),
+)
@@ -0,0 +1,139 @@
+"""
+Batched, memoized loaders for the catalog relationships.
+
+Looking relationships up one id at a time costs one or two queries per id
+(see the original query_samples helpers). The loaders here follow the
+DataLoader pattern instead:
+- callers ask for many keys at once with load_many(), or queue keys with
+  prime_keys() and resolve them later in a single batch
+- each loader answers a batch with one query per relation
+- answers are memoized, so a key is never fetched twice during the
+  lifetime of the loader (normally one request, see get_loaders())
+
+Keys are normalized with the primary key field's to_python(), so ids taken
+straight from a URL or GET parameter ('2') find the same rows, and share
+the same memo, as integer ids. Results are keyed by the ids as given.
+
+Ids that match no row get the loader's default (an empty list, or None),
+without an extra query to tell a missing row from one with no relations.
+
+Example:
+    loaders = get_loaders(request)
+    books = loaders.books_by_author.load_many([1, 2, 3])   # one query
+    books[2]                                               # list of Book
+    loaders.books_by_author.load('2')                      # no query
+"""
+
+from relationship_app.models import Author, Book, Librarian, Library
+
+
+class BatchLoader:
+    """
+    Memoizing loader that resolves keys in batches.
+
+    Args:
+        batch_fn: Callable taking a list of keys and returning a dict of
+            key -> value for the keys it found
+        default: Factory for the value of keys batch_fn did not return
+        normalize: Callable converting a key to the form batch_fn returns,
+            e.g. a primary key field's to_python (default: unchanged)
+    """
+
+    def __init__(self, batch_fn, default=lambda: None, normalize=None):
+        self.batch_fn = batch_fn
+        self.default = default
+        self.normalize = normalize or (lambda key: key)
+        self._cache = {}
+        self._queue = []
+
+    def prime_keys(self, keys):
+        """Queue keys to be fetched by the next load(), load_many() or dispatch()."""
+        normalized = (self.normalize(key) for key in keys)
+        self._queue.extend(key for key in normalized if key not in self._cache)
+
+    def dispatch(self):
+        """Fetch every queued key that is not memoized yet, in one batch."""
+        missing = list(dict.fromkeys(key for key in self._queue if key not in self._cache))
+        self._queue = []
+        if not missing:
+            return
+        found = self.batch_fn(missing)
+        for key in missing:
+            self._cache[key] = found[key] if key in found else self.default()
+
+    def load_many(self, keys):
+        """Return a dict of key -> value for the given keys, as given."""
+        keys = list(keys)
+        self.prime_keys(keys)
+        self.dispatch()
+        return {key: self._cache[self.normalize(key)] for key in keys}
+
+    def load(self, key):
+        return self.load_many([key])[key]
+
+    def clear(self, key=None):
+        """Forget one memoized key, or all of them."""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(self.normalize(key), None)
+
+
+# ============== BATCH FUNCTIONS ==============
+# Each runs exactly one query for the whole batch.
+
+def _books_by_author(author_ids):
+    grouped = {}
+    books = Book.objects.filter(author_id__in=author_ids).select_related('author').order_by('title', 'id')
+    for book in books:
+        grouped.setdefault(book.author_id, []).append(book)
+    return grouped
+
+
+def _books_in_library(library_ids):
+    grouped = {}
+    memberships = (
+        Library.books.through.objects
+        .filter(library_id__in=library_ids)
+        .select_related('book__author')
+        .order_by('book__title', 'book_id')
+    )
+    for membership in memberships:
+        grouped.setdefault(membership.library_id, []).append(membership.book)
+    return grouped
+
+
+def _librarian_for_library(library_ids):
+    return {
+        librarian.library_id: librarian
+        for librarian in Librarian.objects.filter(library_id__in=library_ids)
+    }
+
+
+class RelationshipLoaders:
+    """
+    The set of loaders for one unit of work (usually one request).
+
+    Attributes:
+        books_by_author: author id -> list of Book
+        books_in_library: library id -> list of Book
+        librarian_for_library: library id -> Librarian or None
+    """
+
+    def __init__(self):
+        author_id = Author._meta.pk.to_python
+        library_id = Library._meta.pk.to_python
+        self.books_by_author = BatchLoader(_books_by_author, default=list, normalize=author_id)
+        self.books_in_library = BatchLoader(_books_in_library, default=list, normalize=library_id)
+        self.librarian_for_library = BatchLoader(_librarian_for_library, normalize=library_id)
+
+
+def get_loaders(request):
+    """
+    Return the loaders memoized on this request, creating them on first use.
+    """
+    loaders = getattr(request, '_relationship_loaders', None)
+    if loaders is None:
+        loaders = RelationshipLoaders()
+        request._relationship_loaders = loaders
+    return loaders
@@ -0,0 +1,114 @@
+"""
+Management command to count the queries issued by the login and register flows.
+
+Usage:
+    python manage.py benchmark_auth_queries
+    python manage.py benchmark_auth_queries --iterations 20
+
+The command runs against a throwaway test database, so it never touches
+real data. Each flow is measured twice:
+- before: with the original save_user_profile handler, which saved the
+  profile on every user save
+- after: with the current handler, which only writes dirty profiles
+"""
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.signals import post_save
+from django.conf import settings
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from relationship_app import models as relationship_models
+
+
+PASSWORD = 'Bench-Passw0rd!'
+
+
+def legacy_save_user_profile(sender, instance, **kwargs):
+    """The save_user_profile handler as it was before dirty tracking."""
+    instance.userprofile.save()
+
+
+class Command(BaseCommand):
+    help = 'Count queries issued by the login and register flows before and after profile dirty tracking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=10,
+            help='Number of registrations and logins per mode (default: 10)',
+        )
+
+    def handle(self, *args, **options):
+        iterations = max(1, options['iterations'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {
+                'before': self._run_mode(legacy=True, iterations=iterations),
+                'after': self._run_mode(legacy=False, iterations=iterations),
+            }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'{"flow":<10}{"mode":<8}{"queries":>9}{"profile":>9}{"ms":>9}')
+        for flow in ('register', 'login'):
+            for mode in ('before', 'after'):
+                queries, profile_queries, elapsed = results[mode][flow]
+                self.stdout.write(
+                    f'{flow:<10}{mode:<8}{queries:>9.1f}{profile_queries:>9.1f}{elapsed:>9.1f}'
+                )
+        self.stdout.write('(queries, profile-table queries and milliseconds are per request)')
+
+    def _run_mode(self, legacy, iterations):
+        """Measure both flows with either the legacy or the current handler."""
+        handler = relationship_models.save_user_profile
+        user_model = settings.AUTH_USER_MODEL
+        if legacy:
+            post_save.disconnect(handler, sender=user_model)
+            post_save.connect(legacy_save_user_profile, sender=user_model)
+        try:
+            emails = []
+            register = []
+            for _ in range(iterations):
+                email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+                emails.append(email)
+                register.append(self._measure(Client(), 'register', {
+                    'email': email,
+                    'username': email.split('@')[0],
+                    'password1': PASSWORD,
+                    'password2': PASSWORD,
+                }))
+            login = [
+                self._measure(Client(), 'login', {'username': email, 'password': PASSWORD})
+                for email in emails
+            ]
+        finally:
+            if legacy:
+                post_save.disconnect(legacy_save_user_profile, sender=user_model)
+                post_save.connect(handler, sender=user_model)
+        return {'register': self._average(register), 'login': self._average(login)}
+
+    def _measure(self, client, url_name, data):
+        profile_table = relationship_models.UserProfile._meta.db_table
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = client.post(reverse(url_name), data, secure=True)
+            elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code != 302:
+            raise RuntimeError(f'{url_name} failed with status {response.status_code}')
+        profile_queries = sum(profile_table in query['sql'] for query in captured.captured_queries)
+        return len(captured), profile_queries, elapsed
+
+    @staticmethod
+    def _average(samples):
+        count = len(samples)
+        return tuple(sum(values) / count for values in zip(*samples))
@@ -0,0 +1,177 @@
+"""
+Management command to compare the throughput of the session engines.
+
+Usage:
+    python manage.py benchmark_sessions
+    python manage.py benchmark_sessions --engine db --engine cached_db --requests 2000
+
+The command runs against a throwaway test database and temporary cache
+files, so it never touches real data or sessions. For each engine it measures:
+- logins per second: a login (force_login, so password hashing does not
+  hide the session write) followed by a logout
+- requests per second of an authenticated GET of --path, and the number
+  of django_session queries each request makes
+
+It then seeds --expired expired sessions and compares deleting them in
+one statement, as Django's clearsessions does, with the batched cleanup
+of LibraryProject.sessions. The longest statement is how long other
+writers wait for the SQLite write lock.
+"""
+
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from LibraryProject.cache import relocate_caches
+from LibraryProject.sessions import delete_expired_batch
+
+
+ENGINES = {
+    'db': 'LibraryProject.sessions.db',
+    'cached_db': 'LibraryProject.sessions.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+
+class Command(BaseCommand):
+    help = 'Benchmark logins, authenticated requests and expired-session cleanup per session engine'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--engine',
+            action='append',
+            choices=list(ENGINES),
+            help='Engine to benchmark, may be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Authenticated requests per engine (default: 500)',
+        )
+        parser.add_argument(
+            '--logins',
+            type=int,
+            default=200,
+            help='Login/logout cycles per engine (default: 200)',
+        )
+        parser.add_argument(
+            '--path',
+            help="Page requested by the logged-in user (default: the book list)",
+        )
+        parser.add_argument(
+            '--expired',
+            type=int,
+            default=20000,
+            help='Expired sessions seeded for the cleanup comparison (default: 20000, 0 to skip)',
+        )
+
+    def handle(self, *args, **options):
+        engines = options['engine'] or list(ENGINES)
+        if options['requests'] < 1 or options['logins'] < 1:
+            raise CommandError('--requests and --logins must be positive')
+        path = options['path'] or reverse('list_books')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as directory, override_settings(
+                CACHES=relocate_caches(settings.CACHES, directory)
+            ):
+                user = self._create_user()
+                self.stdout.write(f'{"engine":<16}{"logins/s":>10}{"requests/s":>12}{"session queries":>17}')
+                for name in engines:
+                    with override_settings(SESSION_ENGINE=ENGINES[name]):
+                        logins = self._logins(user, options['logins'])
+                        requests, queries = self._requests(user, path, options['requests'])
+                    self.stdout.write(f'{name:<16}{logins:>10.0f}{requests:>12.0f}{queries:>17.1f}')
+                self.stdout.write('(session queries are per request)')
+
+            if options['expired']:
+                self._cleanup(options['expired'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    @staticmethod
+    def _create_user():
+        from django.contrib.auth import get_user_model
+
+        email = f'bench-{uuid.uuid4().hex[:12]}@example.com'
+        return get_user_model().objects.create_user(email=email, username=email.split('@')[0])
+
+    @staticmethod
+    def _logins(user, count):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        client = Client()
+        started = time.perf_counter()
+        for _ in range(count):
+            client.force_login(user)
+            client.logout()
+        return count / (time.perf_counter() - started)
+
+    @staticmethod
+    def _requests(user, path, count):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        client = Client()
+        client.force_login(user)
+        # The first request warms the session cache
+        response = client.get(path, secure=True)
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered with status {response.status_code}')
+
+        started = time.perf_counter()
+        for _ in range(count):
+            client.get(path, secure=True)
+        rate = count / (time.perf_counter() - started)
+
+        with CaptureQueriesContext(connection) as captured:
+            client.get(path, secure=True)
+        session_table = Session._meta.db_table
+        queries = sum(session_table in query['sql'] for query in captured.captured_queries)
+        return rate, queries
+
+    def _cleanup(self, count):
+        batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 500)
+
+        self._seed_expired(count)
+        started = time.perf_counter()
+        Session.objects.filter(expire_date__lt=timezone.now()).delete()
+        sweep = (time.perf_counter() - started) * 1000
+
+        self._seed_expired(count)
+        batches = []
+        while True:
+            started = time.perf_counter()
+            deleted = delete_expired_batch(Session, batch_size)
+            batches.append((time.perf_counter() - started) * 1000)
+            if deleted < batch_size:
+                break
+
+        self.stdout.write(
+            f'Deleting {count} expired sessions: one statement {sweep:.1f}ms; '
+            f'{len(batches)} batches of {batch_size}, longest {max(batches):.1f}ms'
+        )
+
+    @staticmethod
+    def _seed_expired(count):
+        expired = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(
+            [
+                Session(session_key=uuid.uuid4().hex, session_data='', expire_date=expired)
+                for _ in range(count)
+            ],
+            batch_size=1000,
+        )
@@ -0,0 +1,192 @@
+"""
+Management command to compare read/write throughput of the SQLite profiles.
+
+Usage:
+    python manage.py benchmark_sqlite_profiles
+    python manage.py benchmark_sqlite_profiles --profile default --profile wal --duration 10
+
+Each profile gets a fresh database file in a temporary directory, seeded
+with a book table shaped like relationship_app_book. Reader threads then
+run point lookups and short title range scans while writer threads insert
+books one transaction at a time (as add_book does), all for a fixed
+duration. The real database is never touched.
+
+Reported per profile: reads and writes per second, write latency (median
+and 99th percentile) and the number of "database is locked" errors.
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from LibraryProject.sqlite import PROFILES, apply_pragmas, get_pragmas
+
+
+SCHEMA = [
+    'CREATE TABLE book (id INTEGER PRIMARY KEY AUTOINCREMENT, title VARCHAR(200) NOT NULL, author_id INTEGER NOT NULL)',
+    'CREATE INDEX book_title_id_idx ON book (title, id)',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite reads and writes under each connection profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile',
+            action='append',
+            choices=sorted(PROFILES),
+            help='Profile to benchmark, may be repeated (default: all)',
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=3.0,
+            help='Seconds of load per profile (default: 3)',
+        )
+        parser.add_argument(
+            '--readers',
+            type=int,
+            default=4,
+            help='Number of reader threads (default: 4)',
+        )
+        parser.add_argument(
+            '--writers',
+            type=int,
+            default=2,
+            help='Number of writer threads (default: 2)',
+        )
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Number of books seeded before the run (default: 20000)',
+        )
+
+    def handle(self, *args, **options):
+        profiles = options['profile'] or sorted(PROFILES)
+        if options['duration'] <= 0:
+            raise CommandError('--duration must be positive')
+
+        self.stdout.write(
+            f'{"profile":<13}{"reads/s":>10}{"writes/s":>10}'
+            f'{"write p50":>11}{"write p99":>11}{"locked":>8}'
+        )
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                result = self._run(
+                    os.path.join(directory, 'bench.sqlite3'),
+                    get_pragmas(profile, overrides={}),
+                    options,
+                )
+            reads, writes, latencies, locked = result
+            duration = options['duration']
+            p50, p99 = self._percentiles(latencies, (50, 99))
+            self.stdout.write(
+                f'{profile:<13}{reads / duration:>10.0f}{writes / duration:>10.0f}'
+                f'{p50:>9.2f}ms{p99:>9.2f}ms{locked:>8}'
+            )
+
+    def _connect(self, path, pragmas):
+        # Same connection arguments as Django's SQLite backend
+        options = settings.DATABASES['default'].get('OPTIONS', {})
+        connection = sqlite3.connect(
+            path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=options.get('cached_statements', 128),
+        )
+        apply_pragmas(connection, pragmas)
+        return connection
+
+    def _run(self, path, pragmas, options):
+        connection = self._connect(path, pragmas)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO book (title, author_id) VALUES (?, ?)',
+            ((f'Title {i:07d}', i % 500) for i in range(options['rows'])),
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        totals = {'reads': 0, 'writes': 0, 'locked': 0}
+        latencies = []
+        max_id = options['rows']
+
+        def reader():
+            conn = self._connect(path, pragmas)
+            reads = locked = 0
+            while not stop.is_set():
+                try:
+                    conn.execute('SELECT id, title FROM book WHERE id = ?', (random.randint(1, max_id),)).fetchall()
+                    start = f'Title {random.randint(0, max_id):07d}'
+                    conn.execute(
+                        'SELECT id, title FROM book WHERE title >= ? ORDER BY title, id LIMIT 50', (start,)
+                    ).fetchall()
+                    reads += 2
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    locked += 1
+            conn.close()
+            with lock:
+                totals['reads'] += reads
+                totals['locked'] += locked
+
+        def writer():
+            conn = self._connect(path, pragmas)
+            writes = locked = 0
+            own_latencies = []
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    conn.execute('BEGIN')
+                    conn.execute(
+                        'INSERT INTO book (title, author_id) VALUES (?, ?)',
+                        (f'New {random.random():.12f}', random.randint(0, 499)),
+                    )
+                    conn.execute('COMMIT')
+                    writes += 1
+                    own_latencies.append((time.perf_counter() - started) * 1000)
+                except sqlite3.OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    locked += 1
+            conn.close()
+            with lock:
+                totals['writes'] += writes
+                totals['locked'] += locked
+                latencies.extend(own_latencies)
+
+        threads = [threading.Thread(target=reader) for _ in range(max(0, options['readers']))]
+        threads += [threading.Thread(target=writer) for _ in range(max(0, options['writers']))]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        return totals['reads'], totals['writes'], latencies, totals['locked']
+
+    @staticmethod
+    def _percentiles(values, percents):
+        if not values:
+            return tuple(0.0 for _ in percents)
+        ordered = sorted(values)
+        return tuple(
+            ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+            for percent in percents
+        )
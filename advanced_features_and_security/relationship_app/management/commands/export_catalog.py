@@ -0,0 +1,92 @@
+"""
+Management command to export the catalog as CSV, NDJSON or Parquet.
+
+Usage:
+    python manage.py export_catalog catalog.csv
+    python manage.py export_catalog catalog.parquet
+    python manage.py export_catalog - --format ndjson | gzip > catalog.ndjson.gz
+
+Each record holds the book id and title, the author id and name, and the
+names of the libraries holding the book (see relationship_app/export.py).
+Rows are read and written one chunk at a time, so memory use does not
+grow with the catalog. CSV and NDJSON files can be loaded back with
+load_catalog. Parquet output is columnar and compressed, and needs the
+optional pyarrow package.
+"""
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from relationship_app import export
+
+
+class Command(BaseCommand):
+    help = 'Export books with their authors and libraries as CSV, NDJSON or Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file, or '-' for standard output")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson', 'parquet'],
+            help='Output format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=export.DEFAULT_CHUNK_SIZE,
+            help=f'Number of books read per query (default: {export.DEFAULT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        output_format = options['format'] or self._guess_format(path)
+        chunk_size = max(1, options['chunk_size'])
+
+        self.rows = 0
+        chunks = self._counted(export.iter_catalog_chunks(chunk_size))
+        started = time.perf_counter()
+        if output_format == 'parquet':
+            if path == '-':
+                raise CommandError('Parquet output needs a file path')
+            try:
+                export.write_parquet(path, chunks)
+            except ImportError as exc:
+                raise CommandError(str(exc))
+        else:
+            pieces = export.iter_csv(chunks) if output_format == 'csv' else export.iter_ndjson(chunks)
+            self._write_text(path, pieces)
+
+        elapsed = time.perf_counter() - started
+        rate = self.rows / elapsed if elapsed else 0
+        # Keep standard output clean when the export itself goes there
+        out = self.stderr if path == '-' else self.stdout
+        out.write(self.style.SUCCESS(
+            f'Exported {self.rows} books as {output_format} in {elapsed:.1f}s, {rate:.0f} books/s'
+        ))
+
+    @staticmethod
+    def _guess_format(path):
+        if path.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        if path.endswith('.parquet'):
+            return 'parquet'
+        if path.endswith('.csv'):
+            return 'csv'
+        raise CommandError('Cannot guess the output format, pass --format')
+
+    def _counted(self, chunks):
+        for chunk in chunks:
+            self.rows += len(chunk)
+            yield chunk
+
+    @staticmethod
+    def _write_text(path, pieces):
+        stream = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        try:
+            for piece in pieces:
+                stream.write(piece)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
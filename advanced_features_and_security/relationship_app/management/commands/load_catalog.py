@@ -0,0 +1,209 @@
+"""
+Management command to bulk load a book catalog from CSV or NDJSON.
+
+Usage:
+    python manage.py load_catalog catalog.csv
+    python manage.py load_catalog catalog.ndjson --batch-size 5000
+    cat catalog.ndjson | python manage.py load_catalog - --format ndjson
+
+Each record needs a title and an author name, and may list the libraries
+holding the book:
+    CSV:    title,author,libraries       (libraries separated by ';')
+    NDJSON: {"title": "...", "author": "...", "libraries": ["Main", "East"]}
+
+Authors and libraries are matched by name and created when missing.
+The file is read as a stream and processed one batch at a time, each in
+its own transaction:
+- author and library names are resolved through bounded in-memory
+  name -> id maps; names not in the map are looked up and the missing
+  ones created with one bulk_create per batch
+- books are inserted with bulk_create
+- library memberships are inserted directly into the through table
+- the denormalized book counters of the touched authors and libraries
+  are recomputed, the new books are added to the search index and the
+  catalog change versions are bumped, since bulk_create does not send
+  signals
+"""
+
+import csv
+import json
+import sys
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from LibraryProject.lru import LRU
+from relationship_app import search, versions
+from relationship_app.models import (
+    Author,
+    Book,
+    Library,
+    refresh_author_book_counts,
+    refresh_library_book_counts,
+)
+
+
+class Command(BaseCommand):
+    help = 'Bulk load authors, books and library memberships from CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for standard input")
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'ndjson'],
+            help='Input format (default: guessed from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of books inserted per transaction (default: 2000)',
+        )
+        parser.add_argument(
+            '--name-cache-size',
+            type=int,
+            default=100000,
+            help='Maximum number of author names kept in memory (default: 100000)',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self._guess_format(path)
+        batch_size = max(1, options['batch_size'])
+
+        # Bounded name -> pk maps: evicted names are simply looked up again,
+        # so memory stays bounded however many distinct names the catalog has
+        self.authors = LRU(max(1, options['name_cache_size']))
+        self.libraries = LRU(max(1, options['name_cache_size']))
+        books_created = 0
+        memberships_created = 0
+        skipped = 0
+
+        started = time.perf_counter()
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = self._read_records(stream, input_format)
+            while True:
+                rows = list(islice(records, batch_size))
+                if not rows:
+                    break
+                batch = [record for record in map(self._clean, rows) if record]
+                skipped += len(rows) - len(batch)
+                if batch:
+                    books, memberships = self._load_batch(batch)
+                    books_created += books
+                    memberships_created += memberships
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  loaded {books_created} books')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - started
+        rate = books_created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {books_created} books and {memberships_created} library '
+            f'memberships ({skipped} skipped) in {elapsed:.1f}s, {rate:.0f} books/s'
+        ))
+
+    # ============== INPUT ==============
+
+    @staticmethod
+    def _guess_format(path):
+        if path.endswith(('.ndjson', '.jsonl')):
+            return 'ndjson'
+        if path.endswith('.csv'):
+            return 'csv'
+        raise CommandError('Cannot guess the input format, pass --format csv or --format ndjson')
+
+    @staticmethod
+    def _read_records(stream, input_format):
+        if input_format == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise CommandError(f'Invalid JSON on line {line_number}: {exc}')
+
+    @staticmethod
+    def _clean(row):
+        """Normalize a raw record, or return None if it is unusable."""
+        title = (row.get('title') or '').strip()
+        author = (row.get('author') or '').strip()
+        if not title or not author:
+            return None
+        libraries = row.get('libraries') or []
+        if isinstance(libraries, str):
+            libraries = libraries.split(';')
+        return {
+            'title': title[:Book._meta.get_field('title').max_length],
+            'author': author[:Author._meta.get_field('name').max_length],
+            'libraries': [name.strip() for name in libraries if name and name.strip()],
+        }
+
+    # ============== LOADING ==============
+
+    def _resolve(self, model, name_map, names):
+        """
+        Return a name -> pk dict for the given names, looking up names
+        missing from the map and creating the ones that do not exist.
+        """
+        resolved = {}
+        missing = set()
+        for name in names:
+            pk = name_map.get(name)
+            if pk is None:
+                missing.add(name)
+            else:
+                resolved[name] = pk
+
+        if missing:
+            # Names are not unique in the schema; reuse the oldest match
+            for pk, name in model.objects.filter(name__in=missing).order_by('-pk').values_list('pk', 'name'):
+                resolved[name] = pk
+            to_create = [model(name=name) for name in missing if name not in resolved]
+            if model is Author:
+                # bulk_create skips Author.save(), which fills this field
+                for author in to_create:
+                    author.name_normalized = Author.normalize_name(author.name)
+            for obj in model.objects.bulk_create(to_create):
+                resolved[obj.name] = obj.pk
+
+        for name, pk in resolved.items():
+            name_map.set(name, pk)
+        return resolved
+
+    def _load_batch(self, batch):
+        with transaction.atomic():
+            author_ids = self._resolve(Author, self.authors, {r['author'] for r in batch})
+            library_ids = self._resolve(
+                Library, self.libraries, {name for r in batch for name in r['libraries']}
+            )
+
+            books = Book.objects.bulk_create([
+                Book(title=record['title'], author_id=author_ids[record['author']])
+                for record in batch
+            ])
+
+            Membership = Library.books.through
+            memberships = [
+                Membership(library_id=library_ids[name], book_id=book.pk)
+                for book, record in zip(books, batch)
+                for name in set(record['libraries'])
+            ]
+            Membership.objects.bulk_create(memberships, ignore_conflicts=True)
+
+            search.index_books([book.pk for book in books])
+            refresh_author_book_counts(set(author_ids.values()))
+            if library_ids:
+                refresh_library_book_counts(set(library_ids.values()))
+            versions.bump_versions(versions.BOOK, versions.AUTHOR, versions.LIBRARY)
+
+        return len(books), len(memberships)
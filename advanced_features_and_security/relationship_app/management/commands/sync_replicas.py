@@ -0,0 +1,100 @@
+"""
+Management command to refresh the SQLite read replicas from the primary.
+
+Usage:
+    python manage.py sync_replicas
+    python manage.py sync_replicas --database replica
+    python manage.py sync_replicas --interval 2
+
+Each replica file (DATABASE_REPLICAS by default) is overwritten with a
+consistent snapshot of the primary through SQLite's online backup API.
+Writers on the primary are not blocked in WAL mode, and requests reading
+from a replica keep their snapshot until they finish. Replicas get the
+SQLite profile's pragmas, like every other connection.
+
+After a sync the catalog version stamps are bumped, so ETags and cached
+fragments built from the old replica contents are not reused. With
+--interval the command keeps running and only copies the primary when it
+has changed since the previous sync; the interval is the replication lag,
+and should stay below REPLICA_PIN_SECONDS.
+
+Only SQLite replicas can be synced here; other databases replicate
+through their own server.
+"""
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from LibraryProject.replicas import get_replicas
+from LibraryProject.sqlite import apply_pragmas, get_pragmas
+from relationship_app import versions
+
+
+SQLITE_ENGINE = 'django.db.backends.sqlite3'
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the read replica files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            action='append',
+            help='Replica alias to sync, may be repeated (default: DATABASE_REPLICAS)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep syncing every INTERVAL seconds (default: sync once)',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['database'] or get_replicas()
+        if not aliases:
+            raise CommandError('No replicas configured: set DATABASE_REPLICAS or pass --database')
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Unknown database {alias!r}')
+            if settings.DATABASES[alias]['ENGINE'] != SQLITE_ENGINE:
+                raise CommandError(f'Database {alias!r} is not SQLite and cannot be synced here')
+        if DEFAULT_DB_ALIAS in aliases:
+            raise CommandError('The primary database cannot be its own replica')
+
+        interval = options['interval']
+        source = sqlite3.connect(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'], isolation_level=None)
+        last_version = None
+        try:
+            while True:
+                # Changes when another connection commits to the primary
+                data_version = source.execute('PRAGMA data_version').fetchone()[0]
+                if data_version != last_version:
+                    for alias in aliases:
+                        self._sync(source, alias)
+                    versions.bump_versions(
+                        versions.BOOK, versions.AUTHOR, versions.LIBRARY, versions.USER_PROFILE,
+                    )
+                    last_version = data_version
+                if not interval:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            source.close()
+
+    def _sync(self, source, alias):
+        started = time.perf_counter()
+        target = sqlite3.connect(settings.DATABASES[alias]['NAME'], isolation_level=None)
+        try:
+            apply_pragmas(target, get_pragmas())
+            source.backup(target)
+            pages = target.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            target.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stdout.write(self.style.SUCCESS(f'Synced {alias}: {pages} pages in {elapsed:.0f}ms'))
@@ -0,0 +1,47 @@
+"""
+Migration adding denormalized book_count counters to Author and Library
+and filling them from the existing data.
+"""
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_book_counts(apps, schema_editor):
+    Author = apps.get_model('relationship_app', 'Author')
+    Book = apps.get_model('relationship_app', 'Book')
+    Library = apps.get_model('relationship_app', 'Library')
+
+    author_counts = (
+        Book.objects.filter(author_id=OuterRef('pk'))
+        .order_by().values('author_id').annotate(total=Count('*')).values('total')
+    )
+    Author.objects.update(book_count=Coalesce(Subquery(author_counts), 0))
+
+    library_counts = (
+        Library.books.through.objects.filter(library_id=OuterRef('pk'))
+        .order_by().values('library_id').annotate(total=Count('*')).values('total')
+    )
+    Library.objects.update(book_count=Coalesce(Subquery(library_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0004_catalog_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='library',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_book_counts, migrations.RunPython.noop),
+    ]
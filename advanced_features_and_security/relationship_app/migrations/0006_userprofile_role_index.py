@@ -0,0 +1,21 @@
+"""
+Migration adding the index used to filter the admin user directory by role.
+"""
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0005_book_count_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'user'], name='userprofile_role_user_idx'),
+        ),
+    ]
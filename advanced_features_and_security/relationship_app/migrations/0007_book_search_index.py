@@ -0,0 +1,67 @@
+"""
+Migration creating the SQLite FTS5 index over book titles and author names
+(see relationship_app/search.py) and filling it from the existing books.
+Other database backends are left untouched.
+"""
+
+from django.db import migrations
+
+
+# Frozen copies of the search module's SQL as of this migration
+FTS_TABLE = 'relationship_app_book_fts'
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, author_name, "
+    "tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3')"
+)
+DROP_TABLE_SQL = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+
+BATCH_BOUNDS_SQL = (
+    'SELECT MAX(id), COUNT(*) FROM ('
+    'SELECT id FROM relationship_app_book WHERE id > %s ORDER BY id LIMIT %s)'
+)
+BACKFILL_SQL = (
+    f'INSERT INTO {FTS_TABLE} (rowid, title, author_name) '
+    'SELECT b.id, b.title, a.name FROM relationship_app_book b '
+    'JOIN relationship_app_author a ON a.id = b.author_id '
+    'WHERE b.id > %s AND b.id <= %s'
+)
+OPTIMIZE_SQL = f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+
+BATCH_SIZE = 10000
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    last_id = 0
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(DROP_TABLE_SQL)
+        cursor.execute(CREATE_TABLE_SQL)
+        # Books are inserted in id ranges
+        while True:
+            cursor.execute(BATCH_BOUNDS_SQL, [last_id, BATCH_SIZE])
+            upper_id, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(BACKFILL_SQL, [last_id, upper_id])
+            last_id = upper_id
+        cursor.execute(OPTIMIZE_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_TABLE_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0006_userprofile_role_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,48 @@
+"""
+Migration adding Author.name_normalized, the case- and accent-folded name
+used by the author autocomplete endpoint, with its index.
+"""
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_name(name):
+    # Frozen copy of Author.normalize_name as of this migration
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())[:100]
+
+
+def populate_name_normalized(apps, schema_editor):
+    Author = apps.get_model('relationship_app', 'Author')
+    batch = []
+    for author in Author.objects.only('id', 'name').iterator(chunk_size=2000):
+        author.name_normalized = normalize_name(author.name)
+        batch.append(author)
+        if len(batch) >= 2000:
+            Author.objects.bulk_update(batch, ['name_normalized'])
+            batch = []
+    if batch:
+        Author.objects.bulk_update(batch, ['name_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('relationship_app', '0007_book_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='name_normalized',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(populate_name_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['name_normalized', 'id'], name='author_name_norm_id_idx'),
+        ),
+    ]
@@ -1,12 +1,23 @@
-from django.db import models
+import unicodedata
+
+from django.db import connections, models
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.db.models import Case, Count, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_delete
 from django.dispatch import receiver
 
+from relationship_app import search, versions
+from relationship_app.roles import bump_role_version
+
 
 class Author(models.Model):
     """Model to represent an Author"""
     name = models.CharField(max_length=100)
+    # Case- and accent-folded copy of name, used for prefix autocomplete
+    name_normalized = models.CharField(max_length=100, default='', editable=False)
+    # Denormalized number of books by this author, kept exact by signals below
+    book_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         permissions = [
@@ -15,9 +26,58 @@ class Author(models.Model):
             ('can_edit_author', 'Can edit author'),
             ('can_delete_author', 'Can delete author'),
         ]
+        # Lets the "sort by author" keyset walk authors in name order from the
+        # cursor; books are then sorted per author name (see views.py)
+        indexes = [
+            models.Index(fields=['name', 'id'], name='author_name_id_idx'),
+            # Backs prefix lookups of the author autocomplete endpoint
+            models.Index(fields=['name_normalized', 'id'], name='author_name_norm_id_idx'),
+        ]
     
     def __str__(self):
         return self.name
+    
+    @staticmethod
+    def normalize_name(name):
+        """
+        Fold a name for prefix matching: strip accents, casefold and
+        collapse whitespace, so "  Émile ZOLA" becomes "emile zola".
+        """
+        decomposed = unicodedata.normalize('NFKD', name or '')
+        stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+        return ' '.join(stripped.casefold().split())[:100]
+    
+    def save(self, *args, **kwargs):
+        self.name_normalized = self.normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
+
+
+class BookQuerySet(models.QuerySet):
+    
+    def search(self, text, limit=50):
+        """
+        Return up to `limit` books whose title or author name matches text,
+        best match first.
+        
+        Uses the FTS5 index on SQLite (see search.py) and falls back to
+        case-insensitive substring matching on other databases.
+        """
+        # The database the books are read from (possibly a replica, see
+        # LibraryProject/replicas.py), so the ids match the rows
+        connection = connections[self.db]
+        if not search.is_supported(connection):
+            return self.filter(
+                Q(title__icontains=text) | Q(author__name__icontains=text)
+            )[:limit]
+        
+        ids = search.match_book_ids(text, limit=limit, using=connection)
+        if not ids:
+            return self.none()
+        rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)])
+        return self.filter(pk__in=ids).order_by(rank)
 
 
 class Book(models.Model):
@@ -25,6 +85,8 @@ class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
     
+    objects = BookQuerySet.as_manager()
+    
     class Meta:
         # Custom permissions for granular access control
         # These permissions can be assigned to groups and users
@@ -37,15 +99,28 @@ class Book(models.Model):
             ('can_change_book', 'Can change a book'),
             ('can_delete_book', 'Can delete a book'),
         ]
+        # Backs the "sort by title" keyset on the catalog page
+        indexes = [
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+        ]
     
     def __str__(self):
         return self.title
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored author so a reassignment can update both counters
+        instance._loaded_author_id = instance.__dict__.get('author_id')
+        return instance
 
 
 class Library(models.Model):
     """Model to represent a Library"""
     name = models.CharField(max_length=100)
     books = models.ManyToManyField(Book, related_name='libraries')
+    # Denormalized number of books in this library, kept exact by signals below
+    book_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         permissions = [
@@ -80,8 +155,50 @@ class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='userprofile')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='Member')
     
+    class Meta:
+        # Backs the role filter of the admin user directory
+        indexes = [
+            models.Index(fields=['role', 'user'], name='userprofile_role_user_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username} - {self.role}"
+    
+    # ============== DIRTY-FIELD TRACKING ==============
+    # A snapshot of the stored values is kept when the profile is loaded or
+    # saved, so callers can skip writes when nothing has changed.
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_fields()
+        return instance
+    
+    def _snapshot_fields(self):
+        self._loaded_values = {
+            field.attname: self.__dict__.get(field.attname)
+            for field in self._meta.concrete_fields
+        }
+    
+    def get_dirty_fields(self):
+        """
+        Return the names of concrete fields whose value differs from the
+        last loaded or saved state. Unsaved profiles report every field.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return [field.attname for field in self._meta.concrete_fields]
+        return [
+            attname for attname, value in loaded.items()
+            if self.__dict__.get(attname) != value
+        ]
+    
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._snapshot_fields()
 
 
 # Signal to automatically create UserProfile when a new custom user is created
@@ -100,6 +217,199 @@ def save_user_profile(sender, instance, **kwargs):
     """
     Signal handler to save the UserProfile whenever the user is saved.
     This ensures profile changes are persisted when user is updated.
+    
+    Only a profile that was loaded onto this user instance can carry
+    in-memory changes, and it is written only if one of its fields is
+    dirty. Saves such as login()'s last_login update therefore cost no
+    extra SELECT or UPDATE.
+    """
+    descriptor = type(instance).userprofile
+    if not descriptor.is_cached(instance):
+        return
+    profile = descriptor.related.get_cached_value(instance)
+    if profile is None:
+        return
+    dirty_fields = profile.get_dirty_fields()
+    if not dirty_fields:
+        return
+    if profile._state.adding:
+        profile.save()
+    else:
+        profile.save(update_fields=[
+            name for name in dirty_fields if name != profile._meta.pk.attname
+        ])
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_cached_role(sender, instance, **kwargs):
+    """
+    Outdate the user's cached role in every process once a change to
+    their profile commits.
     """
-    instance.userprofile.save()
+    bump_role_version(instance.user_id)
+
+
+
+# ============== DENORMALIZED BOOK COUNTERS ==============
+# Counters are recomputed with a single correlated UPDATE per change instead
+# of being incremented, so they stay exact even when remove() is given books
+# that were never in the library or when rows are changed concurrently.
+# Both helpers bump the counted model's change version: a queryset update()
+# sends no post_save, and the counts are shown on cached pages.
+
+def refresh_library_book_counts(library_ids=None):
+    """
+    Recompute Library.book_count for the given libraries (all if None).
+    """
+    counts = (
+        Library.books.through.objects
+        .filter(library_id=OuterRef('pk'))
+        .order_by()
+        .values('library_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    queryset = Library.objects.all()
+    if library_ids is not None:
+        queryset = queryset.filter(pk__in=list(library_ids))
+    updated = queryset.update(book_count=Coalesce(Subquery(counts), 0))
+    if updated:
+        versions.bump_versions(versions.LIBRARY)
+    return updated
+
+
+def refresh_author_book_counts(author_ids=None):
+    """
+    Recompute Author.book_count for the given authors (all if None).
+    """
+    counts = (
+        Book.objects
+        .filter(author_id=OuterRef('pk'))
+        .order_by()
+        .values('author_id')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    queryset = Author.objects.all()
+    if author_ids is not None:
+        queryset = queryset.filter(pk__in=list(author_ids))
+    updated = queryset.update(book_count=Coalesce(Subquery(counts), 0))
+    if updated:
+        versions.bump_versions(versions.AUTHOR)
+    return updated
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def library_books_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Library.book_count exact when books are added to or removed from a library.
+    
+    Handles both directions of the relation:
+    - library.books.add(...)  (reverse=False, instance is a Library)
+    - book.libraries.add(...) (reverse=True, instance is a Book)
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            refresh_library_book_counts([instance.pk])
+        return
+    
+    if action == 'pre_clear':
+        # pk_set is None for clear(), so remember which libraries are affected
+        instance._cleared_library_ids = list(instance.libraries.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        refresh_library_book_counts(instance.__dict__.pop('_cleared_library_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        refresh_library_book_counts(pk_set)
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, created, **kwargs):
+    """
+    Update author counters when a book is created or moved to another author.
+    """
+    previous_author_id = getattr(instance, '_loaded_author_id', None)
+    if created or previous_author_id != instance.author_id:
+        refresh_author_book_counts({previous_author_id, instance.author_id} - {None})
+    instance._loaded_author_id = instance.author_id
+
+
+@receiver(pre_delete, sender=Book)
+def book_deleting(sender, instance, **kwargs):
+    """
+    Deleting a book removes its library memberships without sending
+    m2m_changed, so remember which libraries held it.
+    """
+    instance._deleted_from_library_ids = list(instance.libraries.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    refresh_library_book_counts(instance.__dict__.pop('_deleted_from_library_ids', []))
+    refresh_author_book_counts([instance.author_id])
+
+
+# ============== FULL-TEXT SEARCH INDEX ==============
+# Keeps the FTS5 table in search.py in step with Book and Author.
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    search.index_books([instance.pk])
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    search.remove_books([instance.pk])
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, **kwargs):
+    if not created:
+        search.reindex_author(instance.pk, instance.name)
+
+
+# ============== CHANGE VERSIONS (CONDITIONAL GET) ==============
+# See versions.py; each handler marks which pages' content may have changed.
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def book_changed(sender, **kwargs):
+    versions.bump_versions(versions.BOOK)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def author_changed(sender, **kwargs):
+    versions.bump_versions(versions.AUTHOR)
+
+
+@receiver(post_save, sender=Library)
+@receiver(post_delete, sender=Library)
+def library_changed(sender, **kwargs):
+    versions.bump_versions(versions.LIBRARY)
+
+
+@receiver(post_save, sender=Librarian)
+@receiver(post_delete, sender=Librarian)
+def librarian_changed(sender, **kwargs):
+    # The library detail page shows the librarian
+    versions.bump_versions(versions.LIBRARY)
+
+
+@receiver(m2m_changed, sender=Library.books.through)
+def library_membership_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        versions.bump_versions(versions.LIBRARY)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, **kwargs):
+    versions.bump_versions(versions.USER)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_changed(sender, **kwargs):
+    versions.bump_versions(versions.USER_PROFILE)
 
@@ -0,0 +1,183 @@
+"""
+Keyset (cursor) pagination for large querysets.
+
+Offset pagination (LIMIT/OFFSET) has to walk past every skipped row, so
+page 5000 costs far more than page 1. Keyset pagination instead remembers
+the sort key of the last row shown and asks the database for the rows
+that come after it, which an index on the sort columns answers directly.
+"""
+
+from django.core import signing
+from django.db.models import Q
+
+
+CURSOR_SALT = 'relationship_app.pagination.cursor'
+
+
+class KeysetPage:
+    """
+    A single page of results returned by KeysetPaginator.
+
+    Attributes:
+        object_list: List of model instances on this page
+        next_cursor: Opaque cursor for the following page (or None)
+        prev_cursor: Opaque cursor for the preceding page (or None)
+    """
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by a stable, unique ordering.
+
+    The ordering must end with a unique column (normally 'id') so that
+    every row has a distinct position. Fields may be prefixed with '-'
+    for descending order and may follow relations (e.g. 'author__name').
+
+    Args:
+        queryset: The base queryset to paginate
+        ordering: Tuple of field names, the last of which must be unique
+        per_page: Number of rows per page
+    """
+
+    def __init__(self, queryset, ordering, per_page=50):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+
+    # ============== CURSOR ENCODING ==============
+
+    def encode_cursor(self, values, direction):
+        """
+        Encode the sort key of a boundary row as an opaque, signed token.
+        Signing keeps clients from forging positions for other orderings.
+        """
+        return signing.dumps(
+            {'o': list(self.ordering), 'v': list(values), 'd': direction},
+            salt=CURSOR_SALT,
+            compress=True,
+        )
+
+    def decode_cursor(self, cursor):
+        """
+        Decode a cursor produced by encode_cursor().
+
+        Returns:
+            Tuple of (values, direction), or (None, 'next') if the cursor
+            is missing, tampered with, or belongs to a different ordering.
+        """
+        if not cursor:
+            return None, 'next'
+        try:
+            payload = signing.loads(cursor, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None, 'next'
+        if payload.get('o') != list(self.ordering):
+            return None, 'next'
+        values = payload.get('v')
+        direction = payload.get('d')
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            return None, 'next'
+        if direction not in ('next', 'prev'):
+            return None, 'next'
+        return values, direction
+
+    # ============== QUERY BUILDING ==============
+
+    @staticmethod
+    def _field_name(field):
+        return field.lstrip('-')
+
+    def _key_for(self, obj):
+        """Read the sort key of a model instance, following relations."""
+        key = []
+        for field in self.ordering:
+            value = obj
+            for part in self._field_name(field).split('__'):
+                value = getattr(value, part)
+            key.append(value)
+        return key
+
+    def _seek_filter(self, values, forward):
+        """
+        Build the row-value comparison that selects rows after (or before)
+        the given sort key, e.g. for ('title', 'id'):
+            title > t OR (title = t AND id > i)
+        """
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name = self._field_name(field)
+            ascending = not field.startswith('-')
+            lookup = 'gt' if ascending == forward else 'lt'
+            clause = Q(**{f'{name}__{lookup}': values[position]})
+            for prior_position in range(position):
+                prior = self._field_name(self.ordering[prior_position])
+                clause &= Q(**{prior: values[prior_position]})
+            condition |= clause
+        return condition
+
+    def _reversed_ordering(self):
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in self.ordering
+        )
+
+    # ============== PAGINATION ==============
+
+    def page(self, cursor=None):
+        """
+        Return the page identified by cursor (the first page if None).
+
+        Only per_page + 1 rows are fetched; the extra row tells us whether
+        another page exists in the direction of travel.
+        """
+        values, direction = self.decode_cursor(cursor)
+        forward = direction == 'next'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, forward))
+        ordering = self.ordering if forward else self._reversed_ordering()
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        next_cursor = prev_cursor = None
+        if rows:
+            first_key = self._key_for(rows[0])
+            last_key = self._key_for(rows[-1])
+            if forward:
+                if has_more:
+                    next_cursor = self.encode_cursor(last_key, 'next')
+                if values is not None:
+                    prev_cursor = self.encode_cursor(first_key, 'prev')
+            else:
+                next_cursor = self.encode_cursor(last_key, 'next')
+                if has_more:
+                    prev_cursor = self.encode_cursor(first_key, 'prev')
+
+        return KeysetPage(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
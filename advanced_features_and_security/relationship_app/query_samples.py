@@ -1,88 +1,157 @@
 """
 Sample queries demonstrating Django ORM relationships
 This script contains queries for ForeignKey, ManyToMany, and OneToOne relationships
+
+The helpers are thin wrappers around the batched loaders in loaders.py:
+each relation is answered with one query however many ids are requested,
+and ids already seen by the same loaders are not fetched again. Pass the
+same RelationshipLoaders (e.g. get_loaders(request)) to share that memo.
+
+The single-id helpers return lists rather than QuerySets, so results can
+be memoized; they raise DoesNotExist for a missing author or library as
+they always did, at the cost of one existence query when the answer is
+empty. The plural helpers never raise: missing ids map to [] or None.
+Ids may be ints or strings such as URL parameters.
 """
 
-from relationship_app.models import Author, Book, Library, Librarian
+from relationship_app.loaders import RelationshipLoaders
+from relationship_app.models import Author, Library, Librarian
 
 
-def query_books_by_author(author_id):
+def query_books_by_author(author_id, loaders=None):
     """
     Query all books by a specific author.
-    
+
     Args:
         author_id: The ID of the author
-        
+        loaders: Optional RelationshipLoaders to share memoized results
+
     Returns:
-        QuerySet of all books written by the author
+        List of all books written by the author (empty if none)
+
+    Raises:
+        Author.DoesNotExist: If there is no such author
     """
-    author = Author.objects.get(id=author_id)
-    books = Book.objects.filter(author=author)
-    # Alternative using related_name:
-    # books = author.books.all()
+    books = query_books_by_authors([author_id], loaders)[author_id]
+    if not books and not Author.objects.filter(pk=author_id).exists():
+        raise Author.DoesNotExist(f'No author {author_id}')
     return books
 
 
-def query_books_in_library(library_id):
+def query_books_by_authors(author_ids, loaders=None):
+    """
+    Query the books of many authors with a single query.
+
+    Returns:
+        Dict of author id -> list of books
+    """
+    loaders = loaders or RelationshipLoaders()
+    return loaders.books_by_author.load_many(author_ids)
+
+
+def query_books_in_library(library_id, loaders=None):
     """
     List all books in a library.
-    
+
     Args:
         library_id: The ID of the library
-        
+        loaders: Optional RelationshipLoaders to share memoized results
+
     Returns:
-        QuerySet of all books in the library
+        List of all books in the library (empty if none)
+
+    Raises:
+        Library.DoesNotExist: If there is no such library
     """
-    library = Library.objects.get(id=library_id)
-    books = library.books.all()
+    books = query_books_in_libraries([library_id], loaders)[library_id]
+    if not books and not Library.objects.filter(pk=library_id).exists():
+        raise Library.DoesNotExist(f'No library {library_id}')
     return books
 
 
-def query_librarian_for_library(library_id):
+def query_books_in_libraries(library_ids, loaders=None):
+    """
+    List the books of many libraries with a single query.
+
+    Returns:
+        Dict of library id -> list of books
+    """
+    loaders = loaders or RelationshipLoaders()
+    return loaders.books_in_library.load_many(library_ids)
+
+
+def query_librarian_for_library(library_id, loaders=None):
     """
     Retrieve the librarian for a library.
-    
+
     Args:
         library_id: The ID of the library
-        
+        loaders: Optional RelationshipLoaders to share memoized results
+
     Returns:
         The Librarian object associated with the library
+
+    Raises:
+        Library.DoesNotExist: If there is no such library
+        Librarian.DoesNotExist: If the library has no librarian
     """
-    library = Library.objects.get(id=library_id)
-    librarian = library.librarian
-    # Alternative using direct query:
-    # librarian = Librarian.objects.get(library_id=library_id)
+    librarian = query_librarians_for_libraries([library_id], loaders)[library_id]
+    if librarian is None:
+        if not Library.objects.filter(pk=library_id).exists():
+            raise Library.DoesNotExist(f'No library {library_id}')
+        raise Librarian.DoesNotExist(f'No librarian for library {library_id}')
     return librarian
 
 
+def query_librarians_for_libraries(library_ids, loaders=None):
+    """
+    Retrieve the librarians of many libraries with a single query.
+
+    Returns:
+        Dict of library id -> Librarian (or None if the library has none)
+    """
+    loaders = loaders or RelationshipLoaders()
+    return loaders.librarian_for_library.load_many(library_ids)
+
+
 # Example usage and testing
 if __name__ == '__main__':
     # Note: These examples assume sample data has been created
-    
+    loaders = RelationshipLoaders()
+
     # Example 1: Query books by a specific author
     print("=== Query Books by Author ===")
     try:
-        author_books = query_books_by_author(1)
-        for book in author_books:
+        for book in query_books_by_author(1, loaders):
             print(f"Book: {book.title}")
     except Author.DoesNotExist:
         print("Author not found")
-    
+
     # Example 2: List all books in a library
     print("\n=== Books in Library ===")
     try:
-        library_books = query_books_in_library(1)
-        for book in library_books:
+        for book in query_books_in_library(1, loaders):
             print(f"Book: {book.title}")
     except Library.DoesNotExist:
         print("Library not found")
-    
+
     # Example 3: Retrieve the librarian for a library
     print("\n=== Librarian for Library ===")
     try:
-        librarian = query_librarian_for_library(1)
+        librarian = query_librarian_for_library(1, loaders)
         print(f"Librarian: {librarian.name}")
     except Library.DoesNotExist:
         print("Library not found")
     except Librarian.DoesNotExist:
         print("Librarian not found for this library")
+
+    # Example 4: Batched lookups, one query per relation
+    print("\n=== Books by Several Authors ===")
+    author_ids = list(Author.objects.values_list('id', flat=True)[:10])
+    for author_id, books in query_books_by_authors(author_ids, loaders).items():
+        print(f"Author {author_id}: {len(books)} books")
+
+    print("\n=== Librarians of Several Libraries ===")
+    library_ids = list(Library.objects.values_list('id', flat=True)[:10])
+    for library_id, librarian in query_librarians_for_libraries(library_ids, loaders).items():
+        print(f"Library {library_id}: {librarian.name if librarian else 'no librarian'}")
@@ -0,0 +1,103 @@
+"""
+Cached role resolution for role-based access control.
+
+The dashboard views are guarded by user_passes_test predicates that need
+the user's UserProfile.role. Reading it from the database on every request
+adds a round trip to the hot path, so resolved roles are kept in a small
+in-process LRU cache keyed by user id.
+
+Each entry records the user's role version, a counter in the shared cache
+kept like the permission versions of accounts/permission_cache.py. The
+signal handlers in models.py bump it once a profile change commits, and
+an entry is only used while its version is current, so a demoted admin
+loses access in every process on their next request. The version is read
+before the role, and bumped only after the commit: a request that read
+the old role concurrently caches it under the old version.
+
+Settings:
+    ROLE_CACHE_MAX_SIZE: Maximum number of cached users (default: 10000)
+"""
+
+import threading
+
+from django.conf import settings
+
+from accounts.permission_cache import bump_versions_on_commit, get_versions
+from LibraryProject.lru import LRU
+
+
+DEFAULT_MAX_SIZE = 10000
+
+ROLE_VERSION_KEY = 'relationship_app:role:version:user:{user_id}'
+
+# Marks "not cached" so that "user has no profile" (None) can be cached too
+_MISSING = object()
+
+
+class RoleCache:
+    """
+    Thread-safe bounded LRU cache of roles tagged with their version.
+
+    Args:
+        max_size: Maximum number of entries before the least recently
+            used one is evicted
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._entries = LRU(max_size)
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return the cached value for key, or _MISSING if absent or outdated."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] != version:
+                return _MISSING
+            return entry[0]
+
+    def set(self, key, value, version):
+        with self._lock:
+            self._entries.set(key, (value, version))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+role_cache = RoleCache(max_size=getattr(settings, 'ROLE_CACHE_MAX_SIZE', DEFAULT_MAX_SIZE))
+
+
+def bump_role_version(user_id):
+    """Invalidate the user's cached role in every process once committed."""
+    bump_versions_on_commit([ROLE_VERSION_KEY.format(user_id=user_id)])
+
+
+def get_user_role(user):
+    """
+    Return the role of the given user ('Admin', 'Librarian', 'Member'),
+    or None for anonymous users and users without a profile.
+    """
+    if not user.is_authenticated:
+        return None
+
+    key = ROLE_VERSION_KEY.format(user_id=user.pk)
+    version = get_versions([key])[key]
+    role = role_cache.get(user.pk, version)
+    if role is not _MISSING:
+        return role
+
+    # Imported here because models.py imports this module for invalidation
+    from relationship_app.models import UserProfile
+
+    role = (
+        UserProfile.objects
+        .filter(user_id=user.pk)
+        .values_list('role', flat=True)
+        .first()
+    )
+    role_cache.set(user.pk, role, version)
+    return role
@@ -0,0 +1,167 @@
+"""
+Full-text search over book titles and author names using SQLite FTS5.
+
+The admin's search_fields run LIKE '%q%' over the book and author tables,
+which is a full table scan per query. Instead, an FTS5 virtual table keeps
+an inverted index of (title, author name) per book, keyed by the book id
+(the FTS rowid), and queries are ranked with bm25.
+
+The index is kept in sync by the signal handlers in models.py, can be
+rebuilt with `python manage.py rebuild_search_index`, and is queried
+through Book.objects.search() or match_book_ids().
+
+On databases other than SQLite every function here is a no-op and
+Book.objects.search() falls back to case-insensitive substring matching.
+"""
+
+import re
+
+from django.db import connection
+
+
+FTS_TABLE = 'relationship_app_book_fts'
+BOOK_TABLE = 'relationship_app_book'
+AUTHOR_TABLE = 'relationship_app_author'
+
+# Relative weight of a match in the title vs. the author name
+TITLE_WEIGHT = 2.0
+AUTHOR_WEIGHT = 1.0
+
+# SQLite limits the number of host parameters per statement
+SQL_BATCH_SIZE = 500
+
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, author_name, "
+    "tokenize = 'unicode61 remove_diacritics 2', "
+    "prefix = '2 3')"
+)
+DROP_TABLE_SQL = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_supported(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def build_match_query(text):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+
+    Each word becomes a quoted prefix term, so user input can never be
+    parsed as FTS5 syntax and "tolk lord" matches "Tolkien" and "Lord".
+    Returns an empty string if the text has no searchable words.
+    """
+    terms = _TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), SQL_BATCH_SIZE):
+        yield ids[start:start + SQL_BATCH_SIZE]
+
+
+# ============== INDEX MAINTENANCE ==============
+
+def index_books(book_ids):
+    """(Re)index the given books from the book and author tables."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        for batch in _batches(book_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch,
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author_name) '
+                f'SELECT b.id, b.title, a.name FROM {BOOK_TABLE} b '
+                f'JOIN {AUTHOR_TABLE} a ON a.id = b.author_id '
+                f'WHERE b.id IN ({placeholders})',
+                batch,
+            )
+
+
+def remove_books(book_ids):
+    """Drop the given books from the index."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        for batch in _batches(book_ids):
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                batch,
+            )
+
+
+def reindex_author(author_id, name):
+    """Update the author name stored with every book by this author."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {FTS_TABLE} SET author_name = %s '
+            f'WHERE rowid IN (SELECT id FROM {BOOK_TABLE} WHERE author_id = %s)',
+            [name, author_id],
+        )
+
+
+def rebuild_index(batch_size=10000, using=None):
+    """
+    Recreate the index from scratch, inserting books in id ranges.
+
+    Returns:
+        Number of books indexed
+    """
+    conn = using or connection
+    if not is_supported(conn):
+        return 0
+    indexed = 0
+    last_id = 0
+    with conn.cursor() as cursor:
+        cursor.execute(DROP_TABLE_SQL)
+        cursor.execute(CREATE_TABLE_SQL)
+        while True:
+            cursor.execute(
+                f'SELECT MAX(id), COUNT(*) FROM ('
+                f'SELECT id FROM {BOOK_TABLE} WHERE id > %s ORDER BY id LIMIT %s)',
+                [last_id, batch_size],
+            )
+            upper_id, count = cursor.fetchone()
+            if not count:
+                break
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author_name) '
+                f'SELECT b.id, b.title, a.name FROM {BOOK_TABLE} b '
+                f'JOIN {AUTHOR_TABLE} a ON a.id = b.author_id '
+                f'WHERE b.id > %s AND b.id <= %s',
+                [last_id, upper_id],
+            )
+            indexed += count
+            last_id = upper_id
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+# ============== QUERYING ==============
+
+def match_book_ids(text, limit=50, using=None):
+    """
+    Return the ids of the books best matching text, best match first.
+    using is the connection to query (default: the default database).
+    """
+    conn = using or connection
+    query = build_match_query(text)
+    if not query or not is_supported(conn):
+        return []
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s',
+            [query, TITLE_WEIGHT, AUTHOR_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,33 @@
+// Suggest authors from the autocomplete endpoint and post the chosen id.
+// Used by relationship_app/author_field.html.
+(function () {
+    var search = document.getElementById('author-search');
+    var options = document.getElementById('author-options');
+    var hidden = document.getElementById('author');
+    var url = search.dataset.autocompleteUrl;
+    var ids = {};
+    var timer = null;
+    search.addEventListener('input', function () {
+        hidden.value = ids[search.value] || '';
+        clearTimeout(timer);
+        if (!search.value.trim()) {
+            return;
+        }
+        timer = setTimeout(function () {
+            fetch(url + '?q=' + encodeURIComponent(search.value))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    options.innerHTML = '';
+                    ids = {};
+                    data.results.forEach(function (author) {
+                        // Labels tell apart authors sharing a name
+                        var option = document.createElement('option');
+                        option.value = author.label;
+                        options.appendChild(option);
+                        ids[author.label] = author.id;
+                    });
+                    hidden.value = ids[search.value] || '';
+                });
+        }, 150);
+    });
+})();
@@ -0,0 +1,85 @@
+"""
+Template tag caching rendered fragments until the models they show change.
+
+Usage:
+    {% load fragment_cache %}
+    {% cache_fragment "member-book-table" versions="book,author" cursor %}
+        {% for book in page %}...{% endfor %}
+    {% endcache_fragment %}
+
+The first argument names the fragment, versions= lists the model labels
+from versions.py the markup depends on, and any further arguments are the
+values the fragment varies on. Expressions inside the block (including
+lazy querysets) are only evaluated on a cache miss. Nothing is cached
+while the default cache is process-local (see versions.py).
+
+A stamp covers a whole table, so cache markup that is expensive to build
+and bounded in size (one page of a table, not each row or the whole
+table): any change to a listed model re-renders every fragment using it,
+and fragments larger than FRAGMENT_CACHE_MAX_BYTES are never kept.
+"""
+
+from django import template
+
+from relationship_app.fragments import fragment_cache
+from relationship_app.versions import get_versions, stamps_are_shared
+
+
+register = template.Library()
+
+
+class CacheFragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, labels, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.labels = labels
+        self.vary_on = vary_on
+
+    def _versions(self, context):
+        """
+        Read the version stamps once per request, however many fragments
+        use them. Without a request in the context they are read per tag.
+        """
+        request = context.get('request')
+        memo = getattr(request, '_fragment_versions', None)
+        if memo is None:
+            memo = {}
+            if request is not None:
+                request._fragment_versions = memo
+        if self.labels not in memo:
+            stamps = get_versions(self.labels)
+            memo[self.labels] = tuple(stamps[label] for label in self.labels)
+        return memo[self.labels]
+
+    def render(self, context):
+        if not stamps_are_shared():
+            # Stamps would not see changes made by other processes
+            return self.nodelist.render(context)
+        key = (
+            self.name.resolve(context),
+            self._versions(context),
+            tuple(str(value.resolve(context)) for value in self.vary_on),
+        )
+        content = fragment_cache.get(key)
+        if content is None:
+            content = self.nodelist.render(context)
+            fragment_cache.set(key, content)
+        return content
+
+
+@register.tag('cache_fragment')
+def do_cache_fragment(parser, token):
+    bits = token.split_contents()
+    if len(bits) < 3 or not bits[2].startswith('versions='):
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} expects a fragment name followed by versions="label,..."'
+        )
+    nodelist = parser.parse(('endcache_fragment',))
+    parser.delete_first_token()
+
+    name = parser.compile_filter(bits[1])
+    labels = bits[2][len('versions='):].strip('"\'')
+    labels = tuple(label.strip() for label in labels.split(',') if label.strip())
+    vary_on = [parser.compile_filter(bit) for bit in bits[3:]]
+    return CacheFragmentNode(nodelist, name, labels, vary_on)
@@ -1,3 +1,710 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core import checks
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from LibraryProject import sqlite, write_queue
+from LibraryProject.testing import IsolatedCachesMixin
+from relationship_app import export, query_samples, versions
+from relationship_app.fragments import fragment_cache
+from relationship_app.loaders import RelationshipLoaders
+from relationship_app.models import Author, Book, Library, Librarian, UserProfile
+from relationship_app.pagination import KeysetPaginator
+from relationship_app.views import BOOK_SORT_OPTIONS, BOOKS_PER_PAGE
+from relationship_app.roles import ROLE_VERSION_KEY, get_user_role, role_cache
+
+
+class CacheTestCase(IsolatedCachesMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.clear()
+        role_cache.clear()
+
+    @staticmethod
+    def create_user(username, role='Member'):
+        user = CustomUser.objects.create_user(email=f'{username}@example.com', username=username)
+        profile = user.userprofile
+        profile.role = role
+        profile.save()
+        return user
+
+
+class RoleCacheTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.create_user('admin', role='Admin')
+
+    def set_role(self, role):
+        profile = self.user.userprofile
+        profile.role = role
+        profile.save()
+
+    def test_cached_role_needs_no_query(self):
+        self.assertEqual(get_user_role(self.user), 'Admin')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(self.user), 'Admin')
+
+    def test_demoted_admin_loses_access(self):
+        self.client.force_login(self.user)
+        url = reverse('admin_view')
+        self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.set_role('Member')
+        self.assertEqual(self.client.get(url, secure=True).status_code, 302)
+
+    def test_role_read_before_the_commit_is_not_kept(self):
+        get_user_role(self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.set_role('Member')
+            # Until the commit the old role stays current everywhere
+            self.assertEqual(get_user_role(self.user), 'Admin')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_user_role(self.user), 'Member')
+
+    def test_evicted_version_outdates_every_entry(self):
+        get_user_role(self.user)
+        self.set_role('Librarian')
+        # Another process's bump is lost with the counter
+        cache.delete(ROLE_VERSION_KEY.format(user_id=self.user.pk))
+        self.assertEqual(get_user_role(self.user), 'Librarian')
+
+
+class UserProfileSaveTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_user('reader')
+        self.user = CustomUser.objects.select_related('userprofile').get(username='reader')
+
+    def test_unchanged_profile_is_not_saved(self):
+        self.user.first_name = 'Ada'
+        # The user's own UPDATE only
+        with self.assertNumQueries(1):
+            self.user.save()
+
+    def test_only_changed_profile_fields_are_saved(self):
+        self.user.userprofile.role = 'Librarian'
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.user.save()
+        profile_updates = [query['sql'] for query in queries if '"relationship_app_userprofile"' in query['sql']]
+        self.assertEqual(len(profile_updates), 1)
+        self.assertRegex(profile_updates[0], r'SET "role" = \S+ WHERE')
+        self.assertEqual(UserProfile.objects.get(user=self.user).role, 'Librarian')
+
+    def test_user_without_a_loaded_profile_reads_nothing(self):
+        user = CustomUser.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            user.save()
+
+
+# Chunks of two, so the six users span several of them
+@mock.patch('relationship_app.views.USER_DIRECTORY_CHUNK_SIZE', 2)
+class AdminDirectoryTests(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.create_user('admin', role='Admin')
+        for username, role in [('ada', 'Librarian'), ('grace', 'Member'), ('alan', 'Member'),
+                               ('edsger', 'Librarian'), ('barbara', 'Member')]:
+            self.create_user(username, role=role)
+        CustomUser.objects.filter(username='alan').update(is_active=False)
+        self.url = reverse('admin_view')
+
+    def directory(self, **params):
+        response = self.client.get(self.url, params, secure=True)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        return re.findall(r'<tr>\s*<td>([^<]*)</td>\s*<td>([^<]*)</td>\s*<td>\s*<span[^>]*>\s*(\w+)'
+                          r'\s*</span>\s*</td>\s*<td>(\w+)</td>', body)
+
+    def test_lists_every_user_with_role_and_status(self):
+        self.client.force_login(self.admin)
+        self.assertEqual(self.directory(), [
+            (user.username, user.email, user.userprofile.role, 'Yes' if user.is_active else 'No')
+            for user in CustomUser.objects.select_related('userprofile').order_by('id')
+        ])
+
+    def test_filters(self):
+        self.client.force_login(self.admin)
+        self.assertEqual([row[0] for row in self.directory(role='Member', active='1')], ['grace', 'barbara'])
+        self.assertEqual([row[0] for row in self.directory(active='0')], ['alan'])
+        self.assertEqual([row[0] for row in self.directory(role='Nobody')], [row[0] for row in self.directory()])
+        response = self.client.get(self.url, {'role': 'Admin', 'active': '0'}, secure=True)
+        self.assertIn(b'No users found.', b''.join(response.streaming_content))
+
+    def test_requires_admin_role(self):
+        login = reverse('login')
+        self.assertTrue(self.client.get(self.url, secure=True)['Location'].startswith(login))
+        for username in ('ada', 'grace'):
+            with self.subTest(username=username):
+                self.client.force_login(CustomUser.objects.get(username=username))
+                response = self.client.get(self.url, secure=True)
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(response['Location'].startswith(login))
+
+
+class BookCounterTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='Ursula K. Le Guin')
+        cls.library = Library.objects.create(name='Central')
+        cls.books = [
+            Book.objects.create(title=title, author=cls.author)
+            for title in ('A Wizard of Earthsea', 'The Dispossessed')
+        ]
+        cls.library.books.add(*cls.books)
+
+    def test_counters_follow_membership_and_deletes(self):
+        self.library.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.library.book_count, self.author.book_count), (2, 2))
+
+        self.library.books.remove(self.books[0])
+        self.library.refresh_from_db()
+        self.assertEqual(self.library.book_count, 1)
+
+        self.books[1].delete()
+        self.library.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.library.book_count, self.author.book_count), (0, 1))
+
+    def test_book_delete_bumps_library_and_author_versions(self):
+        before = versions.get_versions([versions.LIBRARY, versions.AUTHOR, versions.BOOK])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[0].delete()
+        after = versions.get_versions([versions.LIBRARY, versions.AUTHOR, versions.BOOK])
+        for label in before:
+            self.assertNotEqual(before[label], after[label], label)
+
+    def test_librarian_table_shows_count_after_book_delete(self):
+        self.client.force_login(self.create_user('librarian', role='Librarian'))
+        url = reverse('librarian_view')
+        response = self.client.get(url, secure=True)
+        self.assertContains(response, '<td>2</td>')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[0].delete()
+        response = self.client.get(url, secure=True)
+        self.assertContains(response, '<td>1</td>')
+        self.assertNotContains(response, '<td>2</td>')
+
+
+class DashboardPageTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Terry Pratchett')
+        cls.books = [
+            Book.objects.create(title=f'Discworld {number:03}', author=author)
+            for number in range(BOOKS_PER_PAGE + 10)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.create_user('member'))
+        self.url = reverse('member_view')
+
+    def rows(self, response):
+        return response.content.decode().count('<td>') // 2
+
+    def test_catalog_is_paginated(self):
+        first = self.client.get(self.url, secure=True)
+        self.assertEqual(self.rows(first), BOOKS_PER_PAGE)
+        cursor = first.context['page'].next_cursor
+        second = self.client.get(self.url, {'cursor': cursor}, secure=True)
+        self.assertEqual(self.rows(second), 10)
+        self.assertContains(second, 'Discworld 059')
+        self.assertNotContains(second, 'Discworld 000')
+
+    def test_cached_page_runs_no_book_query(self):
+        self.client.get(self.url, secure=True)
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(self.rows(response), BOOKS_PER_PAGE)
+        self.assertFalse([q for q in queries if 'relationship_app_book' in q['sql']])
+
+    def test_changed_book_renders_the_page_again(self):
+        self.client.get(self.url, secure=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.books[0].pk).update(title='Discworld 000 (revised)')
+            versions.bump_versions(versions.BOOK)
+        self.assertContains(self.client.get(self.url, secure=True), 'Discworld 000 (revised)')
+
+
+class LoaderTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [Author.objects.create(name=name) for name in ('Octavia Butler', 'Iain Banks')]
+        cls.library = Library.objects.create(name='Branch')
+        cls.empty_library = Library.objects.create(name='Annex')
+        cls.librarian = Librarian.objects.create(name='Ada', library=cls.library)
+        for author in cls.authors:
+            for number in range(3):
+                book = Book.objects.create(title=f'{author.name} {number}', author=author)
+                cls.library.books.add(book)
+
+    def test_one_query_per_relation_and_memoized(self):
+        loaders = RelationshipLoaders()
+        ids = [author.pk for author in self.authors]
+        with self.assertNumQueries(1):
+            books = query_samples.query_books_by_authors(ids, loaders)
+        self.assertEqual([len(books[pk]) for pk in ids], [3, 3])
+        with self.assertNumQueries(0):
+            loaders.books_by_author.load_many(ids)
+            query_samples.query_books_by_author(ids[0], loaders)
+
+    def test_string_ids_find_rows(self):
+        loaders = RelationshipLoaders()
+        author_id = str(self.authors[0].pk)
+        self.assertEqual(len(query_samples.query_books_by_author(author_id, loaders)), 3)
+        self.assertEqual(len(query_samples.query_books_in_library(str(self.library.pk))), 6)
+        self.assertEqual(query_samples.query_librarian_for_library(str(self.library.pk)), self.librarian)
+        # Shares the memo of the integer id
+        with self.assertNumQueries(0):
+            loaders.books_by_author.load(self.authors[0].pk)
+
+    def test_library_detail_shows_librarian(self):
+        self.client.force_login(self.create_user('member'))
+        response = self.client.get(reverse('library_detail', args=[self.library.pk]), secure=True)
+        self.assertContains(response, 'Librarian: Ada')
+
+    def test_missing_ids(self):
+        with self.assertRaises(Author.DoesNotExist):
+            query_samples.query_books_by_author(0)
+        with self.assertRaises(Library.DoesNotExist):
+            query_samples.query_books_in_library(0)
+        with self.assertRaises(Library.DoesNotExist):
+            query_samples.query_librarian_for_library(0)
+        with self.assertRaises(Librarian.DoesNotExist):
+            query_samples.query_librarian_for_library(self.empty_library.pk)
+        self.assertEqual(query_samples.query_books_in_library(self.empty_library.pk), [])
+        self.assertEqual(query_samples.query_books_by_authors([0]), {0: []})
+        self.assertEqual(query_samples.query_librarians_for_libraries([0]), {0: None})
+
+
+class BookSearchTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='J. R. R. Tolkien')
+        cls.hobbit = Book.objects.create(title='The Hobbit', author=cls.author)
+        cls.lord = Book.objects.create(title='The Lord of the Rings', author=cls.author)
+
+    def search(self, text):
+        return [book.pk for book in Book.objects.search(text)]
+
+    def test_index_follows_books_and_authors(self):
+        self.assertEqual(self.search('hobb'), [self.hobbit.pk])
+        self.assertCountEqual(self.search('tolkien'), [self.hobbit.pk, self.lord.pk])
+
+        self.author.name = 'Tolkien, John'
+        self.author.save()
+        self.assertCountEqual(self.search('john'), [self.hobbit.pk, self.lord.pk])
+        self.lord.delete()
+        self.assertEqual(self.search('lord'), [])
+
+    def test_search_syntax_in_the_query_is_literal(self):
+        self.assertEqual(self.search('hobbit" OR "lord'), [])
+        self.assertEqual(self.search('***'), [])
+
+
+class LoadCatalogTests(CacheTestCase):
+    CATALOG = [
+        'title,author,libraries',
+        'A Wizard of Earthsea,Ursula K. Le Guin,Main;East',
+        'The Dispossessed,Ursula K. Le Guin,Main;Main',
+        'Cien años de soledad,Gabriel García Márquez,',
+        ',Nobody,Main',
+        'El amor en los tiempos del cólera,Gabriel García Márquez,East',
+    ]
+
+    def load(self, **options):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as source:
+            source.write('\n'.join(self.CATALOG) + '\n')
+        self.addCleanup(os.remove, source.name)
+        stdout = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('load_catalog', source.name, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_loads_books_counters_and_search_rows(self):
+        existing = Author.objects.create(name='Ursula K. Le Guin')
+        # Batches of two with a one-name cache look names up again
+        output = self.load(batch_size=2, name_cache_size=1)
+        self.assertIn('Loaded 4 books and 4 library memberships (1 skipped)', output)
+
+        self.assertEqual(Author.objects.filter(name='Ursula K. Le Guin').get(), existing)
+        marquez = Author.objects.get(name='Gabriel García Márquez')
+        self.assertEqual(marquez.name_normalized, 'gabriel garcia marquez')
+        existing.refresh_from_db()
+        self.assertEqual((existing.book_count, marquez.book_count), (2, 2))
+        self.assertEqual(
+            dict(Library.objects.values_list('name', 'book_count')), {'Main': 2, 'East': 2}
+        )
+        self.assertEqual(
+            [book.title for book in Book.objects.search('colera')],
+            ['El amor en los tiempos del cólera'],
+        )
+        self.assertEqual(len(Book.objects.search('guin')), 2)
+
+
+class ExportCatalogTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        le_guin = Author.objects.create(name='Ursula K. Le Guin')
+        marquez = Author.objects.create(name='Gabriel García Márquez')
+        books = [
+            Book.objects.create(title=title, author=author)
+            for title, author in [
+                ('A Wizard of Earthsea', le_guin),
+                ('The Dispossessed', le_guin),
+                ('Cien años de soledad', marquez),
+                ('The Lathe of Heaven', le_guin),
+                ('El amor en los tiempos del cólera', marquez),
+            ]
+        ]
+        # A gap in the primary keys, inside the second chunk of two
+        books.pop(3).delete()
+        main = Library.objects.create(name='Main')
+        east = Library.objects.create(name='East')
+        main.books.add(books[0], books[1], books[3])
+        east.books.add(books[1], books[2])
+
+    def expected_rows(self):
+        return [
+            [book.pk, book.title, book.author_id, book.author.name,
+             sorted(book.libraries.values_list('name', flat=True))]
+            for book in Book.objects.select_related('author').order_by('pk')
+        ]
+
+    def test_chunks_follow_the_primary_key(self):
+        chunks = list(export.iter_catalog_chunks(chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2])
+        self.assertLess(chunks[0][-1][0], chunks[1][0][0])
+        self.assertEqual([list(row) for chunk in chunks for row in chunk], self.expected_rows())
+
+    def test_command_writes_csv(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        path = os.path.join(directory, 'catalog.csv')
+        stdout = io.StringIO()
+        call_command('export_catalog', path, chunk_size=2, stdout=stdout)
+        self.assertIn('Exported 4 books as csv', stdout.getvalue())
+        with open(path, newline='', encoding='utf-8') as exported:
+            rows = list(csv.reader(exported))
+        self.assertEqual(rows[0], list(export.COLUMNS))
+        self.assertEqual(rows[1:], [
+            [str(pk), title, str(author_id), author, ';'.join(libraries)]
+            for pk, title, author_id, author, libraries in self.expected_rows()
+        ])
+
+    def test_view_streams_ndjson(self):
+        reader = self.create_user('reader')
+        url = reverse('export_catalog')
+        self.client.force_login(reader)
+        self.assertEqual(self.client.get(url, secure=True).status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reader.user_permissions.add(Permission.objects.get(codename='can_view'))
+        # Chunks of three put the boundary between the stored books
+        iter_chunks = export.iter_catalog_chunks
+        with mock.patch.object(export, 'iter_catalog_chunks', lambda: iter_chunks(chunk_size=3)):
+            response = self.client.get(url, {'format': 'ndjson'}, secure=True)
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="catalog.ndjson"')
+        self.assertEqual(
+            [list(json.loads(line).values()) for line in body.splitlines()],
+            self.expected_rows(),
+        )
+
+
+class AuthorAutocompleteTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.banks = [Author.objects.create(name='Iain Banks') for _ in range(2)]
+        cls.atwood = Author.objects.create(name='Margaret Atwood')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.create_user('reader'))
+
+    def autocomplete(self, query):
+        response = self.client.get(reverse('author_autocomplete'), {'q': query}, secure=True)
+        return {result['label']: result['id'] for result in response.json()['results']}
+
+    def test_authors_sharing_a_name_get_distinct_labels(self):
+        self.assertEqual(self.autocomplete('iain'), {
+            f'Iain Banks (#{author.pk})': author.pk for author in self.banks
+        })
+        self.assertEqual(self.autocomplete('Marg'), {'Margaret Atwood': self.atwood.pk})
+
+    def test_book_forms_share_the_author_picker(self):
+        editor = self.create_user('editor')
+        editor.user_permissions.add(*Permission.objects.filter(
+            content_type__app_label='relationship_app', codename__in=['can_add_book', 'can_edit'],
+        ))
+        self.client.force_login(editor)
+        book = Book.objects.create(title='Use of Weapons', author=self.banks[1])
+        script = 'src="/static/relationship_app/js/author-autocomplete.js"'
+        add = self.client.get(reverse('add_book'), secure=True)
+        self.assertContains(add, script, count=1)
+        self.assertContains(add, f'data-autocomplete-url="{reverse("author_autocomplete")}"')
+        edit = self.client.get(reverse('edit_book', args=[book.pk]), secure=True)
+        self.assertContains(edit, script, count=1)
+        self.assertContains(edit, f'name="author" value="{self.banks[1].pk}"')
+
+
+class ConditionalGetTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='N. K. Jemisin')
+        Book.objects.create(title='The Fifth Season', author=cls.author)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.create_user('reader'))
+        self.url = reverse('list_books')
+
+    def revalidate(self):
+        first = self.client.get(self.url, secure=True)
+        self.assertEqual(first.status_code, 200)
+        return self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_unchanged_page_is_not_modified(self):
+        self.assertEqual(self.revalidate().status_code, 304)
+
+    def test_change_invalidates_etag(self):
+        etag = self.client.get(self.url, secure=True)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='The Obelisk Gate', author=self.author)
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'The Obelisk Gate')
+
+    def test_librarian_change_invalidates_library_page(self):
+        library = Library.objects.create(name='Central')
+        librarian = Librarian.objects.create(name='Ada', library=library)
+        url = reverse('library_detail', args=[library.pk])
+        etag = self.client.get(url, secure=True)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            librarian.name = 'Grace'
+            librarian.save()
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Librarian: Grace')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            librarian.delete()
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Librarian:')
+
+    def test_renamed_user_gets_a_fresh_page(self):
+        etag = self.client.get(self.url, secure=True)['ETag']
+        user = CustomUser.objects.get(username='reader')
+        user.username = 'renamed'
+        user.save()
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Welcome, renamed!')
+
+    def test_process_local_cache_disables_conditional_get(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES={**settings.CACHES, **locmem}):
+            response = self.client.get(self.url, secure=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('ETag', response)
+            warnings = versions.check_shared_cache(None)
+        self.assertEqual([warning.id for warning in warnings], ['relationship_app.W001'])
+        self.assertEqual(versions.check_shared_cache(None), [])
+
+
+# Small chunks so the five books span several of them
+@mock.patch('relationship_app.views.BOOK_STREAM_CHUNK_SIZE', 2)
+class BookStreamTests(CacheTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(name='Ann Leckie')
+        cls.titles = [f'Ancillary {number}' for number in range(5)]
+        for title in cls.titles:
+            Book.objects.create(title=title, author=author)
+
+    async def stream(self, url, **params):
+        response = await self.async_client.get(url, params, secure=True)
+        if not response.streaming:
+            return response, None
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        return response, body.decode()
+
+    async def test_list_books_streams_html_and_ndjson(self):
+        url = reverse('list_books_stream')
+        response, body = await self.stream(url, sort='-id')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body.count('<li>'), 5)
+        self.assertLess(body.index('Ancillary 4'), body.index('Ancillary 0'))
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+        response, body = await self.stream(url, format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['title'] for row in rows], sorted(self.titles))
+        self.assertEqual({row['author_name'] for row in rows}, {'Ann Leckie'})
+
+    async def test_member_view_stream(self):
+        url = reverse('member_view_stream')
+        member = await sync_to_async(self.create_user)('member')
+        await self.async_client.aforce_login(member)
+        response, body = await self.stream(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body.count('<td>Ancillary'), 5)
+        self.assertIn('Welcome, member!', body)
+
+        response, body = await self.stream(url, format='ndjson')
+        self.assertEqual([json.loads(line)['title'] for line in body.splitlines()], self.titles)
+
+    async def test_member_view_stream_requires_member_role(self):
+        url = reverse('member_view_stream')
+        response, _ = await self.stream(url)
+        self.assertEqual(response.status_code, 302)
+
+        librarian = await sync_to_async(self.create_user)('librarian', role='Librarian')
+        await self.async_client.aforce_login(librarian)
+        response, body = await self.stream(url, format='ndjson')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+        self.assertIsNone(body)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Shared author names and titles exercise the id tie-break
+        authors = [Author.objects.create(name=name) for name in ('Banks', 'Atwood', 'Banks')]
+        for number in range(23):
+            Book.objects.create(title=f'Title {number % 7}', author=authors[number % 3])
+
+    def walk(self, paginator, cursor=None, forward=True):
+        """Follow cursors to the end, returning the pages' ids in display order."""
+        pages = []
+        while True:
+            page = paginator.page(cursor)
+            pages.append([book.pk for book in page])
+            cursor = page.next_cursor if forward else page.prev_cursor
+            if cursor is None:
+                return pages
+
+    def test_cursors_round_trip_for_every_sort(self):
+        for sort, ordering in BOOK_SORT_OPTIONS.items():
+            with self.subTest(sort=sort):
+                paginator = KeysetPaginator(Book.objects.select_related('author'), ordering, per_page=5)
+                expected = list(Book.objects.order_by(*ordering).values_list('pk', flat=True))
+
+                pages = self.walk(paginator)
+                self.assertEqual([pk for page in pages for pk in page], expected)
+                self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+
+                # Back from the last page with prev cursors
+                last = paginator.page(None)
+                while last.has_next:
+                    last = paginator.page(last.next_cursor)
+                back = self.walk(paginator, last.prev_cursor, forward=False)
+                self.assertEqual(list(reversed(back)), pages[:-1])
+
+    def test_foreign_or_tampered_cursor_gives_first_page(self):
+        by_title = KeysetPaginator(Book.objects.all(), BOOK_SORT_OPTIONS['title'], per_page=5)
+        by_id = KeysetPaginator(Book.objects.all(), BOOK_SORT_OPTIONS['id'], per_page=5)
+        cursor = by_title.page(None).next_cursor
+        first = [book.pk for book in by_id.page(None)]
+        self.assertEqual([book.pk for book in by_id.page(cursor)], first)
+        self.assertEqual([book.pk for book in by_title.page(cursor + 'x')], [
+            book.pk for book in by_title.page(None)
+        ])
+
+
+class WriteQueueTests(IsolatedCachesMixin, TransactionTestCase):
+    def setUp(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.queue = write_queue.WriteQueue(
+            group_size=8, group_window=0.005, lock_path=os.path.join(directory, 'write.lock')
+        )
+
+    def create_author(self, name):
+        return Author.objects.create(name=name).name
+
+    def test_jobs_are_committed_and_errors_returned_to_their_caller(self):
+        self.assertEqual(self.queue.submit(self.create_author, 'Le Guin'), 'Le Guin')
+        with self.assertRaises(ValueError):
+            self.queue.submit(int, 'not a number')
+        self.assertTrue(Author.objects.filter(name='Le Guin').exists())
+
+    def test_base_exception_in_a_job_does_not_kill_the_writer(self):
+        def leave():
+            Author.objects.create(name='Rolled back')
+            raise SystemExit(1)
+
+        with self.assertRaises(SystemExit):
+            self.queue.submit(leave)
+        self.assertEqual(self.queue.submit(self.create_author, 'Butler'), 'Butler')
+        self.assertFalse(Author.objects.filter(name='Rolled back').exists())
+
+    def test_base_exception_in_a_commit_fails_the_group_only(self):
+        with mock.patch.object(self.queue, '_commit_group', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.queue.submit(self.create_author, 'Lost')
+        self.assertEqual(self.queue.submit(self.create_author, 'Banks'), 'Banks')
+
+    def test_dead_writer_thread_is_restarted(self):
+        self.queue.submit(self.create_author, 'Atwood')
+        dead = threading.Thread(target=lambda: None)
+        dead.start()
+        dead.join()
+        self.queue._thread = dead
+        self.assertEqual(self.queue.submit(self.create_author, 'Jemisin'), 'Jemisin')
+        self.assertIsNot(self.queue._thread, dead)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def pragmas(self, **settings_overrides):
+        """Open a fresh connection to a file database and read its pragmas."""
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        default = connections['default']
+        settings_dict = {**default.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+        with override_settings(**settings_overrides):
+            fresh = default.__class__(settings_dict, alias='profile-test')
+            try:
+                with fresh.cursor() as cursor:
+                    return {
+                        name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in ('journal_mode', 'synchronous', 'busy_timeout')
+                    }
+            finally:
+                fresh.close()
+
+    def test_wal_profile_is_applied_to_new_connections(self):
+        # synchronous: 1 is NORMAL, 2 is FULL
+        self.assertEqual(self.pragmas(SQLITE_PROFILE='wal'), {
+            'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000,
+        })
+        self.assertEqual(self.pragmas(SQLITE_PROFILE='wal-durable')['synchronous'], 2)
+
+    def test_default_profile_changes_nothing(self):
+        pragmas = self.pragmas(SQLITE_PROFILE='default')
+        self.assertEqual((pragmas['journal_mode'], pragmas['synchronous']), ('delete', 2))
+
+    def test_unsafe_pragma_values_are_refused(self):
+        with self.assertRaises(ValueError):
+            sqlite.get_pragmas('nope', {})
+        with self.assertRaises(ValueError):
+            sqlite.apply_pragmas(None, {'journal_mode': 'WAL; DROP TABLE x'})
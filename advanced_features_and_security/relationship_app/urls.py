@@ -5,6 +5,12 @@ urlpatterns = [
     # Book list view (function-based)
     path('books/', views.list_books, name='list_books'),
     
+    # Whole catalog streamed as HTML or NDJSON (async, for ASGI servers)
+    path('books/stream/', views.list_books_stream, name='list_books_stream'),
+    
+    # Full-text catalog search
+    path('search/', views.search_books, name='search_books'),
+    
     # Library detail view (class-based)
     path('library/<int:pk>/', views.LibraryDetailView.as_view(), name='library_detail'),
     
@@ -14,12 +20,32 @@ urlpatterns = [
     path('register/', views.register, name='register'),
     
     # Role-based access control URLs
-    path('admin/', views.admin_view, name='admin_view'),
+    # 'admin/' is taken by the Django admin site in LibraryProject/urls.py
+    path('admin-view/', views.admin_view, name='admin_view'),
     path('librarian/', views.librarian_view, name='librarian_view'),
     path('member/', views.member_view, name='member_view'),
+    path('member/stream/', views.member_view_stream, name='member_view_stream'),
+    
+    # Profile photo upload, streamed by accounts/uploads.py
+    path('profile/photo/', views.profile_photo, name='profile_photo'),
     
     # Permission-based URLs for book operations
     path('add-book/', views.add_book, name='add_book'),
     path('edit-book/<int:pk>/', views.edit_book, name='edit_book'),
     path('delete-book/<int:pk>/', views.delete_book, name='delete_book'),
+    
+    # Catalog download for analytics (CSV or NDJSON)
+    path('export/', views.export_catalog, name='export_catalog'),
+    
+    # Author autocomplete used by the add/edit book forms
+    path('authors/autocomplete/', views.author_autocomplete, name='author_autocomplete'),
+    
+    # Hit/miss counters of the template fragment cache
+    path('fragment-cache/stats/', views.fragment_cache_stats, name='fragment_cache_stats'),
+    
+    # Queue depth and latency of the serialized writer
+    path('write-queue/stats/', views.write_queue_stats, name='write_queue_stats'),
+    
+    # Per-tier hit ratios of the two-tier caches
+    path('cache/stats/', views.cache_stats, name='cache_stats'),
 ]
@@ -0,0 +1,166 @@
+"""
+Per-model change versions for conditional GET (ETag / Last-Modified).
+
+Each tracked model has a version stamp in the Django cache: the time of
+its last change. Signal handlers in models.py bump the stamp after every
+committed save, delete or membership change, and bulk loaders bump it
+explicitly. Catalog views are wrapped in conditional_on_versions(), which
+builds the ETag and Last-Modified headers from the stamps alone. A client
+revalidating an unchanged page therefore gets a 304 before any queryset
+runs or any template renders.
+
+Version stamps must live in a cache shared by all worker processes;
+with a per-process cache a change made in one process would never reach
+the stamps of the others, which would keep answering 304 with stale
+pages. When the default cache is process-local (locmem or dummy),
+conditional_on_versions() therefore leaves views unconditional, the
+fragment cache renders every time, and `manage.py check` warns.
+"""
+
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+from django.db import transaction
+from django.views.decorators.http import condition
+
+
+BOOK = 'book'
+AUTHOR = 'author'
+LIBRARY = 'library'  # includes Library.books membership and librarians
+USER = 'user'
+USER_PROFILE = 'userprofile'
+
+VERSION_KEY = 'relationship_app:version:{label}'
+
+# Version stamps outlive any page that could have been rendered from them
+VERSION_TIMEOUT = None
+
+# Cache backends whose entries are private to one process
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def stamps_are_shared():
+    """Return False if the default cache is private to each process."""
+    backend = settings.CACHES.get(DEFAULT_CACHE_ALIAS, {}).get('BACKEND', '')
+    return backend not in PROCESS_LOCAL_BACKENDS
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if stamps_are_shared():
+        return []
+    return [checks.Warning(
+        'The default cache is private to each process, so change versions '
+        'are not shared between workers.',
+        hint='Use a shared cache backend such as LibraryProject.cache.TwoTierCache. '
+             'Conditional GET and fragment caching are disabled until then.',
+        id='relationship_app.W001',
+    )]
+
+
+def _key(label):
+    return VERSION_KEY.format(label=label)
+
+
+def bump_versions(*labels):
+    """
+    Mark the given models as changed once the current transaction commits.
+    Bumping before commit could let a concurrent request pair the new
+    version with data it cannot see yet.
+    """
+    def bump():
+        now = time.time()
+        cache.set_many({_key(label): now for label in labels}, timeout=VERSION_TIMEOUT)
+
+    transaction.on_commit(bump)
+
+
+def get_versions(labels):
+    """
+    Return a dict of label -> version stamp, initializing missing stamps
+    to the current time (a cold cache is treated as "just changed").
+    """
+    keys = {label: _key(label) for label in labels}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for label, key in keys.items():
+        if key not in found:
+            cache.add(key, time.time(), timeout=VERSION_TIMEOUT)
+            found[key] = cache.get(key, time.time())
+        versions[label] = found[key]
+    return versions
+
+
+def conditional_on_versions(*labels):
+    """
+    View decorator answering conditional GETs from the version stamps.
+
+    The ETag covers the stamps, the full path (sort, cursor and search
+    parameters) and the requesting user, since pages greet the user by
+    name and show their photo. Last-Modified is the newest stamp, or the
+    user's last login if that is newer, so a different user never
+    revalidates another's copy.
+
+    The ETag is only a valid validator if the labels cover every model
+    the view's template renders: list each of them, and have models.py
+    bump a listed label for any related model the page shows (as
+    Librarian bumps LIBRARY).
+    """
+    def versions_for(request):
+        # Memoized so etag_func and last_modified_func read the cache once
+        cached = getattr(request, '_model_versions', None)
+        if cached is None:
+            cached = get_versions(labels)
+            request._model_versions = cached
+        return cached
+
+    def etag_func(request, *args, **kwargs):
+        versions = versions_for(request)
+        user_id = request.user.pk if request.user.is_authenticated else 0
+        # Pages greet the user by username (not USERNAME_FIELD, the email)
+        username = request.user.username
+        # Changes when the photo is replaced or its thumbnails become ready
+        photo = getattr(request.user, 'thumbnails_version', '')
+        material = '|'.join(
+            [request.get_full_path(), str(user_id), username, photo]
+            + [f'{label}={versions[label]!r}' for label in labels]
+        )
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+    def last_modified_func(request, *args, **kwargs):
+        stamp = max(versions_for(request).values())
+        modified = datetime.fromtimestamp(stamp, tz=timezone.utc)
+        last_login = getattr(request.user, 'last_login', None)
+        if last_login and last_login > modified:
+            modified = last_login
+        return modified
+
+    conditional = condition(etag_func=etag_func, last_modified_func=last_modified_func)
+
+    def decorator(view):
+        conditional_view = conditional(view)
+
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                target = conditional_view if stamps_are_shared() else view
+                return await target(request, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            # Stale stamps in this process would answer 304 to changed pages
+            target = conditional_view if stamps_are_shared() else view
+            return target(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
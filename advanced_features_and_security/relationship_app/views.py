@@ -1,18 +1,36 @@
+import json
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
 from django.shortcuts import render, redirect
+from django.template.loader import get_template, render_to_string
 from django.views.generic import ListView, DetailView
-from django.contrib.auth import authenticate, login, logout
+from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test, permission_required
-from django.contrib.auth.forms import UserCreationForm
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
-from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
 from django.utils.html import escape
 
+from accounts.forms import CustomUserCreationForm
+from accounts import uploads
+from LibraryProject import write_queue
+from LibraryProject.write_queue import run_write
+from relationship_app import export
+from relationship_app.fragments import fragment_cache
+from relationship_app.loaders import get_loaders
 from relationship_app.models import Book, Library, Author, UserProfile
+from relationship_app.pagination import KeysetPaginator
+from relationship_app.roles import get_user_role
+from relationship_app.versions import conditional_on_versions, BOOK, AUTHOR, LIBRARY, USER, USER_PROFILE
 from django.conf import settings
+from django.core.cache import caches
 
 # Get the custom user model
-CustomUser = settings.AUTH_USER_MODEL
+CustomUser = get_user_model()
 
 
 # ============== UTILITY FUNCTIONS ==============
@@ -27,28 +45,124 @@ def sanitize_input(value):
 
 # ============== FUNCTION-BASED VIEWS ==============
 
+# Sort options for the catalog. Every ordering ends with 'id' so rows have a
+# unique position. Title and id orderings seek straight to the cursor through
+# a Book index (see models.py). 'author' orders across the join, which no
+# single index covers: SQLite walks Author(name, id) from the cursor and sorts
+# the books of each author name, other databases may scan and sort the joined
+# rows. Denormalize the author name onto Book if that sort becomes hot.
+BOOK_SORT_OPTIONS = {
+    'title': ('title', 'id'),
+    '-title': ('-title', '-id'),
+    'author': ('author__name', 'id'),
+    '-author': ('-author__name', '-id'),
+    'id': ('id',),
+    '-id': ('-id',),
+}
+DEFAULT_BOOK_SORT = 'title'
+BOOKS_PER_PAGE = 50
+
+
+@conditional_on_versions(BOOK, AUTHOR)
 def list_books(request):
     """
     Function-based view to list all books.
-    This view is publicly accessible and displays all books.
+    This view is publicly accessible and displays the catalog one page at a time.
+    
+    PERFORMANCE:
+    - Keyset pagination: the 'cursor' query parameter is an opaque token
+      holding the sort key of the boundary row, so deep pages cost the
+      same as the first one
+    - Authors are fetched in the same query via select_related
+    - Conditional GETs are answered with 304 from the Book/Author change
+      versions before any query runs (see versions.py)
     """
-    books = Book.objects.all()
+    sort = request.GET.get('sort', DEFAULT_BOOK_SORT)
+    if sort not in BOOK_SORT_OPTIONS:
+        sort = DEFAULT_BOOK_SORT
+    
+    paginator = KeysetPaginator(
+        Book.objects.select_related('author'),
+        BOOK_SORT_OPTIONS[sort],
+        per_page=BOOKS_PER_PAGE,
+    )
+    page = paginator.page(request.GET.get('cursor'))
     context = {
-        'books': books
+        'books': page.object_list,
+        'page': page,
+        'sort': sort,
     }
     return render(request, 'relationship_app/list_books.html', context)
 
 
+SEARCH_RESULTS_LIMIT = 50
+
+
+@conditional_on_versions(BOOK, AUTHOR)
+def search_books(request):
+    """
+    Function-based view to search the catalog by book title or author name.
+    This view is publicly accessible.
+    
+    PERFORMANCE:
+    - Matches come from the FTS5 index (see search.py), ranked by bm25,
+      instead of LIKE scans over the book and author tables
+    - Results and their authors are loaded in a single query
+    """
+    query = request.GET.get('q', '').strip()
+    books = []
+    if query:
+        books = Book.objects.select_related('author').search(query, limit=SEARCH_RESULTS_LIMIT)
+    context = {
+        'query': query,
+        'books': books,
+    }
+    return render(request, 'relationship_app/search_results.html', context)
+
+
 # ============== CLASS-BASED VIEWS ==============
 
+@method_decorator(conditional_on_versions(LIBRARY, BOOK, AUTHOR), name='dispatch')
 class LibraryDetailView(DetailView):
     """
-    Class-based view to display library details with all books.
+    Class-based view to display library details with its books.
     Requires user to be logged in to view library details.
+    
+    PERFORMANCE:
+    - The library's books are keyset-paginated by (title, id), so a
+      library with tens of thousands of books renders one page at a time
+    - Each page loads books and their authors in a single query
+    - The total book count is the stored Library.book_count counter, so
+      the empty-state check does not run a COUNT(*)
+    - The librarian comes from the request's batched loaders (see
+      loaders.py), so other code on the request reuses the lookup
     """
     model = Library
     template_name = 'relationship_app/library_detail.html'
     context_object_name = 'library'
+    books_per_page = BOOKS_PER_PAGE
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        library = self.object
+        book_count = library.book_count
+        
+        page = None
+        if book_count:
+            paginator = KeysetPaginator(
+                Book.objects.filter(libraries=library).select_related('author'),
+                ('title', 'id'),
+                per_page=self.books_per_page,
+            )
+            page = paginator.page(self.request.GET.get('cursor'))
+        
+        context.update({
+            'books': page.object_list if page else [],
+            'page': page,
+            'book_count': book_count,
+            'librarian': get_loaders(self.request).librarian_for_library.load(library.pk),
+        })
+        return context
 
 
 # ============== AUTHENTICATION VIEWS ==============
@@ -65,14 +179,21 @@ def register(request):
     - Password is hashed using Django's password hashing algorithm
     """
     if request.method == 'POST':
-        form = UserCreationForm(request.POST)
+        form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            user = form.save()
+            # Hash the password here, outside the (possibly serialized) write
+            user = form.save(commit=False)
+            
+            def create_user():
+                user.save()
+                form.save_m2m()
+            
             # UserProfile is automatically created via signal in models.py
+            run_write(create_user)
             login(request, user)
             return redirect('list_books')
     else:
-        form = UserCreationForm()
+        form = CustomUserCreationForm()
     return render(request, 'relationship_app/register.html', {'form': form})
 
 
@@ -117,16 +238,15 @@ def logout_view(request):
 
 
 # ============== ROLE-BASED ACCESS CONTROL ==============
+# Roles are resolved through relationship_app.roles, which caches them per
+# process so the dashboards do not read UserProfile on every request.
 
 def is_admin(user):
     """
     Check if user has Admin role.
     Returns True if user's profile role is 'Admin', False otherwise.
     """
-    try:
-        return user.userprofile.role == 'Admin'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_user_role(user) == 'Admin'
 
 
 def is_librarian(user):
@@ -134,10 +254,7 @@ def is_librarian(user):
     Check if user has Librarian role.
     Returns True if user's profile role is 'Librarian', False otherwise.
     """
-    try:
-        return user.userprofile.role == 'Librarian'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_user_role(user) == 'Librarian'
 
 
 def is_member(user):
@@ -145,14 +262,12 @@ def is_member(user):
     Check if user has Member role.
     Returns True if user's profile role is 'Member', False otherwise.
     """
-    try:
-        return user.userprofile.role == 'Member'
-    except UserProfile.DoesNotExist:
-        return False
+    return get_user_role(user) == 'Member'
 
 
 @login_required(login_url='login')
 @user_passes_test(is_admin)
+@conditional_on_versions(USER, USER_PROFILE)
 def admin_view(request):
     """
     View accessible only to Admin users.
@@ -164,18 +279,87 @@ def admin_view(request):
     FUNCTIONALITY:
     - Displays all users and their roles
     - Admin users can manage user roles and permissions
+    - Optional filters: ?role=Admin|Librarian|Member and ?active=1|0
+    
+    PERFORMANCE:
+    - Profiles are joined into the user query via select_related
+    - Rows are read with chunked iteration and streamed to the client
+      chunk by chunk, so memory stays flat however many users exist
+    - Role and is_active filters are backed by indexes
     """
-    # Use the custom user model to query users
-    users = settings.AUTH_USER_MODEL.objects.all()
+    users = CustomUser.objects.select_related('userprofile').order_by('id')
+    
+    role = request.GET.get('role')
+    if role not in dict(UserProfile.ROLE_CHOICES):
+        role = None
+    if role:
+        users = users.filter(userprofile__role=role)
+    
+    active = request.GET.get('active')
+    if active in ('1', '0'):
+        users = users.filter(is_active=active == '1')
+    else:
+        active = None
+    
     context = {
-        'users': users,
-        'page_title': 'Admin Dashboard'
+        'page_title': 'Admin Dashboard',
+        'roles': [choice for choice, _ in UserProfile.ROLE_CHOICES],
+        'selected_role': role,
+        'selected_active': active,
     }
-    return render(request, 'relationship_app/admin_view.html', context)
+    return StreamingHttpResponse(
+        stream_user_directory(request, users, context),
+        content_type='text/html; charset=utf-8',
+    )
+
+
+USER_DIRECTORY_CHUNK_SIZE = 2000
+USER_ROWS_MARKER = '<!-- user-rows -->'
+
+
+def stream_user_directory(request, users, context):
+    """
+    Yield the admin directory page in pieces.
+    
+    admin_view.html is rendered once without rows and split at the
+    USER_ROWS_MARKER comment; the rows are rendered in between from
+    admin_user_rows.html, one chunk of users at a time.
+    """
+    page = render_to_string('relationship_app/admin_view.html', context, request=request)
+    head, tail = page.split(USER_ROWS_MARKER, 1)
+    yield head
+    
+    rows_template = get_template('relationship_app/admin_user_rows.html')
+    chunk = []
+    rendered_any = False
+    for account in users.iterator(chunk_size=USER_DIRECTORY_CHUNK_SIZE):
+        chunk.append(account)
+        if len(chunk) == USER_DIRECTORY_CHUNK_SIZE:
+            yield rows_template.render({'accounts': chunk})
+            rendered_any = True
+            chunk = []
+    if chunk or not rendered_any:
+        yield rows_template.render({'accounts': chunk})
+    
+    yield tail
+
+
+def lazy_book_page(cursor):
+    """
+    Return the dashboards' page of books for cursor, queried on first use,
+    so a page served from the fragment cache runs no query.
+    """
+    paginator = KeysetPaginator(
+        Book.objects.select_related('author'),
+        BOOK_SORT_OPTIONS[DEFAULT_BOOK_SORT],
+        per_page=BOOKS_PER_PAGE,
+    )
+    return SimpleLazyObject(lambda: paginator.page(cursor))
 
 
 @login_required(login_url='login')
 @user_passes_test(is_librarian)
+@conditional_on_versions(LIBRARY, BOOK, AUTHOR)
 def librarian_view(request):
     """
     View accessible only to Librarian users.
@@ -187,12 +371,21 @@ def librarian_view(request):
     FUNCTIONALITY:
     - Displays all libraries and books
     - Librarians can manage library inventory
+    
+    PERFORMANCE:
+    - Book counts come from the stored Library.book_count counter
+    - Books are keyset-paginated by (title, id), with authors joined
+      into the page query via select_related
+    - The library table and each page of the book table are
+      fragment-cached until a library, book or author changes; the
+      queries stay lazy and only run on a cache miss
     """
     libraries = Library.objects.all()
-    books = Book.objects.all()
+    cursor = request.GET.get('cursor', '')
     context = {
         'libraries': libraries,
-        'books': books,
+        'page': lazy_book_page(cursor),
+        'cursor': cursor,
         'page_title': 'Librarian Dashboard'
     }
     return render(request, 'relationship_app/librarian_view.html', context)
@@ -200,6 +393,7 @@ def librarian_view(request):
 
 @login_required(login_url='login')
 @user_passes_test(is_member)
+@conditional_on_versions(BOOK, AUTHOR)
 def member_view(request):
     """
     View accessible only to Member users.
@@ -211,18 +405,146 @@ def member_view(request):
     FUNCTIONALITY:
     - Displays available books
     - Members can browse the library catalog
+    
+    PERFORMANCE:
+    - Books are keyset-paginated by (title, id), with authors joined
+      into the page query via select_related
+    - Each page of the book table is fragment-cached until a book or
+      author changes; the page query only runs on a cache miss
     """
-    books = Book.objects.all()
+    cursor = request.GET.get('cursor', '')
     context = {
-        'books': books,
+        'page': lazy_book_page(cursor),
+        'cursor': cursor,
         'page_title': 'Member Dashboard'
     }
     return render(request, 'relationship_app/member_view.html', context)
 
 
+# ============== ASYNC STREAMING VIEWS ==============
+# Under ASGI these views hold no worker thread while the client reads: rows
+# are fetched with aiterator() and sent as they arrive, so the first byte
+# goes out before the catalog is queried and memory stays flat however
+# many books there are. Add ?format=ndjson (or send Accept:
+# application/x-ndjson) to get one JSON object per line instead of HTML.
+
+BOOK_STREAM_CHUNK_SIZE = 500
+BOOK_ROWS_MARKER = '<!-- book-rows -->'
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(request):
+    """Return True if the client asked for NDJSON instead of HTML."""
+    if request.GET.get('format') == 'ndjson':
+        return True
+    return NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+
+
+async def astream_books_ndjson(books):
+    """Yield the books as NDJSON, one chunk of lines at a time."""
+    chunk = []
+    async for book in books.aiterator(chunk_size=BOOK_STREAM_CHUNK_SIZE):
+        chunk.append(json.dumps(book) + '\n')
+        if len(chunk) == BOOK_STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+async def astream_books_html(request, books, context):
+    """
+    Yield a book page in pieces.
+    
+    book_stream.html is rendered once without rows and split at the
+    BOOK_ROWS_MARKER comment; the rows are rendered in between from
+    book_stream_rows.html, one chunk of books at a time.
+    """
+    # The page greets request.user, whose lazy lookup is sync-only
+    page = await sync_to_async(render_to_string)(
+        'relationship_app/book_stream.html', context, request=request
+    )
+    head, tail = page.split(BOOK_ROWS_MARKER, 1)
+    yield head
+    
+    rows_template = get_template('relationship_app/book_stream_rows.html')
+    layout = context['layout']
+    chunk = []
+    rendered_any = False
+    async for book in books.aiterator(chunk_size=BOOK_STREAM_CHUNK_SIZE):
+        chunk.append(book)
+        if len(chunk) == BOOK_STREAM_CHUNK_SIZE:
+            yield rows_template.render({'books': chunk, 'layout': layout})
+            rendered_any = True
+            chunk = []
+    if chunk or not rendered_any:
+        yield rows_template.render({'books': chunk, 'layout': layout})
+    
+    yield tail
+
+
+def book_stream_response(request, books, context):
+    """Stream books as NDJSON or HTML, whichever the client asked for."""
+    books = books.values('id', 'title', author_name=F('author__name'))
+    if wants_ndjson(request):
+        return StreamingHttpResponse(
+            astream_books_ndjson(books),
+            content_type=NDJSON_CONTENT_TYPE,
+        )
+    return StreamingHttpResponse(
+        astream_books_html(request, books, context),
+        content_type='text/html; charset=utf-8',
+    )
+
+
+async def list_books_stream(request):
+    """
+    Async variant of list_books streaming the whole catalog in one response.
+    This view is publicly accessible.
+    
+    PERFORMANCE:
+    - Same sort options and indexes as list_books, without pagination
+    - Time to first byte does not depend on the size of the catalog
+    """
+    sort = request.GET.get('sort', DEFAULT_BOOK_SORT)
+    if sort not in BOOK_SORT_OPTIONS:
+        sort = DEFAULT_BOOK_SORT
+    
+    books = Book.objects.order_by(*BOOK_SORT_OPTIONS[sort])
+    context = {
+        'page_title': 'Books Available:',
+        'layout': 'list',
+        'sort': sort,
+    }
+    return book_stream_response(request, books, context)
+
+
+@login_required(login_url='login')
+@user_passes_test(is_member)
+async def member_view_stream(request):
+    """
+    Async variant of member_view streaming the book table.
+    
+    ACCESS CONTROL:
+    - Requires user to be logged in (@login_required)
+    - Requires user to have Member role (@user_passes_test(is_member))
+    
+    PERFORMANCE:
+    - Time to first byte does not depend on the size of the catalog
+    """
+    books = Book.objects.order_by('id')
+    context = {
+        'page_title': 'Member Dashboard',
+        'layout': 'table',
+    }
+    return book_stream_response(request, books, context)
+
+
 # ============== PERMISSION-BASED VIEWS ==============
 # These views use Django's permission_required decorator to enforce granular permissions
 # Permissions are defined in models.py and can be assigned to users via groups
+# Writes go through run_write() (see LibraryProject/write_queue.py), which funnels
+# them through a single writer thread when WRITE_QUEUE_ENABLED is set
 
 @login_required(login_url='login')
 @permission_required('relationship_app.can_add_book', raise_exception=True)
@@ -249,15 +571,17 @@ def add_book(request):
                 # Use Django ORM to safely query the author
                 author = Author.objects.get(id=author_id)
                 # Create book with validated data
-                book = Book.objects.create(title=title, author=author)
+                run_write(Book.objects.create, title=title, author=author)
                 return redirect('list_books')
-            except Author.DoesNotExist:
+            except (Author.DoesNotExist, ValueError):
                 return render(request, 'relationship_app/add_book.html', 
-                            {'authors': Author.objects.all(), 
-                             'error': 'Author not found'})
+                            {'error': 'Author not found'})
+        elif title:
+            return render(request, 'relationship_app/add_book.html', 
+                        {'error': 'Please choose an author from the suggestions'})
     
-    authors = Author.objects.all()
-    return render(request, 'relationship_app/add_book.html', {'authors': authors})
+    # Authors are picked through author_autocomplete instead of being embedded
+    return render(request, 'relationship_app/add_book.html')
 
 
 @login_required(login_url='login')
@@ -277,7 +601,7 @@ def edit_book(request, pk):
     - Only allows POST method for modifications
     """
     try:
-        book = Book.objects.get(id=pk)
+        book = Book.objects.select_related('author').get(id=pk)
     except Book.DoesNotExist:
         return HttpResponseForbidden('Book not found')
     
@@ -292,16 +616,17 @@ def edit_book(request, pk):
                 author = Author.objects.get(id=author_id)
                 book.title = title
                 book.author = author
-                book.save()
+                run_write(book.save)
                 return redirect('list_books')
-            except Author.DoesNotExist:
+            except (Author.DoesNotExist, ValueError):
                 return render(request, 'relationship_app/edit_book.html', 
-                            {'book': book, 'authors': Author.objects.all(), 
-                             'error': 'Author not found'})
+                            {'book': book, 'error': 'Author not found'})
+        elif title:
+            return render(request, 'relationship_app/edit_book.html', 
+                        {'book': book, 'error': 'Please choose an author from the suggestions'})
     
-    authors = Author.objects.all()
-    return render(request, 'relationship_app/edit_book.html', 
-                {'book': book, 'authors': authors})
+    # Authors are picked through author_autocomplete instead of being embedded
+    return render(request, 'relationship_app/edit_book.html', {'book': book})
 
 
 @login_required(login_url='login')
@@ -325,8 +650,217 @@ def delete_book(request, pk):
         return HttpResponseForbidden('Book not found')
     
     if request.method == 'POST':
-        book.delete()
+        run_write(book.delete)
         return redirect('list_books')
     
     return render(request, 'relationship_app/delete_book.html', {'book': book})
 
+
+# ============== PROFILE PHOTO ==============
+
+# Room for the multipart boundaries, headers and CSRF token around the photo
+UPLOAD_FORM_OVERHEAD = 16 * 1024
+
+
+@login_required(login_url='login')
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def profile_photo(request):
+    """
+    View to upload the logged-in user's profile photo.
+    
+    SECURITY:
+    - Requires user to be logged in (@login_required)
+    - CSRF is checked by _profile_photo: the CSRF middleware would read the
+      body with the default upload handlers before this view could install
+      ProfilePhotoUploadHandler, so it is exempted here only to be checked
+      once the handler is in place; a photo stored by a request that
+      fails the check is deleted again
+    - Bodies declaring more than PROFILE_PHOTO_MAX_SIZE are refused before
+      they are read; the handler stops any that grow past it anyway
+    
+    PERFORMANCE:
+    - The photo is written to its final, content-addressed name as it
+      arrives (see accounts/uploads.py), with no temporary copy
+    - Identical photos are stored once
+    """
+    if request.method == 'POST':
+        max_size = uploads.get_max_size()
+        try:
+            declared = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            declared = 0
+        if declared > max_size + UPLOAD_FORM_OVERHEAD:
+            return _render_profile_photo(
+                request, f'The photo is larger than {max_size // (1024 * 1024)} MB.', status=413
+            )
+        request.upload_handlers = [uploads.ProfilePhotoUploadHandler(request)]
+    response = _profile_photo(request)
+    if response.status_code == 403:
+        # CSRF failure, found after the photo was stored
+        photo = request.FILES.get('profile_photo')
+        if isinstance(photo, uploads.StoredPhoto):
+            photo.discard()
+    return response
+
+
+@csrf_protect
+def _profile_photo(request):
+    if request.method == 'POST':
+        handler = request.upload_handlers[0]
+        photo = request.FILES.get('profile_photo')
+        if handler.error:
+            return _render_profile_photo(request, handler.error, status=400)
+        if not isinstance(photo, uploads.StoredPhoto):
+            return _render_profile_photo(request, 'Choose a photo to upload.', status=400)
+        user = request.user
+        # Already stored; assigning the name saves the file without a copy.
+        # The photo stays locked against deletion until the request ends.
+        # The post_save handler in accounts/models.py renders the thumbnails
+        # and deletes the previous photo if nobody else uses it
+        user.profile_photo.name = photo.storage_name
+        run_write(user.save, update_fields=['profile_photo'])
+        return redirect('profile_photo')
+    return _render_profile_photo(request)
+
+
+def _render_profile_photo(request, error=None, status=200):
+    context = {
+        'error': error,
+        'max_size_mb': uploads.get_max_size() // (1024 * 1024),
+    }
+    return render(request, 'relationship_app/profile_photo.html', context, status=status)
+
+
+# ============== CATALOG EXPORT ==============
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv', export.iter_csv),
+    'ndjson': (NDJSON_CONTENT_TYPE, 'ndjson', export.iter_ndjson),
+}
+
+
+@login_required(login_url='login')
+@permission_required('relationship_app.can_view', raise_exception=True)
+@require_http_methods(["GET"])
+def export_catalog(request):
+    """
+    Download the whole catalog (books, authors, library memberships) as
+    ?format=csv (default) or ?format=ndjson.
+    
+    ACCESS CONTROL:
+    - Requires user to be logged in (@login_required)
+    - Requires 'can_view' permission
+    
+    PERFORMANCE:
+    - Rows are read in primary-key chunks with values_list and written
+      to the response as they are produced (see export.py), so memory
+      stays constant for any catalog size
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    content_type, extension, rows = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(
+        rows(export.iter_catalog_chunks()),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="catalog.{extension}"'
+    return response
+
+
+# ============== AUTOCOMPLETE ==============
+
+AUTHOR_AUTOCOMPLETE_LIMIT = 20
+
+
+@login_required(login_url='login')
+@require_http_methods(["GET"])
+def author_autocomplete(request):
+    """
+    JSON endpoint returning authors whose name starts with ?q=, used by the
+    add/edit book forms instead of embedding every author in a <select>.
+    
+    PERFORMANCE:
+    - The prefix is matched against Author.name_normalized as a range
+      (>= prefix and < prefix + U+10FFFF), which the name_normalized index
+      answers directly; LIKE 'prefix%' cannot use it on SQLite
+    - At most ?limit= (capped at AUTHOR_AUTOCOMPLETE_LIMIT) rows are read
+    
+    Each result has a label for the form's datalist: the author's name, or
+    "name (#id)" when another result has the same name, so the form can
+    map the chosen label back to one author.
+    """
+    prefix = Author.normalize_name(request.GET.get('q', ''))
+    try:
+        limit = int(request.GET.get('limit', AUTHOR_AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        limit = AUTHOR_AUTOCOMPLETE_LIMIT
+    limit = max(1, min(limit, AUTHOR_AUTOCOMPLETE_LIMIT))
+    
+    results = []
+    if prefix:
+        authors = (
+            Author.objects
+            .filter(name_normalized__gte=prefix, name_normalized__lt=prefix + '\U0010ffff')
+            .order_by('name_normalized', 'id')
+            .values('id', 'name')[:limit]
+        )
+        results = list(authors)
+    names = Counter(author['name'] for author in results)
+    for author in results:
+        if names[author['name']] > 1:
+            author['label'] = f"{author['name']} (#{author['id']})"
+        else:
+            author['label'] = author['name']
+    return JsonResponse({'results': results})
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='login')
+@require_http_methods(["GET"])
+def fragment_cache_stats(request):
+    """
+    JSON endpoint reporting the fragment cache counters of this process.
+    
+    ACCESS CONTROL:
+    - Requires user to be logged in (@login_required)
+    - Requires user to have Admin role (@user_passes_test(is_admin))
+    
+    The cache is per process, so each worker reports its own numbers.
+    """
+    return JsonResponse(fragment_cache.stats())
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='login')
+@require_http_methods(["GET"])
+def write_queue_stats(request):
+    """
+    JSON endpoint reporting the serialized writer's queue depth, wait and
+    commit times of this process (see LibraryProject/write_queue.py).
+    
+    ACCESS CONTROL:
+    - Requires user to be logged in (@login_required)
+    - Requires user to have Admin role (@user_passes_test(is_admin))
+    """
+    return JsonResponse(write_queue.stats())
+
+
+@login_required(login_url='login')
+@user_passes_test(is_admin, login_url='login')
+@require_http_methods(["GET"])
+def cache_stats(request):
+    """
+    JSON endpoint reporting per-tier hit ratios and invalidations of each
+    two-tier cache in this process (see LibraryProject/cache.py).
+    
+    ACCESS CONTROL:
+    - Requires user to be logged in (@login_required)
+    - Requires user to have Admin role (@user_passes_test(is_admin))
+    """
+    return JsonResponse({
+        alias: caches[alias].stats()
+        for alias in settings.CACHES
+        if hasattr(caches[alias], 'stats')
+    })